@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from .models import CotisationConfig, Payment
+from .models import (
+    BankImport,
+    BankLine,
+    CotisationConfig,
+    HouseholdLedger,
+    LedgerEntry,
+    Payment,
+    ReminderBatch,
+    ReminderRecipient,
+)
 
 
 @admin.register(CotisationConfig)
@@ -13,3 +22,59 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ["person", "school_year", "amount", "date", "note"]
     list_filter = ["school_year"]
     search_fields = ["person__first_name", "person__last_name"]
+
+
+class LedgerAdmin(admin.ModelAdmin):
+    """Read-only: the ledger is maintained by finance.ledger."""
+
+    list_filter = ["school_year"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(LedgerAdmin):
+    list_display = ["person", "school_year", "kind", "household", "amount_due", "amount_paid"]
+    list_select_related = ["person", "household", "school_year"]
+    search_fields = ["person__first_name", "person__last_name"]
+
+
+@admin.register(HouseholdLedger)
+class HouseholdLedgerAdmin(LedgerAdmin):
+    list_display = ["household", "school_year", "children", "amount_due", "amount_paid"]
+    list_select_related = ["household", "school_year"]
+    search_fields = ["household__address"]
+
+
+class ReminderRecipientInline(admin.TabularInline):
+    model = ReminderRecipient
+    fields = ["person", "address", "balance", "status", "error", "email"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(ReminderBatch)
+class ReminderBatchAdmin(admin.ModelAdmin):
+    list_display = ["subject", "school_year", "created_by", "created_at", "dispatched_at"]
+    list_filter = ["school_year"]
+    inlines = [ReminderRecipientInline]
+
+
+class BankLineInline(admin.TabularInline):
+    model = BankLine
+    fields = ["line_number", "date", "amount", "counterparty", "communication", "status", "match"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(BankImport)
+class BankImportAdmin(admin.ModelAdmin):
+    list_display = ["file_name", "format", "school_year", "imported_by", "created_at", "recorded_at"]
+    list_filter = ["school_year", "format"]
+    inlines = [BankLineInline]
@@ -4,3 +4,33 @@ from django.apps import AppConfig
 class FinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finance'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from members import households, passage
+
+        from . import ledger
+
+        # Rows the ledger is derived from (see finance.ledger).
+        for model, receiver in (
+            ("finance.Payment", ledger.on_payment_changed),
+            ("members.Enrollment", ledger.on_enrollment_changed),
+        ):
+            for signal, event in ((post_save, "saved"), (post_delete, "deleted")):
+                signal.connect(
+                    receiver,
+                    sender=model,
+                    dispatch_uid=f"ledger_{model}_{event}",
+                )
+        households.household_changed.connect(
+            ledger.on_household_changed, dispatch_uid="ledger_household_changed"
+        )
+        passage.passage_applied.connect(
+            ledger.on_passage_applied, dispatch_uid="ledger_passage_applied"
+        )
+        post_save.connect(
+            ledger.on_config_saved,
+            sender="finance.CotisationConfig",
+            dispatch_uid="ledger_config_saved",
+        )
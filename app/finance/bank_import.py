@@ -0,0 +1,462 @@
+"""Import bank statements and match their lines to persons.
+
+A statement is read line by line, whatever its size: ``read_csv`` takes
+the CSV exports of the usual Belgian banks (the columns are found by their
+header), ``read_coda`` the CODA format. Only credits are kept, and a
+globalised CODA movement counts once, by its global amount.
+
+Each line is then matched against an index of the school year built with a
+few queries, not one search per line:
+
+1. a structured communication (+++123/4567/89002+++) quoting the
+   reference of a ledger entry;
+2. otherwise the name of a billed person, or of a parent (the payment is
+   then for their household), in the counterparty or the communication.
+   When several match, the one whose balance equals the amount wins.
+
+Lines with several candidates are "ambiguous" and, like the unmatched
+ones, wait on the review screen. ``record`` creates the payments of all
+matched lines with one bulk insert.
+"""
+
+import codecs
+import csv
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from members.models import ParentChild
+
+from . import ledger
+from .models import BankImport, BankLine, LedgerEntry, Payment, calculate_balances
+
+BATCH_SIZE = 500
+SAMPLE_SIZE = 64 * 1024
+# Longest run of words looked up as a name ("van den berg marie").
+MAX_NAME_WORDS = 5
+REFERENCE = re.compile(r"(?<!\d)(\d{3})\D{0,3}(\d{4})\D{0,3}(\d{5})(?!\d)")
+
+# Header aliases of the CSV exports (lowercase, accents removed).
+CSV_COLUMNS = {
+    "date": [
+        "date", "date d'execution", "date valeur", "date comptable",
+        "uitvoeringsdatum", "valutadatum", "boekingsdatum", "datum",
+    ],
+    "amount": ["amount", "montant", "bedrag"],
+    "counterparty": [
+        "counterparty", "counterparty name", "nom de la contrepartie",
+        "nom contrepartie", "contrepartie", "naam tegenpartij", "tegenpartij",
+        "naam van de tegenpartij",
+    ],
+    "communication": [
+        "communication", "communications", "details", "mededeling",
+        "mededelingen", "description", "omschrijving",
+    ],
+}
+
+
+class StatementError(ValueError):
+    """The file is not a statement this module can read."""
+
+
+@dataclass
+class StatementLine:
+    line_number: int
+    date: date
+    amount: Decimal
+    counterparty: str
+    communication: str
+
+
+def detect_format(uploaded):
+    """Return BankImport.Format.CODA if the file starts with a CODA header."""
+    head = uploaded.read(5)
+    uploaded.seek(0)
+    if head == b"00000":
+        return BankImport.Format.CODA
+    return BankImport.Format.CSV
+
+
+def read(uploaded, file_format):
+    """Yield the credit lines of an uploaded statement."""
+    # Banks export UTF-8 or Windows-1252: decide on the first chunk.
+    sample = uploaded.read(SAMPLE_SIZE)
+    uploaded.seek(0)
+    try:
+        sample.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as error:
+        # A multi-byte character cut at the end of the sample is still UTF-8.
+        encoding = "utf-8-sig" if error.start >= len(sample) - 3 else "cp1252"
+    text = codecs.getreader(encoding)(uploaded, errors="replace")
+    if file_format == BankImport.Format.CODA:
+        return read_coda(text)
+    return read_csv(text)
+
+
+def read_csv(text):
+    """Yield StatementLine from a CSV export (``text``: an iterator of lines)."""
+    sample = text.readline()
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows = csv.reader(_chain([sample], text), dialect)
+    header = next(rows, None)
+    if header is None:
+        raise StatementError("empty file")
+    columns = _columns(header)
+
+    for number, row in enumerate(rows, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            amount = _decimal(row[columns["amount"]])
+            day = _date(row[columns["date"]])
+        except (IndexError, ValueError, InvalidOperation):
+            continue
+        if amount <= 0:
+            continue
+        yield StatementLine(
+            line_number=number,
+            date=day,
+            amount=amount,
+            counterparty=_cell(row, columns.get("counterparty")),
+            communication=_cell(row, columns.get("communication")),
+        )
+
+
+def read_coda(text):
+    """Yield StatementLine from a CODA file (movement records 21, 22, 23)."""
+    current = None
+    for number, record in enumerate(text, start=1):
+        record = record.rstrip("\r\n").ljust(128)
+        kind = record[:2]
+        if kind == "21":
+            if current is not None:
+                yield current
+            current = None
+            # The details (detail number > 0) of a globalised movement
+            # repeat its amount piece by piece: keep the global record.
+            if record[6:10] != "0000":
+                continue
+            # 0 is a credit, 1 a debit.
+            if record[31] != "0":
+                continue
+            if record[61] == "1" and record[62:65] == "101":
+                communication = record[65:77]
+            else:
+                communication = record[62:115].strip()
+            current = StatementLine(
+                line_number=number,
+                date=datetime.strptime(record[115:121], "%d%m%y").date(),
+                # 15 digits, the last 3 being decimals.
+                amount=(Decimal(record[32:47]) / 1000).quantize(Decimal("0.01")),
+                counterparty="",
+                communication=communication,
+            )
+        elif current is not None and kind == "22":
+            current.communication = f"{current.communication} {record[10:63].strip()}".strip()
+        elif current is not None and kind == "23":
+            current.counterparty = record[47:82].strip()
+            current.communication = f"{current.communication} {record[82:125].strip()}".strip()
+        elif kind[:1] in ("8", "9") and current is not None:
+            yield current
+            current = None
+    if current is not None:
+        yield current
+
+
+def normalize(text):
+    """Lowercase words without accents or punctuation, as a list."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+
+
+def references(text):
+    """Valid structured communications (12 digits) found in a text."""
+    found = []
+    for match in REFERENCE.finditer(text or ""):
+        digits = "".join(match.groups())
+        base = int(digits[:10])
+        if int(digits[10:]) == (base % 97 or 97):
+            found.append(digits)
+    return found
+
+
+class MatchIndex:
+    """What lines are matched against, loaded for a school year in 4 queries.
+
+    A target is the tuple of the ids of the persons a line pays for: one
+    person, or the billed children of a parent.
+    """
+
+    def __init__(self, school_year):
+        self.balances = {
+            str(row["person_id"]): row["balance"]
+            for row in calculate_balances(school_year)
+        }
+
+        self.by_reference = {}
+        self.by_name = {}
+        entries = LedgerEntry.objects.filter(school_year=school_year).values_list(
+            "person_id", "reference", "person__first_name", "person__last_name"
+        )
+        for person_id, reference, first_name, last_name in entries:
+            self.by_reference[reference] = (str(person_id),)
+            self._add_name(first_name, last_name, (str(person_id),))
+
+        households = {}
+        names = {}
+        links = ParentChild.objects.filter(
+            child__ledger_entries__school_year=school_year
+        ).values_list("parent_id", "parent__first_name", "parent__last_name", "child_id")
+        for parent_id, first_name, last_name, child_id in links:
+            households.setdefault(parent_id, set()).add(str(child_id))
+            names[parent_id] = (first_name, last_name)
+        for parent_id, children in households.items():
+            self._add_name(*names[parent_id], tuple(sorted(children)))
+
+    def _add_name(self, first_name, last_name, target):
+        first, last = normalize(first_name), normalize(last_name)
+        if not first or not last:
+            return
+        for key in (" ".join(first + last), " ".join(last + first)):
+            self.by_name.setdefault(key, set()).add(target)
+
+    def names_in(self, text):
+        """Targets whose name appears as consecutive words of ``text``."""
+        words = normalize(text)
+        found = set()
+        for start in range(len(words)):
+            for size in range(2, MAX_NAME_WORDS + 1):
+                if start + size > len(words):
+                    break
+                found |= self.by_name.get(" ".join(words[start:start + size]), set())
+        return found
+
+    def balance(self, target):
+        return sum(self.balances.get(person_id, Decimal("0")) for person_id in target)
+
+    def match(self, line):
+        """Return (status, match, person_ids, candidates) for a statement line."""
+        for reference in references(line.communication):
+            if reference in self.by_reference:
+                return (
+                    BankLine.Status.MATCHED, BankLine.Match.REFERENCE,
+                    list(self.by_reference[reference]), [],
+                )
+
+        targets = self.names_in(line.counterparty) | self.names_in(line.communication)
+        if len(targets) > 1:
+            exact = [target for target in targets if self.balance(target) == line.amount]
+            if len(exact) == 1:
+                targets = set(exact)
+        if len(targets) == 1:
+            return (
+                BankLine.Status.MATCHED, BankLine.Match.NAME,
+                list(targets.pop()), [],
+            )
+        if targets:
+            return (
+                BankLine.Status.AMBIGUOUS, "", [],
+                sorted(list(target) for target in targets),
+            )
+        return BankLine.Status.UNMATCHED, "", [], []
+
+
+def import_statement(uploaded, school_year, imported_by):
+    """Read, match and store an uploaded statement; returns the BankImport.
+
+    Lines are matched as they are read and inserted by batches, so the
+    file is never held in memory as a whole.
+    """
+    file_format = detect_format(uploaded)
+    index = MatchIndex(school_year)
+
+    with transaction.atomic():
+        bank_import = BankImport.objects.create(
+            school_year=school_year,
+            file_name=uploaded.name[:255],
+            format=file_format,
+            imported_by=imported_by,
+        )
+        rows = []
+        for line in _checked(read(uploaded, file_format)):
+            status, match, person_ids, candidates = index.match(line)
+            rows.append(BankLine(
+                bank_import=bank_import,
+                line_number=line.line_number,
+                date=line.date,
+                amount=line.amount,
+                counterparty=line.counterparty[:200],
+                communication=line.communication[:255],
+                status=status,
+                match=match,
+                person_ids=person_ids,
+                candidates=candidates,
+            ))
+            if len(rows) == BATCH_SIZE:
+                BankLine.objects.bulk_create(rows)
+                rows = []
+        BankLine.objects.bulk_create(rows)
+    return bank_import
+
+
+def review(bank_import, choices):
+    """Apply the Trésorier's choices to lines left for review.
+
+    ``choices`` maps a line pk to "ignore", "c<index>" (one of the
+    candidates of an ambiguous line) or the reference of a ledger entry.
+    Returns the number of lines changed.
+    """
+    lines = list(bank_import.lines.filter(
+        pk__in=list(choices),
+        status__in=[BankLine.Status.AMBIGUOUS, BankLine.Status.UNMATCHED],
+    ))
+    by_reference = {
+        reference: str(person_id)
+        for reference, person_id in LedgerEntry.objects.filter(
+            school_year_id=bank_import.school_year_id,
+            reference__in=[re.sub(r"\D", "", value) for value in choices.values()],
+        ).values_list("reference", "person_id")
+    }
+    changed = []
+    for line in lines:
+        value = choices[line.pk]
+        if value == "ignore":
+            line.status = BankLine.Status.IGNORED
+            changed.append(line)
+            continue
+        if value.startswith("c") and value[1:].isdigit():
+            index = int(value[1:])
+            person_ids = line.candidates[index] if index < len(line.candidates) else None
+        else:
+            person_id = by_reference.get(re.sub(r"\D", "", value))
+            person_ids = [person_id] if person_id else None
+        if person_ids:
+            line.status = BankLine.Status.MATCHED
+            line.match = BankLine.Match.MANUAL
+            line.person_ids = person_ids
+            changed.append(line)
+    BankLine.objects.bulk_update(changed, ["status", "match", "person_ids"])
+    return len(changed)
+
+
+def record(bank_import, recorded_by):
+    """Create the payments of every matched line; returns how many lines.
+
+    A household payment is split over its children, each up to their
+    balance, the rest going to the first one.
+    """
+    school_year = bank_import.school_year
+    with transaction.atomic():
+        lines = list(
+            bank_import.lines.select_for_update().filter(status=BankLine.Status.MATCHED)
+        )
+        balances = {
+            str(row["person_id"]): max(row["balance"], Decimal("0"))
+            for row in calculate_balances(school_year)
+        }
+        payments = []
+        for line in lines:
+            for person_id, amount in _split(line, balances):
+                payments.append(Payment(
+                    person_id=person_id,
+                    school_year=school_year,
+                    amount=amount,
+                    date=line.date,
+                    note=(line.communication or line.counterparty)[:255],
+                    recorded_by=recorded_by,
+                ))
+        Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+        BankLine.objects.filter(pk__in=[line.pk for line in lines]).update(
+            status=BankLine.Status.RECORDED
+        )
+        bank_import.recorded_at = timezone.now()
+        bank_import.save(update_fields=["recorded_at"])
+        # bulk_create sends no signals.
+        ledger.refresh_paid_many(school_year.pk, {p.person_id for p in payments})
+    return len(lines)
+
+
+def _split(line, balances):
+    """Yield (person_id, amount) shares of a line, updating ``balances``."""
+    person_ids = line.person_ids
+    remaining = line.amount
+    shares = {}
+    for person_id in person_ids:
+        share = min(balances.get(person_id, Decimal("0")), remaining)
+        if share > 0:
+            shares[person_id] = share
+            balances[person_id] -= share
+            remaining -= share
+    if remaining > 0:
+        shares[person_ids[0]] = shares.get(person_ids[0], Decimal("0")) + remaining
+    return shares.items()
+
+
+def _checked(lines):
+    """Turn the errors of a malformed file into StatementError."""
+    try:
+        yield from lines
+    except StatementError:
+        raise
+    except (csv.Error, ValueError, ArithmeticError) as error:
+        raise StatementError(str(error)) from error
+
+
+def _chain(first, rest):
+    yield from first
+    yield from rest
+
+
+def _columns(header):
+    """Map the known columns to their index in a CSV header."""
+    names = [" ".join(normalize(cell)) for cell in header]
+    columns = {}
+    for column, aliases in CSV_COLUMNS.items():
+        aliases = [" ".join(normalize(alias)) for alias in aliases]
+        for position, name in enumerate(names):
+            if name in aliases:
+                columns[column] = position
+                break
+    missing = {"date", "amount"} - set(columns)
+    if missing:
+        raise StatementError(f"missing column(s): {', '.join(sorted(missing))}")
+    return columns
+
+
+def _cell(row, position):
+    if position is None or position >= len(row):
+        return ""
+    return row[position].strip()
+
+
+def _decimal(value):
+    """Parse "1.234,56", "1,234.56", "-12,5" or "+80 EUR"."""
+    value = re.sub(r"[^\d,.\-+]", "", value)
+    if "," in value and "." in value:
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    else:
+        value = value.replace(",", ".")
+    return Decimal(value)
+
+
+def _date(value):
+    value = value.strip()
+    for pattern in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y"):
+        try:
+            return datetime.strptime(value, pattern).date()
+        except ValueError:
+            continue
+    raise ValueError(value)
@@ -33,13 +33,24 @@ class ReminderForm(forms.Form):
     )
     body = forms.CharField(
         label=_("Message"),
-        help_text=_("Use {prenom} and {solde} as variables."),
+        help_text=_("Use {prenom}, {solde} and {communication} as variables."),
         widget=forms.Textarea(attrs={"class": "form-control", "rows": 6}),
         initial=_(
             "Hello {prenom},\n\n"
             "Your membership fee balance is {solde}€.\n"
-            "Please proceed with the payment.\n\n"
+            "Please proceed with the payment, with the communication "
+            "{communication}.\n\n"
             "Best regards,\n"
             "The treasurer"
         ),
     )
+
+
+class BankImportForm(forms.Form):
+    """Upload of a bank statement export."""
+
+    file = forms.FileField(
+        label=_("Statement"),
+        help_text=_("CSV export of your bank or CODA file."),
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv,.txt,.cod,.coda"}),
+    )
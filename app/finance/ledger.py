@@ -0,0 +1,316 @@
+"""Materialized dues and payments: the finance ledger.
+
+calculate_balances() used to regroup the enrolled children by address,
+recompute every due and sum every Payment on each request. The ledger keeps
+that result instead: one LedgerEntry per person owing a fee for a school
+year and one HouseholdLedger per household (see members.households),
+updated by the receivers below whenever a row they are derived from
+changes:
+
+- Payment: amount_paid of the payer and of their household;
+- Enrollment, Person (through household_changed, once the memberships are
+  synced), household memberships and the passage's bulk writes: the
+  households of the persons involved are recomputed, since an enrollment, a
+  birthday or a move decides who is the eldest of a household;
+- CotisationConfig: the amounts of the year, per fee kind.
+
+Dues are stored before the late penalty, which depends on the date and is
+applied when reading. Bulk writes send no signals, so their callers refresh
+the ledger themselves; the rebuild_ledger command recomputes or checks it
+from scratch.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from members.models import Enrollment, HouseholdMember, Person
+
+from .models import CotisationConfig, HouseholdLedger, LedgerEntry, Payment
+
+ANIMATEUR_ROLES = ["a", "ar"]
+ZERO = Decimal("0.00")
+Kind = LedgerEntry.Kind
+
+
+def fees(school_year_id):
+    """Return {kind: amount due before penalty} for a school year."""
+    config = CotisationConfig.objects.filter(school_year_id=school_year_id).first()
+    if config is None:
+        return {Kind.FULL: ZERO, Kind.SIBLING: ZERO, Kind.ANIMATEUR: ZERO}
+    return {
+        Kind.FULL: config.full_fee,
+        Kind.SIBLING: max(config.full_fee - config.sibling_discount, ZERO),
+        Kind.ANIMATEUR: config.animateur_fee,
+    }
+
+
+def structured_reference(person_id):
+    """Belgian structured communication of a person: 12 digits, the last two
+    being the first ten modulo 97 (97 instead of 0).
+
+    Derived from the person's id, so it stays the same from year to year.
+    """
+    base = person_id.int % 10**10
+    return f"{base:010d}{base % 97 or 97:02d}"
+
+
+def compute(school_year_id, households=None, person_ids=None):
+    """Return the unsaved ledger entries of a school year.
+
+    When ``households`` (ids) is given, only the children of those
+    households are computed, and only the other persons among ``person_ids``.
+    """
+    amounts = fees(school_year_id)
+    entries = {}
+
+    # Children grouped by household: the eldest pays the full fee, the
+    # others the sibling fee. A child without a household pays the full fee.
+    children = Person.objects.filter(
+        primary_role__short="e",
+        status="a",
+        enrollment__school_year_id=school_year_id,
+    )
+    if households is not None:
+        children = children.filter(
+            Q(household_member__household_id__in=households) | Q(pk__in=person_ids or [])
+        )
+    seen = set()
+    for pk, household_id in (
+        children.distinct()
+        .order_by("birthday", "pk")
+        .values_list("pk", "household_member__household_id")
+    ):
+        kind = Kind.SIBLING if household_id in seen else Kind.FULL
+        if household_id is not None:
+            seen.add(household_id)
+        entries[pk] = LedgerEntry(
+            school_year_id=school_year_id,
+            person_id=pk,
+            household_id=household_id,
+            kind=kind,
+            amount_due=amounts[kind],
+            reference=structured_reference(pk),
+        )
+
+    animateurs = Person.objects.filter(
+        primary_role__short__in=ANIMATEUR_ROLES,
+        status="a",
+        enrollment__school_year_id=school_year_id,
+    )
+    if households is not None:
+        animateurs = animateurs.filter(pk__in=person_ids or [])
+    for pk in animateurs.distinct().values_list("pk", flat=True):
+        entries[pk] = LedgerEntry(
+            school_year_id=school_year_id,
+            person_id=pk,
+            kind=Kind.ANIMATEUR,
+            amount_due=amounts[Kind.ANIMATEUR],
+            reference=structured_reference(pk),
+        )
+
+    paid = dict(
+        Payment.objects.filter(school_year_id=school_year_id, person_id__in=list(entries))
+        .values("person_id")
+        .annotate(total=Sum("amount"))
+        .values_list("person_id", "total")
+        .order_by()
+    )
+    for pk, entry in entries.items():
+        entry.amount_paid = paid.get(pk, ZERO)
+    return list(entries.values())
+
+
+def rebuild(school_year_id):
+    """Recompute the whole ledger of a school year; returns the entry count."""
+    entries = compute(school_year_id)
+    with transaction.atomic():
+        LedgerEntry.objects.filter(school_year_id=school_year_id).delete()
+        LedgerEntry.objects.bulk_create(entries)
+        _refresh_households(school_year_id)
+    return len(entries)
+
+
+def check(school_year_id):
+    """Return the ids of the persons whose stored entry differs from a recompute."""
+    fields = ("household_id", "kind", "amount_due", "amount_paid", "reference")
+    expected = {
+        entry.person_id: tuple(getattr(entry, field) for field in fields)
+        for entry in compute(school_year_id)
+    }
+    stored = {
+        row[0]: tuple(row[1:])
+        for row in LedgerEntry.objects.filter(school_year_id=school_year_id)
+        .values_list("person_id", *fields)
+    }
+    return sorted(
+        (pk for pk in expected.keys() | stored.keys() if expected.get(pk) != stored.get(pk)),
+        key=str,
+    )
+
+
+def refresh(school_year_id, person_ids):
+    """Recompute the entries of some persons and of every child sharing
+    their household, before or after the change."""
+    person_ids = set(person_ids)
+    households = set(
+        LedgerEntry.objects.filter(
+            school_year_id=school_year_id,
+            person_id__in=person_ids,
+            household__isnull=False,
+        ).values_list("household_id", flat=True)
+    )
+    households |= set(
+        HouseholdMember.objects.filter(
+            person_id__in=person_ids, person__primary_role__short="e"
+        ).values_list("household_id", flat=True)
+    )
+    entries = compute(school_year_id, households, person_ids)
+    with transaction.atomic():
+        LedgerEntry.objects.filter(school_year_id=school_year_id).filter(
+            Q(person_id__in=person_ids) | Q(household__in=households)
+        ).delete()
+        LedgerEntry.objects.bulk_create(entries)
+        _refresh_households(school_year_id, households)
+
+
+def refresh_persons(person_ids):
+    """Refresh some persons in every school year they are or were billed for."""
+    person_ids = list(person_ids)
+    years = set(
+        Enrollment.objects.filter(user_id__in=person_ids)
+        .values_list("school_year_id", flat=True)
+    ) | set(
+        LedgerEntry.objects.filter(person_id__in=person_ids)
+        .values_list("school_year_id", flat=True)
+    )
+    for school_year_id in years:
+        refresh(school_year_id, person_ids)
+
+
+def refresh_paid(school_year_id, person_id):
+    """Update the amount a person (and their household) has paid."""
+    entry = LedgerEntry.objects.filter(
+        school_year_id=school_year_id, person_id=person_id
+    ).first()
+    if entry is None:
+        return
+    paid = (
+        Payment.objects.filter(school_year_id=school_year_id, person_id=person_id)
+        .aggregate(total=Sum("amount"))["total"]
+        or ZERO
+    )
+    LedgerEntry.objects.filter(pk=entry.pk).update(amount_paid=paid)
+    if entry.household_id:
+        # Only updates the existing row: a payment deleted along with its
+        # school year must not create one.
+        HouseholdLedger.objects.filter(
+            school_year_id=school_year_id, household_id=entry.household_id
+        ).update(
+            amount_paid=LedgerEntry.objects.filter(
+                school_year_id=school_year_id, household_id=entry.household_id
+            ).aggregate(total=Sum("amount_paid"))["total"]
+            or ZERO
+        )
+
+
+def refresh_paid_many(school_year_id, person_ids):
+    """Update the amount paid of many persons at once, after a bulk insert."""
+    paid = (
+        Payment.objects.filter(
+            school_year_id=school_year_id, person_id=OuterRef("person_id")
+        )
+        .values("person_id")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    entries = LedgerEntry.objects.filter(
+        school_year_id=school_year_id, person_id__in=list(person_ids)
+    )
+    with transaction.atomic():
+        entries.update(amount_paid=Coalesce(Subquery(paid), ZERO))
+        households = set(
+            entries.filter(household__isnull=False).values_list("household_id", flat=True)
+        )
+        if households:
+            _refresh_households(school_year_id, households)
+
+
+def apply_fees(school_year_id):
+    """Write the current fees of a school year into its entries."""
+    with transaction.atomic():
+        for kind, amount in fees(school_year_id).items():
+            LedgerEntry.objects.filter(school_year_id=school_year_id, kind=kind).update(
+                amount_due=amount
+            )
+        _refresh_households(school_year_id)
+
+
+def _refresh_households(school_year_id, households=None):
+    """Recompute the household rows of a year (all of them by default)."""
+    entries = LedgerEntry.objects.filter(
+        school_year_id=school_year_id, household__isnull=False
+    )
+    if households is not None:
+        entries = entries.filter(household__in=households)
+    totals = {
+        row["household"]: row
+        for row in entries.values("household")
+        .annotate(
+            count=Count("pk"), due=Sum("amount_due"), paid=Sum("amount_paid")
+        )
+        .order_by()
+    }
+    stale = HouseholdLedger.objects.filter(school_year_id=school_year_id)
+    if households is not None:
+        stale = stale.filter(household__in=households)
+    stale.exclude(household__in=list(totals)).delete()
+    HouseholdLedger.objects.bulk_create(
+        [
+            HouseholdLedger(
+                school_year_id=school_year_id,
+                household_id=household,
+                children=row["count"],
+                amount_due=row["due"],
+                amount_paid=row["paid"],
+            )
+            for household, row in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["school_year", "household"],
+        update_fields=["children", "amount_due", "amount_paid"],
+    )
+
+
+def on_payment_changed(sender, instance, raw=False, **kwargs):
+    """Payment post_save/post_delete receiver."""
+    if raw:
+        return
+    refresh_paid(instance.school_year_id, instance.person_id)
+
+
+def on_enrollment_changed(sender, instance, raw=False, **kwargs):
+    """Enrollment post_save/post_delete receiver."""
+    if raw:
+        return
+    refresh(instance.school_year_id, [instance.user_id])
+
+
+def on_household_changed(sender, person_ids, **kwargs):
+    """members.households.household_changed receiver: persons who moved or
+    were saved."""
+    refresh_persons(person_ids)
+
+
+def on_passage_applied(sender, person_ids, **kwargs):
+    """members.passage.passage_applied receiver."""
+    refresh_persons(person_ids)
+
+
+def on_config_saved(sender, instance, raw=False, **kwargs):
+    """CotisationConfig post_save receiver."""
+    if raw:
+        return
+    apply_fees(instance.school_year_id)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import ledger
+from members.models import SchoolYear
+
+
+class Command(BaseCommand):
+    help = "Recompute the finance ledger from payments, enrollments and fees"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--year",
+            type=int,
+            help="Only this school year (its starting calendar year, e.g. 2025)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Report entries that differ from a recompute, without writing",
+        )
+
+    def handle(self, *args, **options):
+        years = SchoolYear.objects.order_by("name")
+        if options["year"] is not None:
+            years = years.filter(name=options["year"])
+            if not years:
+                raise CommandError(f"No school year {options['year']}.")
+
+        drifted = 0
+        for school_year in years:
+            if options["check"]:
+                person_ids = ledger.check(school_year.pk)
+                drifted += len(person_ids)
+                for person_id in person_ids:
+                    self.stdout.write(f"{school_year.name}: {person_id} differs")
+            else:
+                count = ledger.rebuild(school_year.pk)
+                self.stdout.write(f"{school_year.name}: {count} entries")
+
+        if drifted:
+            raise CommandError(f"{drifted} ledger entries differ from a recompute.")
+        if options["check"]:
+            self.stdout.write(self.style.SUCCESS("Ledger is consistent."))
@@ -0,0 +1,122 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:24
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    """Fill the ledger the way finance.ledger.rebuild() does, per school year."""
+    SchoolYear = apps.get_model("members", "SchoolYear")
+    Person = apps.get_model("members", "Person")
+    CotisationConfig = apps.get_model("finance", "CotisationConfig")
+    Payment = apps.get_model("finance", "Payment")
+    LedgerEntry = apps.get_model("finance", "LedgerEntry")
+    HouseholdLedger = apps.get_model("finance", "HouseholdLedger")
+    zero = Decimal("0.00")
+
+    for school_year in SchoolYear.objects.all():
+        config = CotisationConfig.objects.filter(school_year=school_year).first()
+        full = config.full_fee if config else zero
+        sibling = max(full - config.sibling_discount, zero) if config else zero
+        animateur = config.animateur_fee if config else zero
+        paid = dict(
+            Payment.objects.filter(school_year=school_year)
+            .values("person_id").annotate(total=Sum("amount"))
+            .values_list("person_id", "total").order_by()
+        )
+
+        entries = {}
+        seen = set()
+        children = (
+            Person.objects.filter(
+                primary_role__short="e", status="a",
+                enrollment__school_year=school_year,
+            )
+            .distinct().select_related("household_member")
+            .order_by("birthday", "pk")
+        )
+        for child in children:
+            member = getattr(child, "household_member", None)
+            household_id = member.household_id if member else None
+            kind = "sibling" if household_id in seen else "full"
+            if household_id is not None:
+                seen.add(household_id)
+            entries[child.pk] = LedgerEntry(
+                school_year=school_year, person_id=child.pk, household_id=household_id,
+                kind=kind, amount_due=sibling if kind == "sibling" else full,
+            )
+        animateurs = (
+            Person.objects.filter(
+                primary_role__short__in=["a", "ar"], status="a",
+                enrollment__school_year=school_year,
+            )
+            .distinct().values_list("pk", flat=True)
+        )
+        for pk in animateurs:
+            entries[pk] = LedgerEntry(
+                school_year=school_year, person_id=pk, kind="animateur",
+                amount_due=animateur,
+            )
+        for pk, entry in entries.items():
+            entry.amount_paid = paid.get(pk, zero)
+        LedgerEntry.objects.bulk_create(entries.values())
+
+        HouseholdLedger.objects.bulk_create(
+            HouseholdLedger(
+                school_year=school_year, household_id=row["household"],
+                children=row["count"], amount_due=row["due"], amount_paid=row["paid"],
+            )
+            for row in LedgerEntry.objects.filter(
+                school_year=school_year, household__isnull=False
+            ).values("household")
+            .annotate(count=Count("pk"), due=Sum("amount_due"), paid=Sum("amount_paid"))
+            .order_by()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_alter_cotisationconfig_options_alter_payment_options_and_more'),
+        ('members', '0020_household'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HouseholdLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('children', models.PositiveSmallIntegerField(default=0)),
+                ('amount_due', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=9)),
+                ('household', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledgers', to='members.household')),
+                ('school_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='household_ledgers', to='members.schoolyear')),
+            ],
+            options={
+                'verbose_name': 'Household ledger',
+                'verbose_name_plural': 'Household ledgers',
+                'constraints': [models.UniqueConstraint(fields=('school_year', 'household'), name='household_ledger_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('full', 'Full fee'), ('sibling', 'Sibling fee'), ('animateur', 'Animator flat fee')], max_length=10)),
+                ('amount_due', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('household', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='members.household')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='members.person')),
+                ('school_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='members.schoolyear')),
+            ],
+            options={
+                'verbose_name': 'Ledger entry',
+                'verbose_name_plural': 'Ledger entries',
+                'indexes': [models.Index(fields=['school_year', 'household'], name='ledger_entry_household')],
+                'constraints': [models.UniqueConstraint(fields=('school_year', 'person'), name='ledger_entry_unique_person')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
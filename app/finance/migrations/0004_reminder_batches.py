@@ -0,0 +1,50 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_ledger'),
+        ('members', '0019_email_template_language'),
+        ('post_office', '0014_alter_email_recipient_delivery_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('body', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='members.person')),
+                ('school_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminder_batches', to='members.schoolyear')),
+            ],
+            options={
+                'verbose_name': 'Reminder batch',
+                'verbose_name_plural': 'Reminder batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReminderRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.EmailField(max_length=254)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('failed', 'Failed')], max_length=10)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='finance.reminderbatch')),
+                ('email', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='post_office.email')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='members.person')),
+            ],
+            options={
+                'verbose_name': 'Reminder recipient',
+                'verbose_name_plural': 'Reminder recipients',
+            },
+        ),
+    ]
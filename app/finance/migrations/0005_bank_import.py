@@ -0,0 +1,73 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_references(apps, schema_editor):
+    """Set the structured reference (see finance.ledger.structured_reference)."""
+    LedgerEntry = apps.get_model("finance", "LedgerEntry")
+    entries = list(LedgerEntry.objects.only("pk", "person_id"))
+    for entry in entries:
+        base = entry.person_id.int % 10**10
+        entry.reference = f"{base:010d}{base % 97 or 97:02d}"
+    LedgerEntry.objects.bulk_update(entries, ["reference"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_reminder_batches'),
+        ('members', '0019_email_template_language'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('coda', 'CODA')], max_length=4)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('imported_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='members.person')),
+                ('school_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bank_imports', to='members.schoolyear')),
+            ],
+            options={
+                'verbose_name': 'Bank import',
+                'verbose_name_plural': 'Bank imports',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BankLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_number', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('counterparty', models.CharField(blank=True, max_length=200)),
+                ('communication', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('matched', 'Matched'), ('ambiguous', 'Ambiguous'), ('unmatched', 'Unmatched'), ('ignored', 'Ignored'), ('recorded', 'Recorded')], max_length=10)),
+                ('match', models.CharField(blank=True, choices=[('reference', 'Structured communication'), ('name', 'Name'), ('manual', 'Manual')], max_length=10)),
+                ('person_ids', models.JSONField(blank=True, default=list)),
+                ('candidates', models.JSONField(blank=True, default=list)),
+                ('bank_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='finance.bankimport')),
+            ],
+            options={
+                'verbose_name': 'Bank statement line',
+                'verbose_name_plural': 'Bank statement lines',
+                'ordering': ['line_number'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='reference',
+            field=models.CharField(blank=True, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['school_year', 'reference'], name='ledger_entry_reference'),
+        ),
+        migrations.RunPython(backfill_references, migrations.RunPython.noop),
+    ]
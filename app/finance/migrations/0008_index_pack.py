@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_bank_import'),
+        ('members', '0021_index_pack'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['school_year', 'person'], name='payment_year_person'),
+        ),
+    ]
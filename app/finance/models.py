@@ -1,10 +1,23 @@
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 
+from django.contrib.postgres.aggregates import ArrayAgg
 from django.db import models
+from django.db.models import (
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    StringAgg,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Concat, JSONObject, Round
+from django.db.models.lookups import GreaterThan
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from post_office.models import STATUS
 
-from members.models import ParentChild, Person, SchoolYear
+from members.models import Enrollment, Household, Person, SchoolYear
 
 
 class CotisationConfig(models.Model):
@@ -83,87 +96,286 @@ class Payment(models.Model):
         verbose_name = _("Payment")
         verbose_name_plural = _("Payments")
         ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["school_year", "person"], name="payment_year_person"),
+        ]
 
     def __str__(self):
         return f"{self.person} — {self.amount}€ ({self.date})"
 
 
-def _get_households(school_year):
-    """Group enrolled children by address.
+class LedgerEntry(models.Model):
+    """What one person owes and has paid for a school year.
 
-    Returns a dict: {address: [Person, ...]} sorted by birthday ascending
-    (eldest first) within each household.
+    Maintained by finance.ledger; amount_due is before the late penalty.
     """
-    children = (
-        Person.objects.filter(
-            primary_role__short="e",
-            status="a",
-            enrollment__school_year=school_year,
-        )
-        .distinct()
-        .order_by("birthday")
+
+    class Kind(models.TextChoices):
+        FULL = "full", _("Full fee")
+        SIBLING = "sibling", _("Sibling fee")
+        ANIMATEUR = "animateur", _("Animator flat fee")
+
+    school_year = models.ForeignKey(
+        SchoolYear, on_delete=models.CASCADE, related_name="ledger_entries"
+    )
+    person = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="ledger_entries"
+    )
+    # The household of a child; none for animateurs and children without
+    # any address, who are billed on their own.
+    household = models.ForeignKey(
+        Household,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ledger_entries",
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    amount_due = models.DecimalField(max_digits=8, decimal_places=2)
+    amount_paid = models.DecimalField(
+        max_digits=8, decimal_places=2, default=Decimal("0.00")
+    )
+    # Structured communication (12 digits) to quote on bank transfers.
+    reference = models.CharField(max_length=12, blank=True)
+
+    class Meta:
+        verbose_name = _("Ledger entry")
+        verbose_name_plural = _("Ledger entries")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["school_year", "person"], name="ledger_entry_unique_person"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["school_year", "household"], name="ledger_entry_household"
+            ),
+            models.Index(
+                fields=["school_year", "reference"], name="ledger_entry_reference"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.person} — {self.amount_due}€ / {self.amount_paid}€"
+
+    @property
+    def communication(self):
+        """The reference as printed on a transfer: +++123/4567/89002+++."""
+        return format_reference(self.reference)
+
+
+def format_reference(reference):
+    """Print a 12-digit structured reference as +++123/4567/89002+++."""
+    ref = reference
+    return f"+++{ref[:3]}/{ref[3:7]}/{ref[7:]}+++" if ref else ""
+
+
+class HouseholdLedger(models.Model):
+    """Totals of the children of one household for a school year."""
+
+    school_year = models.ForeignKey(
+        SchoolYear, on_delete=models.CASCADE, related_name="household_ledgers"
+    )
+    household = models.ForeignKey(
+        Household, on_delete=models.CASCADE, related_name="ledgers"
+    )
+    children = models.PositiveSmallIntegerField(default=0)
+    amount_due = models.DecimalField(max_digits=9, decimal_places=2)
+    amount_paid = models.DecimalField(
+        max_digits=9, decimal_places=2, default=Decimal("0.00")
+    )
+
+    class Meta:
+        verbose_name = _("Household ledger")
+        verbose_name_plural = _("Household ledgers")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["school_year", "household"], name="household_ledger_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.household} — {self.amount_due}€ / {self.amount_paid}€"
+
+
+class ReminderBatch(models.Model):
+    """A fee reminder sent to every parent with an unpaid balance.
+
+    The emails are queued by the send_fee_reminders task (finance.reminders).
+    """
+
+    school_year = models.ForeignKey(
+        SchoolYear, on_delete=models.CASCADE, related_name="reminder_batches"
+    )
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    created_by = models.ForeignKey(
+        Person,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Reminder batch")
+        verbose_name_plural = _("Reminder batches")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.subject} ({self.created_at:%Y-%m-%d})"
+
+
+class ReminderRecipient(models.Model):
+    """One parent of a ReminderBatch and the email queued for them."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        FAILED = "failed", _("Failed")
+
+    batch = models.ForeignKey(
+        ReminderBatch, on_delete=models.CASCADE, related_name="recipients"
     )
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="+")
+    address = models.EmailField()
+    balance = models.DecimalField(max_digits=9, decimal_places=2)
+    status = models.CharField(max_length=10, choices=Status.choices)
+    error = models.CharField(max_length=255, blank=True)
+    email = models.ForeignKey(
+        "post_office.Email",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    class Meta:
+        verbose_name = _("Reminder recipient")
+        verbose_name_plural = _("Reminder recipients")
+
+    def __str__(self):
+        return f"{self.person} — {self.get_status_display()}"
+
+    @property
+    def delivery(self):
+        """"sent", "failed" or "queued", following the queued email."""
+        if self.status == self.Status.FAILED or self.email is None:
+            return "failed"
+        if self.email.status == STATUS.sent:
+            return "sent"
+        if self.email.status == STATUS.failed:
+            return "failed"
+        return "queued"
 
-    households = {}
-    for child in children:
-        addr = child.address or "__no_address__"
-        households.setdefault(addr, []).append(child)
-    return households
+
+class BankImport(models.Model):
+    """A bank statement (CSV or CODA) imported by the Trésorier.
+
+    Its lines are matched to persons by finance.bank_import; the payments
+    are recorded once the matches are reviewed.
+    """
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        CODA = "coda", "CODA"
+
+    school_year = models.ForeignKey(
+        SchoolYear, on_delete=models.CASCADE, related_name="bank_imports"
+    )
+    file_name = models.CharField(max_length=255)
+    format = models.CharField(max_length=4, choices=Format.choices)
+    imported_by = models.ForeignKey(
+        Person,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    recorded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Bank import")
+        verbose_name_plural = _("Bank imports")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.created_at:%Y-%m-%d})"
+
+
+class BankLine(models.Model):
+    """One credit line of a bank statement and the persons it pays for."""
+
+    class Status(models.TextChoices):
+        MATCHED = "matched", _("Matched")
+        AMBIGUOUS = "ambiguous", _("Ambiguous")
+        UNMATCHED = "unmatched", _("Unmatched")
+        IGNORED = "ignored", _("Ignored")
+        RECORDED = "recorded", _("Recorded")
+
+    class Match(models.TextChoices):
+        REFERENCE = "reference", _("Structured communication")
+        NAME = "name", _("Name")
+        MANUAL = "manual", _("Manual")
+
+    bank_import = models.ForeignKey(
+        BankImport, on_delete=models.CASCADE, related_name="lines"
+    )
+    line_number = models.PositiveIntegerField()
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    counterparty = models.CharField(max_length=200, blank=True)
+    communication = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices)
+    match = models.CharField(max_length=10, choices=Match.choices, blank=True)
+    # The persons paid for (several for a household), as id strings.
+    person_ids = models.JSONField(default=list, blank=True)
+    # Ambiguous lines: the possible person_ids lists.
+    candidates = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        verbose_name = _("Bank statement line")
+        verbose_name_plural = _("Bank statement lines")
+        ordering = ["line_number"]
+
+    def __str__(self):
+        return f"{self.date} {self.amount}€ {self.counterparty}"
 
 
 def calculate_balances(school_year):
-    """Calculate what each person owes for a school year.
+    """Return what each person owes for a school year.
+
+    Reads the ledger maintained by finance.ledger and applies the late
+    penalty, which depends on today's date.
 
     Returns a list of dicts:
-      {person_id, amount_due, amount_paid, balance, is_late}
+      {person_id, household, amount_due, amount_paid, balance, is_late}
+    where household is the address of a child's household, if any.
     """
     config = CotisationConfig.get_for_year(school_year)
-    households = _get_households(school_year)
-
-    dues = {}  # person_id -> Decimal amount due
-
-    # Children: eldest full fee, siblings discounted
-    for _addr, children in households.items():
-        for i, child in enumerate(children):
-            if i == 0:
-                dues[child.pk] = config.full_fee
-            else:
-                dues[child.pk] = max(
-                    config.full_fee - config.sibling_discount, Decimal("0.00")
-                )
-
-    # Animateurs / staff: flat rate (anyone with primary role "a" or "ar" who is enrolled)
-    animateurs = (
-        Person.objects.filter(
-            primary_role__short__in=["a", "ar"],
-            status="a",
-            enrollment__school_year=school_year,
-        )
-        .distinct()
-    )
-    for anim in animateurs:
-        dues[anim.pk] = config.animateur_fee
 
-    # Apply late penalty
     now = timezone.now().date()
     is_late = config.late_deadline and now > config.late_deadline
-    if is_late:
-        factor = Decimal("1") + config.late_penalty_percent / Decimal("100")
-        for pk in dues:
-            dues[pk] = (dues[pk] * factor).quantize(Decimal("0.01"))
-
-    # Calculate payments
-    payments_by_person = {}
-    for p in Payment.objects.filter(school_year=school_year).values("person_id", "amount"):
-        payments_by_person.setdefault(p["person_id"], Decimal("0"))
-        payments_by_person[p["person_id"]] += p["amount"]
+    factor = Decimal("1") + config.late_penalty_percent / Decimal("100")
 
+    entries = (
+        LedgerEntry.objects.filter(school_year=school_year)
+        .order_by("household", "kind", "person_id")
+        .values_list("person_id", "household__address", "amount_due", "amount_paid")
+    )
     results = []
-    for person_id, amount_due in dues.items():
-        amount_paid = payments_by_person.get(person_id, Decimal("0"))
+    for person_id, household, amount_due, amount_paid in entries:
+        if is_late:
+            # Rounded like Postgres ROUND() in unpaid_parents().
+            amount_due = (amount_due * factor).quantize(
+                Decimal("0.01"), rounding=ROUND_HALF_UP
+            )
         balance = amount_due - amount_paid
         results.append({
             "person_id": person_id,
+            "household": household,
             "amount_due": amount_due,
             "amount_paid": amount_paid,
             "balance": balance,
@@ -173,53 +385,103 @@ def calculate_balances(school_year):
     return results
 
 
-def get_adults_with_balance(school_year):
-    """Get all adults (parents of enrolled children) who have an unpaid balance.
+def _with_penalty(school_year, entry=""):
+    """Return (is_late, amount_due, balance) for a school year, the last two
+    being expressions over the ledger entries reached through ``entry``,
+    late penalty included."""
+    config = CotisationConfig.get_for_year(school_year)
+    now = timezone.now().date()
+    is_late = bool(config.late_deadline and now > config.late_deadline)
+    amount_due = F(f"{entry}amount_due")
+    if is_late:
+        factor = Decimal("1") + config.late_penalty_percent / Decimal("100")
+        amount_due = Round(amount_due * Value(factor), 2)
+    balance = ExpressionWrapper(
+        amount_due - F(f"{entry}amount_paid"),
+        output_field=models.DecimalField(max_digits=9, decimal_places=2),
+    )
+    return is_late, amount_due, balance
 
-    Returns list of dicts: {person, email, children_names, balance}
-    """
-    balances = calculate_balances(school_year)
-    balance_by_person = {b["person_id"]: b for b in balances if b["balance"] > 0}
 
-    if not balance_by_person:
-        return []
+def billing_entries(school_year):
+    """Ledger entries of a school year for the billing overview.
 
-    person_ids = list(balance_by_person.keys())
+    Annotated with ``due`` and ``balance`` (late penalty included),
+    ``is_late`` and ``section_id`` (the person's section that year); the
+    person, their role and their household are loaded in the same query.
+    """
+    is_late, amount_due, balance = _with_penalty(school_year)
+    section = (
+        Enrollment.objects.filter(user_id=OuterRef("person_id"), school_year=school_year)
+        .order_by("pk")
+        .values("section_id")[:1]
+    )
+    return (
+        LedgerEntry.objects.filter(school_year=school_year)
+        .select_related("person__primary_role", "household")
+        .annotate(
+            due=amount_due,
+            balance=balance,
+            is_late=GreaterThan(balance, 0) if is_late else Value(False),
+            section_id=Subquery(section),
+        )
+    )
 
-    # Find parents of these children
-    children_with_balance = Person.objects.filter(pk__in=person_ids, primary_role__short="e")
-    child_ids = list(children_with_balance.values_list("pk", flat=True))
 
-    parent_links = ParentChild.objects.filter(child_id__in=child_ids).select_related(
-        "parent", "parent__account"
-    )
+def unpaid_parents(school_year):
+    """Parents with an account whose enrolled children have an unpaid balance.
 
-    results = []
-    seen_parents = set()
-    for link in parent_links:
-        parent = link.parent
-        if parent.pk in seen_parents:
-            continue
-        if not hasattr(parent, "account"):
-            continue
-        seen_parents.add(parent.pk)
-
-        # Find this parent's children who have balance
-        parent_children = Person.objects.filter(
-            as_child__parent=parent,
-            pk__in=child_ids,
+    One grouped query over the ledger: each Person is annotated with
+    ``balance`` (the sum of their children's positive balances, late
+    penalty included), ``children_names`` and ``references`` (a
+    {"name", "reference"} dict per child with an unpaid balance, by first
+    name); ``account`` is loaded.
+    """
+    entry = "as_parent__child__ledger_entries__"
+    _is_late, _amount_due, child_balance = _with_penalty(school_year, entry)
+    return (
+        Person.objects.filter(
+            GreaterThan(child_balance, 0),
+            account__isnull=False,
+            **{
+                f"{entry}school_year": school_year,
+                f"{entry}kind__in": [LedgerEntry.Kind.FULL, LedgerEntry.Kind.SIBLING],
+            },
         )
-        total_balance = sum(
-            balance_by_person[c.pk]["balance"] for c in parent_children
-            if c.pk in balance_by_person
+        .annotate(
+            balance=Sum(child_balance),
+            children_names=StringAgg(
+                Concat(
+                    "as_parent__child__first_name",
+                    Value(" "),
+                    "as_parent__child__last_name",
+                ),
+                delimiter=Value(", "),
+                order_by="as_parent__child__first_name",
+            ),
+            references=ArrayAgg(
+                JSONObject(
+                    name="as_parent__child__first_name",
+                    reference=f"{entry}reference",
+                ),
+                order_by=("as_parent__child__first_name", "as_parent__child__pk"),
+            ),
         )
+        .select_related("account")
+    )
 
-        if total_balance > 0:
-            results.append({
-                "person": parent,
-                "email": parent.account.email,
-                "children_names": ", ".join(str(c) for c in parent_children),
-                "balance": total_balance,
-            })
 
-    return results
+def get_adults_with_balance(school_year):
+    """Get all adults (parents of enrolled children) who have an unpaid balance.
+
+    Returns list of dicts: {person, email, children_names, balance}
+    """
+    return [
+        {
+            "person": parent,
+            "email": parent.account.email,
+            "children_names": parent.children_names,
+            "balance": parent.balance,
+        }
+        for parent in unpaid_parents(school_year).order_by("last_name", "first_name")
+    ]
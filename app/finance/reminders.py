@@ -0,0 +1,147 @@
+"""Queue fee reminders outside the request.
+
+send_reminders only stores a ReminderBatch and hands its id to the
+send_fee_reminders task. The task resolves the parents with an unpaid
+balance, fills the compiled body in for each of them and writes all the
+Email rows with one bulk insert in one transaction, together with a
+ReminderRecipient row per parent. Delivery progress is then read from the
+status of the queued emails.
+
+The rows are built directly rather than with post_office's send_many(),
+which renders every subject and body as a Django template: a "{%" in a
+first name or in the treasurer's text would abort the whole run.
+"""
+
+import re
+from email.utils import make_msgid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from post_office.models import PRIORITY, STATUS, Email
+from post_office.settings import get_message_id_enabled, get_message_id_fqdn
+from post_office.signals import email_queued
+
+from .models import ReminderBatch, ReminderRecipient, format_reference, unpaid_parents
+
+PLACEHOLDERS = re.compile(r"\{(prenom|solde|communication)\}")
+
+
+def compile_body(body):
+    """Parse a reminder body once; returns
+    ``render(prenom=..., solde=..., communication=...)``.
+
+    ``{prenom}``, ``{solde}`` and ``{communication}`` are the only
+    placeholders, anything else is kept as written.
+    """
+    # Literal text at even indexes, placeholder names at odd ones.
+    parts = PLACEHOLDERS.split(body)
+
+    def render(**values):
+        return "".join(
+            values[part] if index % 2 else part for index, part in enumerate(parts)
+        )
+
+    return render
+
+
+def communication(references):
+    """The structured communications a parent quotes on their transfers:
+    one per child with an unpaid balance, named when there are several."""
+    if len(references) == 1:
+        return format_reference(references[0]["reference"])
+    return ", ".join(
+        f"{format_reference(ref['reference'])} ({ref['name']})" for ref in references
+    )
+
+
+def progress(batch):
+    """Return {"total", "sent", "failed", "waiting", "done"} for a batch.
+
+    An email missing from the queue was purged, which only happens to
+    failed ones.
+    """
+    counts = batch.recipients.aggregate(
+        total=Count("pk"),
+        sent=Count("pk", filter=Q(email__status=STATUS.sent)),
+        failed=Count(
+            "pk",
+            filter=Q(status=ReminderRecipient.Status.FAILED)
+            | Q(email__status=STATUS.failed)
+            | Q(email__isnull=True),
+        ),
+    )
+    counts["waiting"] = counts["total"] - counts["sent"] - counts["failed"]
+    counts["done"] = batch.dispatched_at is not None and not counts["waiting"]
+    return counts
+
+
+def dispatch(batch_id):
+    """Queue the reminder emails of a batch; returns the number queued."""
+    batch = (
+        ReminderBatch.objects.select_related("school_year")
+        .filter(pk=batch_id, dispatched_at__isnull=True)
+        .first()
+    )
+    if batch is None:
+        return 0
+
+    render = compile_body(batch.body)
+    recipients = []
+    queued = []
+    emails = []
+    for parent in unpaid_parents(batch.school_year).order_by("last_name", "first_name"):
+        recipient = ReminderRecipient(
+            batch=batch,
+            person=parent,
+            address=parent.account.email,
+            balance=parent.balance,
+            status=ReminderRecipient.Status.QUEUED,
+        )
+        recipients.append(recipient)
+        try:
+            validate_email(recipient.address)
+        except ValidationError:
+            recipient.status = ReminderRecipient.Status.FAILED
+            recipient.error = "Invalid email address"
+            continue
+        queued.append(recipient)
+        emails.append(Email(
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[recipient.address],
+            subject=batch.subject,
+            message=render(
+                prenom=parent.first_name,
+                solde=str(parent.balance),
+                communication=communication(parent.references),
+            ),
+            message_id=_message_id(),
+            # Below the default: a reminder run must not hold up other mail.
+            priority=PRIORITY.low,
+            status=STATUS.queued,
+        ))
+
+    with transaction.atomic():
+        # A retried task must not queue the batch twice.
+        locked = ReminderBatch.objects.select_for_update().get(pk=batch.pk)
+        if locked.dispatched_at is not None:
+            return 0
+        Email.objects.bulk_create(emails)
+        for recipient, email in zip(queued, emails, strict=True):
+            recipient.email = email
+        ReminderRecipient.objects.bulk_create(recipients)
+        batch.dispatched_at = timezone.now()
+        batch.save(update_fields=["dispatched_at"])
+    if emails:
+        # Once committed, so the flush triggered by it sees the rows.
+        email_queued.send(sender=Email, emails=emails)
+    return len(emails)
+
+
+def _message_id():
+    if not get_message_id_enabled():
+        return None
+    return make_msgid(domain=get_message_id_fqdn())
@@ -0,0 +1,14 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+
+@shared_task(name="send_fee_reminders")
+def send_fee_reminders(batch_id):
+    """Queue the emails of a reminder batch (see finance.reminders)."""
+    from finance import reminders
+
+    queued = reminders.dispatch(batch_id)
+    logger.info(f"Queued {queued} fee reminders for batch {batch_id}")
+    return queued
@@ -7,6 +7,16 @@ app_name = "finance"
 urlpatterns = [
     path("", views.billing_overview, name="billing"),
     path("payment/", views.record_payment, name="record_payment"),
+    path("payment/persons/", views.payment_persons, name="payment_persons"),
     path("payment/history/<uuid:person_id>/", views.payment_history, name="payment_history"),
     path("reminders/", views.send_reminders, name="reminders"),
+    path("reminders/unpaid/", views.unpaid_balances, name="unpaid_balances"),
+    path("reminders/<int:batch_id>/", views.reminder_batch, name="reminder_batch"),
+    path(
+        "reminders/<int:batch_id>/progress/",
+        views.reminder_progress,
+        name="reminder_progress",
+    ),
+    path("import/", views.import_statement, name="import_statement"),
+    path("import/<int:import_id>/", views.bank_import_review, name="bank_import"),
 ]
@@ -1,35 +1,60 @@
 
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import Http404, HttpResponse
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from post_office import mail
 
-from members.models import Person, SchoolYear
+from members.models import Person, SchoolYear, Section
+from members.search import MIN_LENGTH, search_persons
 
-from .forms import PaymentForm, ReminderForm
+from . import bank_import, reminders
+from .forms import BankImportForm, PaymentForm, ReminderForm
 from .models import (
+    BankImport,
+    BankLine,
     CotisationConfig,
+    LedgerEntry,
     Payment,
-    calculate_balances,
-    get_adults_with_balance,
+    ReminderBatch,
+    billing_entries,
+    unpaid_parents,
 )
-
-
-def _is_tresorier(user):
+from .tasks import send_fee_reminders
+
+# Sort keys of the unpaid balances endpoint and their ordering.
+UNPAID_SORTS = {
+    "name": ["last_name", "first_name"],
+    "balance": ["balance", "last_name", "first_name"],
+}
+UNPAID_PER_PAGE = 50
+UNPAID_MAX_PER_PAGE = 500
+# Sort keys of the billing overview.
+BILLING_SORTS = {
+    "name": ["person__last_name", "person__first_name"],
+    "household": ["household__address", "person__last_name", "person__first_name"],
+    "due": ["due", "person__last_name"],
+    "paid": ["amount_paid", "person__last_name"],
+    "balance": ["balance", "person__last_name"],
+}
+BILLING_PER_PAGE = 50
+BILLING_MAX_PER_PAGE = 500
+
+
+def _is_tresorier(request):
     """Check if user has Trésorier role."""
-    if not hasattr(user, "person"):
-        return False
-    return user.person.roles.filter(short="t").exists()
+    return request.viewer.is_tresorier
 
 
-def _check_access(user):
+def _check_access(request):
     """Return True if user can access finance views."""
-    return _is_tresorier(user) or user.is_staff
+    return _is_tresorier(request) or request.user.is_staff
 
 
 def _is_htmx(request):
@@ -37,10 +62,45 @@ def _is_htmx(request):
     return request.META.get("HTTP_HX_REQUEST") == "true"
 
 
+def _sorting(request, sorts, default):
+    """Return (sort, direction, ordering) from ``?sort=&direction=``."""
+    sort = request.GET.get("sort", default)
+    if sort not in sorts:
+        sort = default
+    direction = "desc" if request.GET.get("direction") == "desc" else "asc"
+    ordering = sorts[sort]
+    if direction == "desc":
+        ordering = [f"-{field}" for field in ordering]
+    return sort, direction, ordering
+
+
+def _find_person(person_id):
+    """The Person of a posted or linked id, or None."""
+    if not person_id:
+        return None
+    try:
+        return Person.objects.filter(pk=person_id).first()
+    except ValidationError:
+        return None
+
+
+def _per_page(request, default, maximum):
+    try:
+        per_page = int(request.GET.get("per_page", default))
+    except ValueError:
+        per_page = default
+    return min(max(per_page, 1), maximum)
+
+
 @login_required
 def billing_overview(request):
-    """Overview of all household balances for the current year."""
-    if not _is_tresorier(request.user) and not request.user.is_staff:
+    """Balances of the current year, filtered, sorted and paginated.
+
+    ``?status=paid|unpaid|late&section=<id>&sort=...&direction=asc|desc
+    &page=N&per_page=N``. Children are paginated; the animators, a few
+    dozen at most, are listed on every page.
+    """
+    if not _is_tresorier(request) and not request.user.is_staff:
         raise Http404
 
     current_year = SchoolYear.current()
@@ -48,31 +108,60 @@ def billing_overview(request):
         messages.error(request, _("No current school year defined."))
         return redirect("homepage")
 
-    config = CotisationConfig.get_for_year(current_year)
-    balances = calculate_balances(current_year)
-
-    # Enrich with person data
-    person_ids = [b["person_id"] for b in balances]
-    persons = {p.pk: p for p in Person.objects.filter(pk__in=person_ids)}
-    for b in balances:
-        b["person"] = persons.get(b["person_id"])
+    sort, direction, ordering = _sorting(request, BILLING_SORTS, "name")
+    per_page = _per_page(request, BILLING_PER_PAGE, BILLING_MAX_PER_PAGE)
+
+    entries = billing_entries(current_year)
+    status = request.GET.get("status", "")
+    if status == "paid":
+        entries = entries.filter(balance__lte=0)
+    elif status == "unpaid":
+        entries = entries.filter(balance__gt=0)
+    elif status == "late":
+        entries = entries.filter(is_late=True)
+    else:
+        status = ""
+    sections = list(Section.objects.select_related("branch").order_by("name"))
+    section = request.GET.get("section", "")
+    if section.isdigit():
+        entries = entries.filter(section_id=int(section))
+    else:
+        section = ""
 
-    # Split into children and animateurs
-    children_balances = [b for b in balances if b["person"] and b["person"].primary_role.short == "e"]
-    animateur_balances = [b for b in balances if b["person"] and b["person"].primary_role.short in ["a", "ar"]]
+    entries = entries.order_by(*ordering, "pk")
+    children = Paginator(
+        entries.exclude(kind=LedgerEntry.Kind.ANIMATEUR), per_page
+    ).get_page(request.GET.get("page"))
+    animateurs = list(entries.filter(kind=LedgerEntry.Kind.ANIMATEUR))
+    sections_by_id = {s.pk: s for s in sections}
+    for entry in [*children, *animateurs]:
+        entry.section = sections_by_id.get(entry.section_id)
 
     return render(request, "finance/billing_overview.html", {
-        "config": config,
+        "config": CotisationConfig.get_for_year(current_year),
         "school_year": current_year,
-        "children_balances": children_balances,
-        "animateur_balances": animateur_balances,
+        "page_obj": children,
+        "animateur_balances": animateurs,
+        "sections": sections,
+        "sort_fields": [
+            ("name", _("Name")),
+            ("household", _("Household")),
+            ("due", _("Due")),
+            ("paid", _("Paid")),
+            ("balance", _("Balance")),
+        ],
+        "current_sort": sort,
+        "current_direction": direction,
+        "status": status,
+        "section": section,
+        "per_page": per_page,
     })
 
 
 @login_required
 def record_payment(request):
     """Trésorier records a payment for a person."""
-    if not _check_access(request.user):
+    if not _check_access(request):
         raise Http404
 
     current_year = SchoolYear.current()
@@ -85,7 +174,7 @@ def record_payment(request):
     if request.method == "POST":
         form = PaymentForm(request.POST)
         if form.is_valid():
-            person = Person.objects.filter(pk=form.cleaned_data["person_id"]).first()
+            person = _find_person(form.cleaned_data["person_id"])
             if not person:
                 if _is_htmx(request):
                     return HttpResponse("")
@@ -117,15 +206,30 @@ def record_payment(request):
             initial["person_id"] = person_id
         form = PaymentForm(initial=initial)
 
+    context = {"form": form, "person": _find_person(form["person_id"].value())}
     if _is_htmx(request):
-        return render(request, "finance/record_payment_modal.html", {"form": form})
-    return render(request, "finance/record_payment.html", {"form": form})
+        return render(request, "finance/record_payment_modal.html", context)
+    return render(request, "finance/record_payment.html", context)
+
+
+@login_required
+def payment_persons(request):
+    """Typeahead of the payment form: the persons best matching ``?q=``."""
+    if not _check_access(request):
+        raise Http404
+    query = request.GET.get("q", "")
+    return render(request, "finance/_person_choices.html", {
+        "persons": search_persons(query),
+        "searched": len(query.strip()) >= MIN_LENGTH,
+        # Results reload the payment modal instead of the page.
+        "modal": request.GET.get("modal") == "1",
+    })
 
 
 @login_required
 def payment_history(request, person_id):
     """Show payment history for a person in an HTMX modal."""
-    if not _check_access(request.user):
+    if not _check_access(request):
         raise Http404
 
     current_year = SchoolYear.current()
@@ -149,7 +253,7 @@ def payment_history(request, person_id):
 @login_required
 def send_reminders(request):
     """Bulk send reminder emails to adults with unpaid balances."""
-    if not _is_tresorier(request.user) and not request.user.is_staff:
+    if not _is_tresorier(request) and not request.user.is_staff:
         raise Http404
 
     current_year = SchoolYear.current()
@@ -157,40 +261,193 @@ def send_reminders(request):
         messages.error(request, _("No current school year defined."))
         return redirect("homepage")
 
-    adults = get_adults_with_balance(current_year)
-
     if request.method == "POST":
         form = ReminderForm(request.POST)
         if form.is_valid():
-            sent_count = 0
-            for adult in adults:
-                body = form.cleaned_data["body"]
-                body = body.replace("{prenom}", adult["person"].first_name)
-                body = body.replace("{solde}", str(adult["balance"]))
-
-                try:
-                    mail.send(
-                        recipients=[adult["email"]],
-                        sender=settings.DEFAULT_FROM_EMAIL,
-                        subject=form.cleaned_data["subject"],
-                        message=body,
-                    )
-                except Exception:
-                    messages.error(
-                        request,
-                        _("Failed to send to %(email)s.") % {"email": adult["email"]},
-                    )
-                sent_count += 1
-
-            messages.success(
-                request,
-                _("Reminders sent to %(count)s adult(s).") % {"count": sent_count},
+            batch = ReminderBatch.objects.create(
+                school_year=current_year,
+                subject=form.cleaned_data["subject"],
+                body=form.cleaned_data["body"],
+                created_by=request.user.person,
             )
-            return redirect("finance:billing")
+            batch_id = batch.pk
+            transaction.on_commit(lambda: send_fee_reminders.delay(batch_id))
+            messages.success(request, _("Reminders are being queued."))
+            return redirect("finance:reminder_batch", batch_id=batch_id)
     else:
         form = ReminderForm()
 
+    # The recipient list itself is loaded page by page from unpaid_balances.
     return render(request, "finance/send_reminders.html", {
         "form": form,
-        "adults": adults,
+        "adult_count": unpaid_parents(current_year).count(),
+        "batches": ReminderBatch.objects.filter(school_year=current_year)[:5],
+    })
+
+
+def _get_batch(request, batch_id):
+    if not _check_access(request):
+        raise Http404
+    batch = ReminderBatch.objects.filter(pk=batch_id).first()
+    if batch is None:
+        raise Http404
+    return batch
+
+
+@login_required
+def reminder_batch(request, batch_id):
+    """A reminder batch: sending progress and the status of each recipient."""
+    batch = _get_batch(request, batch_id)
+    recipients = (
+        batch.recipients.select_related("person", "email")
+        .order_by("person__last_name", "person__first_name")
+    )
+    return render(request, "finance/reminder_batch.html", {
+        "batch": batch,
+        "recipients": recipients,
+        "progress": reminders.progress(batch),
+    })
+
+
+@login_required
+def reminder_progress(request, batch_id):
+    """Sending progress of a reminder batch: JSON, or the polled HTMX fragment."""
+    batch = _get_batch(request, batch_id)
+    progress = reminders.progress(batch)
+
+    if not _is_htmx(request):
+        return JsonResponse({"id": batch.pk, **progress})
+    return render(request, "finance/_reminder_progress.html", {
+        "batch": batch,
+        "progress": progress,
+    })
+
+
+@login_required
+def unpaid_balances(request):
+    """Parents with an unpaid balance, one page at a time.
+
+    ``?sort=name|balance&direction=asc|desc&page=N&per_page=N``. Answers
+    JSON, or for HTMX the table rows of the page followed by a row that
+    loads the next page once scrolled into view.
+    """
+    if not _check_access(request):
+        raise Http404
+
+    current_year = SchoolYear.current()
+    if not current_year:
+        raise Http404
+
+    sort, direction, ordering = _sorting(request, UNPAID_SORTS, "name")
+    per_page = _per_page(request, UNPAID_PER_PAGE, UNPAID_MAX_PER_PAGE)
+
+    parents = unpaid_parents(current_year).order_by(*ordering, "pk")
+    page = Paginator(parents, per_page).get_page(request.GET.get("page"))
+
+    if not _is_htmx(request):
+        return JsonResponse({
+            "count": page.paginator.count,
+            "page": page.number,
+            "num_pages": page.paginator.num_pages,
+            "results": [
+                {
+                    "id": str(parent.pk),
+                    "name": str(parent),
+                    "email": parent.account.email,
+                    "children_names": parent.children_names,
+                    "balance": str(parent.balance),
+                }
+                for parent in page
+            ],
+        })
+    return render(request, "finance/_unpaid_balances.html", {
+        "page": page,
+        "sort": sort,
+        "direction": direction,
+        "per_page": per_page,
+    })
+
+
+@login_required
+def import_statement(request):
+    """Upload a bank statement; its lines are matched to persons right away."""
+    if not _check_access(request):
+        raise Http404
+
+    current_year = SchoolYear.current()
+    if not current_year:
+        messages.error(request, _("No current school year defined."))
+        return redirect("homepage")
+
+    if request.method == "POST":
+        form = BankImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                statement = bank_import.import_statement(
+                    form.cleaned_data["file"], current_year, request.user.person
+                )
+            except bank_import.StatementError as error:
+                messages.error(request, _("Could not read the statement: %(error)s") % {"error": error})
+            else:
+                return redirect("finance:bank_import", import_id=statement.pk)
+    else:
+        form = BankImportForm()
+
+    return render(request, "finance/import_statement.html", {
+        "form": form,
+        "imports": BankImport.objects.filter(school_year=current_year)
+        .annotate(line_count=Count("lines"))[:10],
+    })
+
+
+@login_required
+def bank_import_review(request, import_id):
+    """Review the matches of an imported statement and record its payments."""
+    if not _check_access(request):
+        raise Http404
+    statement = BankImport.objects.select_related("school_year").filter(pk=import_id).first()
+    if statement is None:
+        raise Http404
+
+    if request.method == "POST":
+        choices = {}
+        for key, value in request.POST.items():
+            if key.startswith("line-") and key[5:].isdigit() and value.strip():
+                choices[int(key[5:])] = value.strip()
+        bank_import.review(statement, choices)
+        if "record" in request.POST:
+            count = bank_import.record(statement, request.user.person)
+            messages.success(request, _("%(count)d payment(s) recorded.") % {"count": count})
+        return redirect("finance:bank_import", import_id=statement.pk)
+
+    lines = list(statement.lines.all())
+    # One query for the names of every person the lines point to.
+    person_ids = {
+        person_id
+        for line in lines
+        for person_id in [*line.person_ids, *(pid for ids in line.candidates for pid in ids)]
+    }
+    names = {
+        str(person.pk): str(person)
+        for person in Person.objects.filter(pk__in=person_ids).only("first_name", "last_name")
+    }
+    for line in lines:
+        line.persons = [names.get(pid, pid) for pid in line.person_ids]
+        line.choices = [
+            (f"c{index}", ", ".join(names.get(pid, pid) for pid in ids))
+            for index, ids in enumerate(line.candidates)
+        ]
+
+    by_status = {status: [] for status in BankLine.Status.values}
+    for line in lines:
+        by_status[line.status].append(line)
+    return render(request, "finance/bank_import_review.html", {
+        "statement": statement,
+        "matched": by_status[BankLine.Status.MATCHED],
+        "to_review": by_status[BankLine.Status.AMBIGUOUS] + by_status[BankLine.Status.UNMATCHED],
+        "ignored": by_status[BankLine.Status.IGNORED],
+        "recorded": by_status[BankLine.Status.RECORDED],
+        "entries": LedgerEntry.objects.filter(school_year=statement.school_year)
+        .select_related("person")
+        .order_by("person__last_name", "person__first_name"),
     })
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from homepage.models import Event, ImageAsset, SiteContent
+from homepage.models import CalendarFeed, Event, ImageAsset, SiteContent
 
 
 @admin.register(Event)
@@ -32,3 +32,14 @@ class SiteContentAdmin(admin.ModelAdmin):
 class ImageAssetAdmin(admin.ModelAdmin):
     list_display = ("original_name", "file", "created_at")
     search_fields = ("original_name",)
+
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    """Deleting a feed revokes its URL; the person gets a new one on the agenda."""
+
+    list_display = ("person", "section", "created_at")
+    list_filter = ("section",)
+    search_fields = ("person__first_name", "person__last_name")
+    readonly_fields = ("token", "created_at")
+    raw_id_fields = ("person",)
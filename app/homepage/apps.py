@@ -4,3 +4,46 @@ from django.apps import AppConfig
 class HomepageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'homepage'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import asset_library, calendar, page_cache
+
+        # Rows the cached public pages are rendered from.
+        for model in ("homepage.SiteContent", "homepage.Event", "members.Section"):
+            for signal, event in ((post_save, "saved"), (post_delete, "deleted")):
+                signal.connect(
+                    page_cache.invalidate,
+                    sender=model,
+                    dispatch_uid=f"page_cache_{model}_{event}",
+                )
+        post_save.connect(
+            page_cache.invalidate,
+            sender="members.SiteSettings",
+            dispatch_uid="page_cache_site_settings_saved",
+        )
+        # Rows the calendar feeds are serialized from.
+        for model in ("homepage.Event", "members.Section"):
+            for signal, event in ((post_save, "saved"), (post_delete, "deleted")):
+                signal.connect(
+                    calendar.invalidate,
+                    sender=model,
+                    dispatch_uid=f"calendar_{model}_{event}",
+                )
+        post_save.connect(
+            calendar.invalidate,
+            sender="members.SiteSettings",
+            dispatch_uid="calendar_site_settings_saved",
+        )
+        post_delete.connect(
+            calendar.forget_token,
+            sender="homepage.CalendarFeed",
+            dispatch_uid="calendar_feed_deleted",
+        )
+        for signal, event in ((post_save, "saved"), (post_delete, "deleted")):
+            signal.connect(
+                asset_library.invalidate,
+                sender="homepage.ImageAsset",
+                dispatch_uid=f"asset_library_{event}",
+            )
@@ -0,0 +1,116 @@
+"""Paged listing of the editor's image library.
+
+The editor no longer embeds every ImageAsset on page load: its asset
+manager fetches pages of PAGE_SIZE assets, newest first, as the superuser
+scrolls or searches. Pages are cursor-based (the creation time and id of
+the last asset shown), so an upload between two fetches neither repeats
+nor skips an asset.
+
+Serialized pages are kept in the shared cache under a version bumped on
+every ImageAsset write (see HomepageConfig.ready()); the version also
+gives the listing its ETag.
+"""
+
+import base64
+import binascii
+import hashlib
+import uuid
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ImageAsset
+
+VERSION_KEY = "homepage:assets_version"
+PAGE_KEY = "homepage:assets"
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+TIMEOUT = 24 * 60 * 60
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_page(cursor="", search="", limit=PAGE_SIZE):
+    """Return {"assets": [...], "next": cursor or None, "etag": str}.
+
+    Raises InvalidCursor for a cursor this module did not produce.
+    """
+    version = _version()
+    digest = hashlib.md5(
+        f"{version}:{cursor}:{search}:{limit}".encode(), usedforsecurity=False
+    ).hexdigest()
+    key = f"{PAGE_KEY}:{digest}"
+    page = cache.get(key)
+    if page is None:
+        page = _load(cursor, search, limit)
+        page["etag"] = digest
+        cache.set(key, page, TIMEOUT)
+    return page
+
+
+def serialize(asset):
+    """What the editor's asset manager shows of an asset."""
+    sources = (asset.manifest or {}).get("sources", {}).get("image/webp")
+    src = asset.file.url
+    return {
+        "src": src,
+        "name": asset.original_name,
+        # Smallest variant, once generated (see homepage.images).
+        "thumbnail": sources[0][1] if sources else src,
+    }
+
+
+def invalidate(**kwargs):
+    """Signal receiver: every cached page is loaded again on next use."""
+    _bump()
+    # Again once committed, in case a request cached the old rows meanwhile.
+    transaction.on_commit(_bump)
+
+
+def _load(cursor, search, limit):
+    assets = ImageAsset.objects.order_by("-created_at", "-pk")
+    if search:
+        assets = assets.filter(original_name__icontains=search)
+    if cursor:
+        created_at, pk = _decode(cursor)
+        assets = assets.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+    # One extra row tells whether there is a next page.
+    rows = list(assets.only("file", "original_name", "manifest", "created_at")[: limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "assets": [serialize(asset) for asset in rows],
+        "next": _encode(rows[-1]) if more else None,
+    }
+
+
+def _encode(asset):
+    raw = f"{asset.created_at.isoformat()}|{asset.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise InvalidCursor(cursor) from error
+
+
+def _bump():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
@@ -0,0 +1,200 @@
+"""iCalendar feeds of the agenda.
+
+A CalendarFeed row gives a person a private URL for the whole unit or for
+one section (a section feed also carries the unit-wide events). Calendar
+apps poll these URLs every few minutes, so a feed is served from the shared
+cache:
+
+- the token resolves to its section through a cache entry, dropped when the
+  feed is deleted;
+- the serialized feed and its strong ETag are cached per section and
+  language, under a version bumped whenever an Event, Section or the site
+  settings change (see HomepageConfig.ready()).
+
+A poll with a matching If-None-Match is answered with a 304 without a
+query.
+"""
+
+import hashlib
+import uuid
+from datetime import UTC, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import translation
+
+from members.models import Section, SiteSettings
+
+from .models import CalendarFeed, Event
+
+VERSION_KEY = "homepage:calendar_version"
+FEED_KEY = "homepage:calendar"
+TOKEN_KEY = "homepage:calendar_token"
+TIMEOUT = 24 * 60 * 60
+
+PRODID = "-//TroopConnect//Agenda//FR"
+# Content lines are folded at 75 octets (RFC 5545, 3.1).
+LINE_LENGTH = 75
+# Marks a cached miss, so unknown tokens are not looked up again each poll.
+UNKNOWN = "unknown"
+
+
+def feeds_for(person_id, section_ids):
+    """Return the unit-wide feed of a person, then one per section, creating
+    the missing ones.
+
+    Read first: the agenda calls this on every page view and only writes
+    the first time, or when the person joins a section.
+    """
+    wanted = [None, *sorted(section_ids)]
+    feeds = _feeds(person_id)
+    missing = [section_id for section_id in wanted if section_id not in feeds]
+    if missing:
+        CalendarFeed.objects.bulk_create(
+            [CalendarFeed(person_id=person_id, section_id=section_id) for section_id in missing],
+            # Another request may have created them meanwhile.
+            ignore_conflicts=True,
+        )
+        feeds = _feeds(person_id)
+    return [feeds[section_id] for section_id in wanted if section_id in feeds]
+
+
+def _feeds(person_id):
+    return {
+        feed.section_id: feed
+        for feed in CalendarFeed.objects.filter(person_id=person_id).select_related(
+            "section"
+        )
+    }
+
+
+def resolve(token):
+    """Return the feed of a token as {"section": id or None}, or None."""
+    key = f"{TOKEN_KEY}:{token}"
+    feed = cache.get(key)
+    if feed is None:
+        row = CalendarFeed.objects.filter(token=token).values("section_id").first()
+        feed = {"section": row["section_id"]} if row else UNKNOWN
+        cache.set(key, feed, TIMEOUT)
+    return None if feed == UNKNOWN else feed
+
+
+def get_feed(section_id):
+    """Return {"ics", "etag"} for a section's feed (None: unit-wide)."""
+    key = ":".join(
+        [FEED_KEY, _version(), str(section_id or "all"), translation.get_language()]
+    )
+    feed = cache.get(key)
+    if feed is None:
+        ics = serialize(_events(section_id), _name(section_id))
+        feed = {
+            "ics": ics,
+            "etag": hashlib.md5(ics.encode(), usedforsecurity=False).hexdigest(),
+        }
+        cache.set(key, feed, TIMEOUT)
+    return feed
+
+
+def serialize(events, name):
+    """Render events as an iCalendar document (all-day VEVENTs)."""
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for event in events:
+        stamp = _timestamp(event.updated_at or event.created_at)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{event.pk}@troopconnect",
+            f"DTSTAMP:{stamp}",
+            f"LAST-MODIFIED:{stamp}",
+            f"DTSTART;VALUE=DATE:{event.date:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{event.date + timedelta(days=1):%Y%m%d}",
+            f"SUMMARY:{_escape(event.title)}",
+        ]
+        if event.description:
+            lines.append(f"DESCRIPTION:{_escape(event.description)}")
+        if event.section_id:
+            lines.append(f"CATEGORIES:{_escape(event.section.name or '')}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def invalidate(**kwargs):
+    """Signal receiver: every feed is serialized again on next poll."""
+    _bump()
+    # Again once committed, in case a poll cached the old rows meanwhile.
+    transaction.on_commit(_bump)
+
+
+def forget_token(sender, instance, **kwargs):
+    """CalendarFeed post_delete receiver: the token stops working."""
+    cache.delete(f"{TOKEN_KEY}:{instance.token}")
+
+
+def _name(section_id):
+    name = SiteSettings.get_settings().site_name or ""
+    if section_id is not None:
+        section = Section.objects.filter(pk=section_id).values_list("name", flat=True)
+        name = " - ".join(filter(None, [name, section.first()]))
+    return name
+
+
+def _events(section_id):
+    events = Event.objects.select_related("section").order_by("date", "title", "pk")
+    if section_id is not None:
+        events = events.filter(Q(section_id=section_id) | Q(section__isnull=True))
+    return events
+
+
+def _escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Split a content line into chunks of at most 75 octets, never inside
+    a UTF-8 character."""
+    data = line.encode()
+    if len(data) <= LINE_LENGTH:
+        return line
+    chunks = []
+    start = 0
+    limit = LINE_LENGTH
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Back off to the start of a character (continuation bytes are 10xxxxxx).
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(data[start:end].decode())
+        start = end
+        # Continuation lines start with a space, which counts.
+        limit = LINE_LENGTH - 1
+    return "\r\n ".join(chunks)
+
+
+def _timestamp(value):
+    return value.astimezone(UTC).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _bump():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
@@ -0,0 +1,166 @@
+"""Responsive variants of the images uploaded through the editor.
+
+Uploads are stored as they come (often full-size camera photos). The
+generate_image_variants task then writes AVIF and WebP copies at a few
+widths and a tiny placeholder, and records them in
+ImageAsset.manifest:
+
+    {"width": 4000, "height": 3000, "placeholder": "data:image/webp;base64,...",
+     "sources": {"image/avif": [[480, url], ...], "image/webp": [...]}}
+
+SiteContent.save() rewrites the <img> tags of the saved HTML that show such
+an asset into a <picture> offering the variants (see rewrite_html), and the
+task saves again the pages already showing an image once its variants
+exist. The editor keeps working on the original images.
+"""
+
+import base64
+import html as html_lib
+import io
+import re
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+WIDTHS = (480, 960, 1600)
+# Best first: browsers take the first <source> they support.
+FORMATS = (("AVIF", "image/avif", "avif"), ("WEBP", "image/webp", "webp"))
+QUALITY = 70
+PLACEHOLDER_WIDTH = 16
+SIZES = "(max-width: 1600px) 100vw, 1600px"
+# Animated or vector images are served as uploaded.
+SKIPPED_EXTENSIONS = {"gif", "svg"}
+
+_IMG_RE = re.compile(r"<img\b(?:\"[^\"]*\"|'[^']*'|[^>])*>", re.IGNORECASE)
+_ATTR_RE = re.compile(
+    r"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""",
+)
+
+
+def generate(asset):
+    """Write the variants of an ImageAsset; returns its manifest ({} when the
+    file is not a raster image Pillow can read)."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    extension = asset.file.name.rsplit(".", 1)[-1].lower()
+    if extension in SKIPPED_EXTENSIONS:
+        return {}
+    try:
+        with asset.file.open("rb") as upload:
+            image = Image.open(upload)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return {}
+    image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+    width, height = image.size
+
+    storage = asset.file.storage
+    # Never enlarged: a narrower upload gets its own width as the largest.
+    widths = sorted({w for w in WIDTHS if w < width} | {min(width, WIDTHS[-1])})
+    sources = {}
+    for pil_format, mime, extension in FORMATS:
+        sources[mime] = []
+        for target in widths:
+            resized = image.resize(
+                (target, max(round(height * target / width), 1)), Image.LANCZOS
+            )
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, quality=QUALITY)
+            name = storage.save(
+                f"homepage_images/variants/{asset.pk}/{target}.{extension}",
+                ContentFile(buffer.getvalue()),
+            )
+            sources[mime].append([target, storage.url(name)])
+
+    # Shown while the image loads; it would stay visible behind transparent
+    # pixels, so opaque images only.
+    placeholder = None
+    if image.mode == "RGB":
+        tiny = image.resize(
+            (PLACEHOLDER_WIDTH, max(round(height * PLACEHOLDER_WIDTH / width), 1))
+        )
+        buffer = io.BytesIO()
+        tiny.save(buffer, "WEBP", quality=30)
+        placeholder = "data:image/webp;base64," + base64.b64encode(
+            buffer.getvalue()
+        ).decode()
+    return {"width": width, "height": height, "placeholder": placeholder, "sources": sources}
+
+
+def media_name(src):
+    """The storage name behind a media URL, or None for other URLs."""
+    path = urlsplit(html_lib.unescape(src)).path
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    return unquote(path[len(settings.MEDIA_URL):])
+
+
+def image_names(html):
+    """Storage names of the media images an HTML fragment shows."""
+    names = set()
+    for tag in _IMG_RE.findall(html or ""):
+        src = _attributes(tag).get("src")
+        name = media_name(src) if src else None
+        if name:
+            names.add(name)
+    return names
+
+
+def rewrite_html(html, manifests):
+    """Offer the variants of the images of an HTML fragment.
+
+    ``manifests`` maps storage names to ImageAsset manifests. Tags already
+    carrying a srcset are left alone, so rewriting twice changes nothing.
+    """
+    if not html or not manifests:
+        return html
+
+    def rewrite(match):
+        tag = match.group(0)
+        attributes = _attributes(tag)
+        if "srcset" in attributes or "src" not in attributes:
+            return tag
+        manifest = manifests.get(media_name(attributes["src"]))
+        if not manifest or not manifest.get("sources"):
+            return tag
+
+        extra = {
+            "srcset": _srcset(manifest["sources"]["image/webp"]),
+            "sizes": SIZES,
+            "loading": "lazy",
+            "decoding": "async",
+        }
+        if manifest.get("placeholder") and "style" not in attributes:
+            extra["style"] = (
+                f"background-image:url({manifest['placeholder']});background-size:cover"
+            )
+        added = "".join(
+            f' {name}="{html_lib.escape(str(value))}"' for name, value in extra.items()
+        )
+        img = tag[:-2].rstrip() + added + " />" if tag.endswith("/>") else tag[:-1] + added + ">"
+        sources = "".join(
+            f'<source type="{mime}" srcset="{html_lib.escape(_srcset(variants))}"'
+            f' sizes="{SIZES}">'
+            for mime, variants in manifest["sources"].items()
+            if mime != "image/webp"
+        )
+        return f"<picture>{sources}{img}</picture>"
+
+    return _IMG_RE.sub(rewrite, html)
+
+
+def _srcset(variants):
+    return ", ".join(f"{url} {width}w" for width, url in variants)
+
+
+def _attributes(tag):
+    """Lowercased attribute names of an <img> tag and their raw values."""
+    inner = tag[4:].rstrip(">").rstrip("/")
+    return {
+        match.group(1).lower(): next(
+            (value for value in match.groups()[1:] if value is not None), ""
+        )
+        for match in _ATTR_RE.finditer(inner)
+    }
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations
+
+from homepage.sanitize import sanitize
+
+
+def sanitize_saved_content(apps, schema_editor):
+    """Rows saved before the sanitizers existed are cleaned up once; the
+    pages render stored html/css as they are."""
+    SiteContent = apps.get_model("homepage", "SiteContent")
+    for content in SiteContent.objects.all():
+        fields = []
+        for lang in settings.MODELTRANSLATION_LANGUAGES:
+            html_field, css_field = f"html_{lang}", f"css_{lang}"
+            html, css = sanitize(
+                content.page, getattr(content, html_field), getattr(content, css_field)
+            )
+            if (html, css) != (getattr(content, html_field), getattr(content, css_field)):
+                setattr(content, html_field, html)
+                setattr(content, css_field, css)
+                fields += [html_field, css_field]
+        if fields:
+            content.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0003_imageasset_sitecontent'),
+    ]
+
+    operations = [
+        migrations.RunPython(sanitize_saved_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:38
+
+import django.db.models.deletion
+import homepage.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0004_sanitize_sitecontent'),
+        ('members', '0020_household'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='CalendarFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=homepage.models.new_feed_token, max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feeds', to='members.person')),
+                ('section', models.ForeignKey(blank=True, help_text='Empty for the unit-wide feed.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feeds', to='members.section')),
+            ],
+            options={
+                'verbose_name': 'Calendar feed',
+                'verbose_name_plural': 'Calendar feeds',
+                'constraints': [models.UniqueConstraint(fields=('person', 'section'), name='calendar_feed_unique', nulls_distinct=False)],
+            },
+        ),
+    ]
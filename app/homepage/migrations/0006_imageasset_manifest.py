@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0005_calendar_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='manifest',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
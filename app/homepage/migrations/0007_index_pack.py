@@ -0,0 +1,19 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0006_imageasset_manifest'),
+        ('members', '0021_index_pack'),
+        ('messaging', '0007_index_pack'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date'], name='event_date'),
+        ),
+    ]
@@ -1,10 +1,15 @@
+import secrets
 from datetime import timedelta
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from homepage import images
+from homepage.sanitize import sanitize
+
 
 class Event(models.Model):
     title = models.CharField(max_length=200, verbose_name=_("Title"))
@@ -26,9 +31,11 @@ class Event(models.Model):
         related_name="created_event",
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["date", "title"]
+        indexes = [models.Index(fields=["date"], name="event_date")]
 
     def __str__(self):
         return f"{self.title} ({self.date:%d/%m/%Y})"
@@ -68,7 +75,8 @@ class SiteContent(models.Model):
     """Superuser-edited page content (GrapesJS output) for one editable page.
 
     One row per page slug. `project_json` is the editing source of truth;
-    `html`/`css` are the render outputs GrapesJS produced at save time.
+    `html`/`css` are the render outputs GrapesJS produced at save time,
+    sanitized on save (see homepage.sanitize) so pages render them as stored.
     Translated fields (fr/nl/en) fall back to French when unset (NULL).
     """
 
@@ -89,6 +97,31 @@ class SiteContent(models.Model):
     def __str__(self):
         return self.get_page_display()
 
+    def save(self, *args, **kwargs):
+        for lang in settings.MODELTRANSLATION_LANGUAGES:
+            html, css = sanitize(
+                self.page, getattr(self, f"html_{lang}"), getattr(self, f"css_{lang}")
+            )
+            setattr(self, f"html_{lang}", html)
+            setattr(self, f"css_{lang}", css)
+        self._offer_image_variants()
+        super().save(*args, **kwargs)
+
+    def _offer_image_variants(self):
+        """Point the images of every language at their variants (see
+        homepage.images)."""
+        fields = [f"html_{lang}" for lang in settings.MODELTRANSLATION_LANGUAGES]
+        names = set().union(*(images.image_names(getattr(self, field)) for field in fields))
+        if not names:
+            return
+        manifests = dict(
+            ImageAsset.objects.filter(file__in=names)
+            .exclude(manifest={})
+            .values_list("file", "manifest")
+        )
+        for field in fields:
+            setattr(self, field, images.rewrite_html(getattr(self, field), manifests))
+
     @classmethod
     def get_content(cls, page):
         """Return the row for `page`, or None when the page was never edited."""
@@ -103,6 +136,8 @@ class ImageAsset(models.Model):
         validators=[validate_image_extension],
     )
     original_name = models.CharField(max_length=255)
+    # Responsive variants, filled in by the generate_image_variants task.
+    manifest = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -112,3 +147,43 @@ class ImageAsset(models.Model):
 
     def __str__(self):
         return self.original_name
+
+
+def new_feed_token():
+    return secrets.token_urlsafe(32)
+
+
+class CalendarFeed(models.Model):
+    """Private iCalendar feed URL of a person: unit-wide, or for one section.
+
+    The token is the only credential of the URL calendar apps poll;
+    deleting the row revokes it.
+    """
+
+    token = models.CharField(max_length=64, unique=True, default=new_feed_token)
+    person = models.ForeignKey(
+        "members.Person", on_delete=models.CASCADE, related_name="calendar_feeds"
+    )
+    section = models.ForeignKey(
+        "members.Section",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="calendar_feeds",
+        help_text=_("Empty for the unit-wide feed."),
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Calendar feed")
+        verbose_name_plural = _("Calendar feeds")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["person", "section"],
+                nulls_distinct=False,
+                name="calendar_feed_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.person} ({self.section or _('All sections')})"
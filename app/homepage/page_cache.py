@@ -0,0 +1,126 @@
+"""Shared cache of the public pages rendered for anonymous visitors.
+
+Home, FAQ and Agenda are mostly read by visitors who are not logged in, and
+look the same for all of them in a given language. AnonymousPageCacheMixin
+keeps their rendered HTML in the shared cache, keyed on the path, the active
+language, the day (the agenda hides past events) and a version that is
+bumped whenever a row they show is written: SiteContent, Event, Section or
+SiteSettings (see HomepageConfig.ready()).
+
+Pages embed the visitor's CSRF token (htmx headers, language form), so they
+are cached with a placeholder that is swapped for the token on every hit.
+Responses carry an ETag and Last-Modified: a browser revalidating an
+unchanged page gets a 304. The ETag covers the CSRF secret too, so a
+browser whose secret changed since never keeps a page with a stale token.
+"""
+
+import hashlib
+import uuid
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone, translation
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+VERSION_KEY = "homepage:page_version"
+KEY_PREFIX = "homepage:page"
+# Pages also expire on their own, so that a deploy changing the templates
+# shows up without a write.
+TIMEOUT = 60 * 60
+
+CSRF_PLACEHOLDER = "csrf-token-placeholder-0c3b9f"
+
+
+class AnonymousPageCacheMixin:
+    """Serve a TemplateView from the page cache to anonymous GET requests."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or not hasattr(response, "render"):
+                return response
+            response.context_data["csrf_token"] = CSRF_PLACEHOLDER
+            response.render()
+            entry = {
+                "content": response.content.decode(response.charset),
+                "content_type": response["Content-Type"],
+                "hash": hashlib.md5(response.content, usedforsecurity=False).hexdigest(),
+                "modified": timezone.now().timestamp(),
+            }
+            cache.set(key, entry, TIMEOUT)
+        return respond(request, entry)
+
+
+def cacheable(request):
+    """Whether a request may be answered from the page cache."""
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.GET
+        and not request.user.is_authenticated
+        # Flash messages are rendered into the page for this visitor only.
+        and not len(get_messages(request))
+    )
+
+
+def page_key(request):
+    return ":".join(
+        [
+            KEY_PREFIX,
+            _version(),
+            request.path,
+            translation.get_language(),
+            timezone.localdate().isoformat(),
+        ]
+    )
+
+
+def respond(request, entry):
+    """Build the response of a cached page, or a 304 when the visitor has it."""
+    token = get_token(request)
+    response = HttpResponse(
+        entry["content"].replace(CSRF_PLACEHOLDER, token),
+        content_type=entry["content_type"],
+    )
+    secret = request.META.get("CSRF_COOKIE", "")
+    etag = quote_etag(
+        hashlib.md5(f"{entry['hash']}:{secret}".encode(), usedforsecurity=False).hexdigest()
+    )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(entry["modified"])
+    # Per-visitor (CSRF token), always revalidated.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Cookie", "Accept-Language"))
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(entry["modified"]), response=response
+    )
+
+
+def invalidate(**kwargs):
+    """Signal receiver: every cached page is rendered again on next use."""
+    _bump()
+    # Again once committed, in case a request cached the old rows meanwhile.
+    transaction.on_commit(_bump)
+
+
+def _bump():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
@@ -0,0 +1,94 @@
+"""Clean up GrapesJS output before it is stored.
+
+SiteContent.save() runs these on every language of the html/css fields, so
+the stored values are exactly what the pages render and the views serve
+them as they are. Content saved before a rule existed is cleaned up by a
+data migration (see 0004_sanitize_sitecontent).
+"""
+
+import re
+
+# GrapesJS exports its canvas wrapper as a literal <body> element. Injected
+# mid-page, the browser merges that tag's attributes onto the real <body>,
+# so wrapper styling (padding, background…) shifts the whole page chrome.
+# The attribute part is quote-aware so a ">" inside an attribute cannot end
+# the tag early.
+_TAG_ATTRS = r"(?:\"[^\"]*\"|'[^']*'|[^>])"
+_WRAPPER_OPEN_RE = re.compile(
+    rf"^\s*(?:<html{_TAG_ATTRS}*>\s*)?<body{_TAG_ATTRS}*>", re.IGNORECASE
+)
+_WRAPPER_CLOSE_RE = re.compile(r"</body>\s*(?:</html>\s*)?$", re.IGNORECASE)
+# CSS selectors that target the page itself rather than editor content.
+_WRAPPER_SELECTORS = {"", "html", "body", "*"}
+
+
+# The FAQ page renders a fixed hat banner above edited content (like the
+# other pages). Content saved before the banner existed still embeds the
+# masthead card the old default snippet seeded, duplicating the title.
+# The Home page keeps its card (it is real content there, and "masthead"
+# carries no styling of its own).
+_FAQ_MASTHEAD_RE = re.compile(r"<header class=\"masthead\">.*?</header>", re.DOTALL)
+_FAQ_EMPTIED_CONTAINER_RE = re.compile(r"<div class=\"container row\">\s*</div>")
+
+
+def strip_legacy_faq_header(html):
+    """Drop the pre-banner masthead card (and its emptied wrapper) from FAQ HTML."""
+    if not html:
+        return html
+    html = _FAQ_MASTHEAD_RE.sub("", html)
+    html = _FAQ_EMPTIED_CONTAINER_RE.sub("", html)
+    return html.strip()
+
+
+def sanitize_html(html):
+    """Unwrap the GrapesJS <body> wrapper from saved editor HTML."""
+    if not html:
+        return html
+    html = _WRAPPER_OPEN_RE.sub("", html)
+    html = _WRAPPER_CLOSE_RE.sub("", html)
+    return html.strip()
+
+
+def sanitize_css(css):
+    """Drop wrapper-targeting (html/body/*) rules from saved editor CSS.
+
+    Scans rule by rule (brace-matching) so dropped rules cannot swallow the
+    next one, and recurses into at-rule blocks (@media…) to catch responsive
+    wrapper styling.
+    """
+    if not css:
+        return css
+    kept = []
+    pos = 0
+    while True:
+        brace = css.find("{", pos)
+        if brace == -1:
+            kept.append(css[pos:])
+            break
+        selector = css[pos:brace]
+        # Find the matching close brace, counting nested braces (@media…).
+        depth = 1
+        end = brace + 1
+        while end < len(css) and depth:
+            if css[end] == "{":
+                depth += 1
+            elif css[end] == "}":
+                depth -= 1
+            end += 1
+        selectors = [part.strip() for part in selector.split(",")]
+        if selectors and all(part in _WRAPPER_SELECTORS for part in selectors):
+            pass  # wrapper rule: drop selector + block entirely
+        elif selector.strip().startswith("@"):
+            kept.append(selector + "{" + sanitize_css(css[brace + 1 : end - 1]) + "}")
+        else:
+            kept.append(selector + css[brace:end])
+        pos = end
+    return "".join(kept).strip()
+
+
+def sanitize(page, html, css):
+    """Return the (html, css) of a page as stored: sanitized, "" as None."""
+    html = sanitize_html(html)
+    if page == "faq":
+        html = strip_legacy_faq_header(html)
+    return html or None, sanitize_css(css) or None
@@ -2,6 +2,7 @@ from datetime import timedelta
 
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.utils import timezone
 
 logger = get_task_logger(__name__)
@@ -22,3 +23,34 @@ def cleanup_old_events():
     else:
         logger.info("No old events to clean up")
     return deleted_count
+
+
+@shared_task(name="generate_image_variants")
+def generate_image_variants(asset_id):
+    """Write the responsive variants of an uploaded image (see homepage.images)
+    and rewrite the pages already showing it."""
+    from django.db.models import Q
+
+    from homepage import images
+    from homepage.models import ImageAsset, SiteContent
+
+    asset = ImageAsset.objects.filter(pk=asset_id).first()
+    if asset is None:
+        return 0
+    manifest = images.generate(asset)
+    if not manifest:
+        logger.info(f"No variants for image asset {asset_id}")
+        return 0
+    asset.manifest = manifest
+    asset.save(update_fields=["manifest"])
+
+    # Pages link the image by its URL, where a name like "été.jpg" is
+    # percent-encoded; the bare name covers links written by hand.
+    needles = {asset.file.name, asset.file.url}
+    shown = Q()
+    for lang in settings.MODELTRANSLATION_LANGUAGES:
+        for needle in needles:
+            shown |= Q(**{f"html_{lang}__contains": needle})
+    for content in SiteContent.objects.filter(shown):
+        content.save()
+    return sum(len(variants) for variants in manifest["sources"].values())
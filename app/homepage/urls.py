@@ -6,6 +6,11 @@ urlpatterns = [
     path("", views.HomePage.as_view(), name="homepage"),
     path("faq/", views.FAQ.as_view(), name="faq"),
     path("agenda/", views.Agenda.as_view(), name="agenda"),
+    path(
+        "agenda/feed/<str:token>.ics",
+        views.CalendarFeedView.as_view(),
+        name="calendar_feed",
+    ),
     path("editor/", views.HomePageEditorView.as_view(), name="homepage_editor"),
     path("editor/save/", views.HomePageEditorSaveView.as_view(), name="homepage_editor_save"),
     path(
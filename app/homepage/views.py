@@ -1,19 +1,26 @@
 import json
-import re
 from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.core.exceptions import ValidationError
-from django.http import HttpResponseBadRequest, JsonResponse
+from django.db import transaction
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import override
 from django.views import View
 from django.views.generic import TemplateView
 
+from homepage import asset_library, calendar
 from homepage.models import Event, ImageAsset, SiteContent
+from homepage.page_cache import AnonymousPageCacheMixin
+from homepage.tasks import generate_image_variants
+from members.viewer import viewer_for
 
 # Languages offered in the editor's language tabs (modeltranslation languages).
 EDITOR_LANGUAGES = settings.MODELTRANSLATION_LANGUAGES
@@ -25,46 +32,6 @@ EDITOR_SEED_TEMPLATES = {
     SiteContent.Page.FAQ: "homepage/snippets/faq_default.html",
 }
 
-# GrapesJS exports its canvas wrapper as a literal <body> element. Injected
-# mid-page, the browser merges that tag's attributes onto the real <body>,
-# so wrapper styling (padding, background…) shifts the whole page chrome.
-# The attribute part is quote-aware so a ">" inside an attribute cannot end
-# the tag early.
-_TAG_ATTRS = r"(?:\"[^\"]*\"|'[^']*'|[^>])"
-_WRAPPER_OPEN_RE = re.compile(
-    rf"^\s*(?:<html{_TAG_ATTRS}*>\s*)?<body{_TAG_ATTRS}*>", re.IGNORECASE
-)
-_WRAPPER_CLOSE_RE = re.compile(r"</body>\s*(?:</html>\s*)?$", re.IGNORECASE)
-# CSS selectors that target the page itself rather than editor content.
-_WRAPPER_SELECTORS = {"", "html", "body", "*"}
-
-
-# The FAQ page renders a fixed hat banner above edited content (like the
-# other pages). Content saved before the banner existed still embeds the
-# masthead card the old default snippet seeded, duplicating the title.
-# Stripped at both render and save; the Home page keeps its card (it is
-# real content there, and "masthead" carries no styling of its own).
-_FAQ_MASTHEAD_RE = re.compile(r"<header class=\"masthead\">.*?</header>", re.DOTALL)
-_FAQ_EMPTIED_CONTAINER_RE = re.compile(r"<div class=\"container row\">\s*</div>")
-
-
-def _strip_legacy_faq_header(html):
-    """Drop the pre-banner masthead card (and its emptied wrapper) from FAQ HTML."""
-    if not html:
-        return html
-    html = _FAQ_MASTHEAD_RE.sub("", html)
-    html = _FAQ_EMPTIED_CONTAINER_RE.sub("", html)
-    return html.strip()
-
-
-def _sanitize_html(html):
-    """Unwrap the GrapesJS <body> wrapper from saved editor HTML."""
-    if not html:
-        return html
-    html = _WRAPPER_OPEN_RE.sub("", html)
-    html = _WRAPPER_CLOSE_RE.sub("", html)
-    return html.strip()
-
 
 def _has_content(project_json):
     """Whether a saved project actually holds editable content.
@@ -85,61 +52,18 @@ def _has_content(project_json):
     return any(page.get("component") or page.get("components") for page in pages)
 
 
-def _sanitize_css(css):
-    """Drop wrapper-targeting (html/body/*) rules from saved editor CSS.
-
-    Scans rule by rule (brace-matching) so dropped rules cannot swallow the
-    next one, and recurses into at-rule blocks (@media…) to catch responsive
-    wrapper styling.
-    """
-    if not css:
-        return css
-    kept = []
-    pos = 0
-    while True:
-        brace = css.find("{", pos)
-        if brace == -1:
-            kept.append(css[pos:])
-            break
-        selector = css[pos:brace]
-        # Find the matching close brace, counting nested braces (@media…).
-        depth = 1
-        end = brace + 1
-        while end < len(css) and depth:
-            if css[end] == "{":
-                depth += 1
-            elif css[end] == "}":
-                depth -= 1
-            end += 1
-        selectors = [part.strip() for part in selector.split(",")]
-        if selectors and all(part in _WRAPPER_SELECTORS for part in selectors):
-            pass  # wrapper rule: drop selector + block entirely
-        elif selector.strip().startswith("@"):
-            kept.append(selector + "{" + _sanitize_css(css[brace + 1 : end - 1]) + "}")
-        else:
-            kept.append(selector + css[brace:end])
-        pos = end
-    return "".join(kept).strip()
-
-
 def _edited_context(page):
     """Context entries for rendering a page's edited content (if any)."""
     content = SiteContent.get_content(page)
     if content is None:
         return {"page_html": None, "page_css": None}
     # modeltranslation resolves the active language, falling back to French
-    # when the current language was never edited. Sanitizing at render (not
-    # only at save) also fixes content saved before the wrapper was stripped.
-    html = _sanitize_html(content.html)
-    if page == SiteContent.Page.FAQ:
-        html = _strip_legacy_faq_header(html)
-    return {
-        "page_html": html,
-        "page_css": _sanitize_css(content.css),
-    }
-
-
-class HomePage(TemplateView):
+    # when the current language was never edited. Stored values are already
+    # sanitized (SiteContent.save).
+    return {"page_html": content.html, "page_css": content.css}
+
+
+class HomePage(AnonymousPageCacheMixin, TemplateView):
     template_name = "homepage/home.html"
 
     def get_context_data(self, **kwargs):
@@ -148,7 +72,7 @@ class HomePage(TemplateView):
         return context
 
 
-class FAQ(TemplateView):
+class FAQ(AnonymousPageCacheMixin, TemplateView):
     template_name = "homepage/faq.html"
 
     def get_context_data(self, **kwargs):
@@ -157,7 +81,7 @@ class FAQ(TemplateView):
         return context
 
 
-class Agenda(TemplateView):
+class Agenda(AnonymousPageCacheMixin, TemplateView):
     template_name = "homepage/agenda.html"
 
     def get_context_data(self, **kwargs):
@@ -166,9 +90,36 @@ class Agenda(TemplateView):
         cutoff = today - timedelta(days=30)
         # Show events from the last 30 days onwards (future + recent past)
         context["events"] = Event.objects.filter(date__gte=cutoff).order_by("date")
+        viewer = viewer_for(self.request)
+        if viewer.has_person:
+            context["calendar_feeds"] = [
+                {
+                    "section": feed.section,
+                    "url": self.request.build_absolute_uri(
+                        reverse("calendar_feed", args=[feed.token])
+                    ),
+                }
+                for feed in calendar.feeds_for(viewer.person_id, viewer.nav_section_ids)
+            ]
         return context
 
 
+class CalendarFeedView(View):
+    """iCalendar feed behind a private token (see homepage.calendar)."""
+
+    def get(self, request, token):
+        feed = calendar.resolve(token)
+        if feed is None:
+            raise Http404
+        entry = calendar.get_feed(feed["section"])
+        etag = quote_etag(entry["etag"])
+        response = HttpResponse(entry["ics"], content_type="text/calendar; charset=utf-8")
+        response["ETag"] = etag
+        response["Content-Disposition"] = 'inline; filename="agenda.ics"'
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=etag, response=response)
+
+
 class HomePageEditorView(UserPassesTestMixin, TemplateView):
     """Full-page GrapesJS editor for the Home/FAQ content, superuser-only."""
 
@@ -210,12 +161,9 @@ class HomePageEditorView(UserPassesTestMixin, TemplateView):
         context["lang"] = lang
         context["project_json"] = project_json
         context["seed_html"] = seed_html
-        context["assets"] = [
-            {"src": asset.file.url, "name": asset.original_name}
-            for asset in ImageAsset.objects.all()
-        ]
         context["editor_strings"] = {
             "uploadFailed": str(_("Image upload failed.")),
+            "searchImages": str(_("Search images")),
             "saveFailed": str(_("Save failed.")),
             "catStructure": str(_("Structure")),
             "catBasic": str(_("Basic")),
@@ -253,37 +201,47 @@ class HomePageEditorSaveView(UserPassesTestMixin, View):
         if lang not in EDITOR_LANGUAGES:
             return HttpResponseBadRequest("Invalid language.")
 
-        # Empty string => None so a cleared language falls back to French.
         # The project arrives as a parsed JSON object; re-serialize it so the
         # TextField holds real JSON (str(dict) would store a Python repr).
+        # SiteContent.save() sanitizes html/css and stores a cleared language
+        # as None, so it falls back to French.
         project = data.get("project")
-        html = _sanitize_html(data.get("html"))
-        css = _sanitize_css(data.get("css"))
-        if page == SiteContent.Page.FAQ:
-            html = _strip_legacy_faq_header(html)
         with override(lang):
             content, _ = SiteContent.objects.get_or_create(page=page)
             content.project_json = (
                 json.dumps(project, ensure_ascii=False) if project else None
             )
-            content.html = html or None
-            content.css = css or None
+            content.html = data.get("html")
+            content.css = data.get("css")
             content.save()
         return JsonResponse({"ok": True})
 
 
 class HomePageEditorAssetsView(UserPassesTestMixin, View):
-    """List uploaded images (GET) and store a new upload (POST, multipart)."""
+    """List uploaded images a page at a time (GET: cursor, q, limit; see
+    homepage.asset_library) and store a new upload (POST, multipart)."""
 
     def test_func(self):
         return self.request.user.is_superuser
 
     def get(self, request, *args, **kwargs):
-        assets = [
-            {"src": asset.file.url, "name": asset.original_name}
-            for asset in ImageAsset.objects.all()
-        ]
-        return JsonResponse({"assets": assets})
+        try:
+            limit = min(
+                int(request.GET.get("limit", asset_library.PAGE_SIZE)),
+                asset_library.MAX_PAGE_SIZE,
+            )
+            if limit < 1:
+                raise ValueError(limit)
+            page = asset_library.get_page(
+                request.GET.get("cursor", ""), request.GET.get("q", "").strip(), limit
+            )
+        except ValueError:
+            return HttpResponseBadRequest("Invalid cursor or limit.")
+        etag = quote_etag(page["etag"])
+        response = JsonResponse({"assets": page["assets"], "next": page["next"]})
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=etag, response=response)
 
     def post(self, request, *args, **kwargs):
         upload = request.FILES.get("file")
@@ -295,4 +253,5 @@ class HomePageEditorAssetsView(UserPassesTestMixin, View):
         except ValidationError:
             return HttpResponseBadRequest("Invalid file.")
         asset.save()
-        return JsonResponse({"src": asset.file.url, "name": asset.original_name})
+        transaction.on_commit(lambda: generate_image_variants.delay(asset.pk))
+        return JsonResponse(asset_library.serialize(asset))
@@ -385,10 +385,10 @@ TRANSLATIONS = {
     'Subject': ("Sujet", "Onderwerp"),
     'Membership fee reminder': ("Rappel de cotisation", "Herinnering lidgeld"),
     'Message': ("Message", "Bericht"),
-    'Use {prenom} and {solde} as variables.': ("Utilisez {prenom} et {solde} comme variables.", "Gebruik {prenom} en {solde} als variabelen."),
-    'Hello {prenom},\\n\\nYour membership fee balance is {solde}€.\\nPlease proceed with the payment.\\n\\nBest regards,\\nThe treasurer': (
-        "Bonjour {prenom},\n\nLe solde de votre cotisation est de {solde}€.\nMerci de procéder au paiement.\n\nCordialement,\nLe trésorier",
-        "Beste {prenom},\n\nHet openstaande saldo van je lidgeld is {solde}€.\nGelieve de betaling te verrichten.\n\nMet vriendelijke groet,\nDe penningmeester",
+    'Use {prenom}, {solde} and {communication} as variables.': ("Utilisez {prenom}, {solde} et {communication} comme variables.", "Gebruik {prenom}, {solde} en {communication} als variabelen."),
+    'Hello {prenom},\\n\\nYour membership fee balance is {solde}€.\\nPlease proceed with the payment, with the communication {communication}.\\n\\nBest regards,\\nThe treasurer': (
+        "Bonjour {prenom},\n\nLe solde de votre cotisation est de {solde}€.\nMerci de procéder au paiement, avec la communication {communication}.\n\nCordialement,\nLe trésorier",
+        "Beste {prenom},\n\nHet openstaande saldo van je lidgeld is {solde}€.\nGelieve de betaling te verrichten, met de mededeling {communication}.\n\nMet vriendelijke groet,\nDe penningmeester",
     ),
     'Full fee (eldest child)': ("Cotisation complète (enfant aîné)", "Volledig lidgeld (oudste kind)"),
     'Sibling discount (amount deducted per additional brother/sister)': ("Réduction familiale (montant déduit par frère/sœur supplémentaire)", "Gezinskorting (bedrag afgetrokken per extra broer/zus)"),
@@ -556,6 +556,132 @@ TRANSLATIONS = {
     "%(count)s email(s) purged.": ("%(count)s e-mail(s) purgé(s).", "%(count)s e-mail(s) verwijderd."),
     "Manage": ("Gérer", "Beheren"),
 
+    # --- passage preview ---
+    "Passage preview": ("Aperçu du passage", "Voorbeeld van de overgang"),
+    "What the automatic passage will do. Nothing is changed on this page.": (
+        "Ce que fera le passage automatique. Rien n'est modifié sur cette page.",
+        "Wat de automatische overgang zal doen. Op deze pagina wordt niets gewijzigd.",
+    ),
+    "No next school year found. Create it first.": (
+        "Aucune année scolaire suivante trouvée. Créez-la d'abord.",
+        "Geen volgend schooljaar gevonden. Maak het eerst aan.",
+    ),
+    "Passage %(current)s → %(target)s, due on %(date)s.": (
+        "Passage %(current)s → %(target)s, prévu le %(date)s.",
+        "Overgang %(current)s → %(target)s, gepland op %(date)s.",
+    ),
+    "The passage to this school year has already been applied.": (
+        "Le passage vers cette année scolaire a déjà été appliqué.",
+        "De overgang naar dit schooljaar is al uitgevoerd.",
+    ),
+    "No branches defined.": ("Aucune branche définie.", "Geen takken gedefinieerd."),
+    "Export (CSV)": ("Exporter (CSV)", "Exporteren (CSV)"),
+    "Age on December 31": ("Âge au 31 décembre", "Leeftijd op 31 december"),
+    "Current section": ("Section actuelle", "Huidige sectie"),
+    "Outcome": ("Résultat", "Resultaat"),
+    "No active children.": ("Aucun enfant actif.", "Geen actieve kinderen."),
+    "Moves to another section": ("Passe dans une autre section", "Gaat naar een andere sectie"),
+    "Manual assignment": ("Affectation manuelle", "Manuele toewijzing"),
+    "Stays in the same section": ("Reste dans la même section", "Blijft in dezelfde sectie"),
+    "Ages out (becomes an animator)": ("Trop âgé (devient animateur)", "Te oud (wordt leiding)"),
+    "Skipped: no date of birth": ("Ignoré : pas de date de naissance", "Overgeslagen: geen geboortedatum"),
+    "Skipped: no section this year": ("Ignoré : pas de section cette année", "Overgeslagen: geen sectie dit jaar"),
+    "Skipped: no section in the target branch": (
+        "Ignoré : pas de section dans la branche cible",
+        "Overgeslagen: geen sectie in de doeltak",
+    ),
+
+    # --- admin list page size ---
+    "Rows per page": ("Lignes par page", "Rijen per pagina"),
+    "%(size)s per page": ("%(size)s par page", "%(size)s per pagina"),
+
+    # --- message fan-out ---
+    'Message queued for %(count)s recipient(s).': ("Message mis en file d'attente pour %(count)s destinataire(s).", "Bericht in de wachtrij gezet voor %(count)s ontvanger(s)."),
+    'Sent to %(sent)s recipient(s).': ("Envoyé à %(sent)s destinataire(s).", "Verzonden naar %(sent)s ontvanger(s)."),
+    'Sending… %(sent)s of %(total)s recipients.': ("Envoi en cours… %(sent)s destinataires sur %(total)s.", "Bezig met verzenden… %(sent)s van %(total)s ontvangers."),
+    '%(pending)s pending': ("%(pending)s en attente", "%(pending)s in behandeling"),
+    'pending': ("en attente", "in behandeling"),
+
+    # --- mail dispatch ---
+    'Queue': ("File", "Wachtrij"),
+    'Ready to send': ("Prêts à l'envoi", "Klaar om te verzenden"),
+    'Oldest waiting for': ("Le plus ancien attend depuis", "Oudste wacht sinds"),
+    'Last run': ("Dernier passage", "Laatste run"),
+    'Emails per second': ("E-mails par seconde", "E-mails per seconde"),
+    '%(sent)s sent, %(failed)s failed (%(finished_at)s)': ("%(sent)s envoyé(s), %(failed)s en échec (%(finished_at)s)", "%(sent)s verzonden, %(failed)s mislukt (%(finished_at)s)"),
+
+    # --- finance ledger ---
+    'Sibling fee': ("Cotisation frère/sœur", "Bijdrage broer/zus"),
+    'Ledger entry': ("Ligne du grand livre", "Grootboekregel"),
+    'Ledger entries': ("Lignes du grand livre", "Grootboekregels"),
+    'Household ledger': ("Solde du ménage", "Saldo van het gezin"),
+    'Household ledgers': ("Soldes des ménages", "Saldi van de gezinnen"),
+
+    # --- reminder batches ---
+    'Recent reminders': ("Rappels récents", "Recente herinneringen"),
+    'Preparing the reminders…': ("Préparation des rappels…", "Herinneringen worden voorbereid…"),
+    'Reminders are being queued.': ("Les rappels sont en cours de mise en file.", "De herinneringen worden in de wachtrij gezet."),
+    'Reminders sent: %(sent)s, failed: %(failed)s.': ("Rappels envoyés : %(sent)s, en échec : %(failed)s.", "Herinneringen verzonden: %(sent)s, mislukt: %(failed)s."),
+    'Sending… %(sent)s of %(total)s reminders sent, %(failed)s failed.': ("Envoi… %(sent)s rappel(s) sur %(total)s envoyé(s), %(failed)s en échec.", "Verzenden… %(sent)s van %(total)s herinneringen verzonden, %(failed)s mislukt."),
+    'Reminder batch': ("Envoi de rappels", "Herinneringsronde"),
+    'Reminder batches': ("Envois de rappels", "Herinneringsrondes"),
+    'Reminder recipient': ("Destinataire du rappel", "Ontvanger van de herinnering"),
+    'Reminder recipients': ("Destinataires des rappels", "Ontvangers van de herinneringen"),
+
+    # --- bank statement import ---
+    'Import bank statement': ("Importer un extrait bancaire", "Bankafschrift importeren"),
+    'Statement': ("Extrait", "Afschrift"),
+    'CSV export of your bank or CODA file.': ("Export CSV de votre banque ou fichier CODA.", "CSV-export van uw bank of CODA-bestand."),
+    'Import': ("Importer", "Importeren"),
+    'Recent imports': ("Imports récents", "Recente imports"),
+    'Recorded': ("Enregistré", "Geboekt"),
+    'Could not read the statement: %(error)s': ("Impossible de lire l'extrait : %(error)s", "Het afschrift kon niet gelezen worden: %(error)s"),
+    '%(count)d payment(s) recorded.': ("%(count)d paiement(s) enregistré(s).", "%(count)d betaling(en) geboekt."),
+    'To review (%(count)s)': ("À vérifier (%(count)s)", "Na te kijken (%(count)s)"),
+    'Ready to record (%(count)s)': ("Prêts à enregistrer (%(count)s)", "Klaar om te boeken (%(count)s)"),
+    'Counterparty': ("Contrepartie", "Tegenpartij"),
+    'Communication': ("Communication", "Mededeling"),
+    'Paid for': ("Payé pour", "Betaald voor"),
+    'Ignore': ("Ignorer", "Negeren"),
+    'Structured communication, or ignore': ("Communication structurée, ou ignore", "Gestructureerde mededeling, of ignore"),
+    'No line to record.': ("Aucune ligne à enregistrer.", "Geen regel om te boeken."),
+    'Save the choices': ("Enregistrer les choix", "Keuzes opslaan"),
+    'Record the payments': ("Enregistrer les paiements", "Betalingen boeken"),
+    'Matched': ("Identifié", "Gekoppeld"),
+    'Ambiguous': ("Ambigu", "Dubbelzinnig"),
+    'Unmatched': ("Non identifié", "Niet gekoppeld"),
+    'Structured communication': ("Communication structurée", "Gestructureerde mededeling"),
+    'Manual': ("Manuel", "Handmatig"),
+    'Bank import': ("Import bancaire", "Bankimport"),
+    'Bank imports': ("Imports bancaires", "Bankimports"),
+    'Bank statement line': ("Ligne d'extrait bancaire", "Regel van bankafschrift"),
+    'Bank statement lines': ("Lignes d'extrait bancaire", "Regels van bankafschrift"),
+
+    # --- households ---
+    'Household': ("Ménage", "Gezin"),
+    'Households': ("Ménages", "Gezinnen"),
+
+    # --- billing overview filters ---
+    'All balances': ("Tous les soldes", "Alle saldi"),
+    'All sections': ("Toutes les sections", "Alle takken"),
+    'Unpaid': ("Impayé", "Onbetaald"),
+
+    # --- calendar feeds ---
+    'Subscribe from your calendar app': ("S'abonner depuis votre agenda", "Abonneren vanuit je agenda-app"),
+    'These links are private: anyone who has one can read the agenda.': ("Ces liens sont privés : toute personne qui en possède un peut lire l'agenda.", "Deze links zijn privé: iedereen die er een heeft, kan de agenda lezen."),
+    'Calendar feed': ("Flux d'agenda", "Agendafeed"),
+    'Calendar feeds': ("Flux d'agenda", "Agendafeeds"),
+    'Empty for the unit-wide feed.': ("Vide pour le flux de toute l'unité.", "Leeg voor de feed van de hele eenheid."),
+
+    # --- editor asset library ---
+    'Search images': ("Rechercher des images", "Afbeeldingen zoeken"),
+
+    # --- member search ---
+    'Search a member: name, totem, email or address': ("Rechercher un membre : nom, totem, e-mail ou adresse", "Een lid zoeken: naam, totem, e-mail of adres"),
+    'Search a member': ("Rechercher un membre", "Een lid zoeken"),
+    'Payment for %(name)s': ("Paiement pour %(name)s", "Betaling voor %(name)s"),
+    'Add a person': ("Ajouter une personne", "Een persoon toevoegen"),
+
 }
 
 
@@ -569,6 +695,18 @@ PLURALS = {
         ("%(counter)s e-mail n'a pas pu être envoyé.", "%(counter)s e-mails n'ont pas pu être envoyés."),
         ("%(counter)s e-mail kon niet worden verzonden.", "%(counter)s e-mails konden niet worden verzonden."),
     ),
+    "%(counter)s line": (
+        ("%(counter)s ligne", "%(counter)s lignes"),
+        ("%(counter)s regel", "%(counter)s regels"),
+    ),
+    "%(counter)s line recorded.": (
+        ("%(counter)s ligne enregistrée.", "%(counter)s lignes enregistrées."),
+        ("%(counter)s regel geboekt.", "%(counter)s regels geboekt."),
+    ),
+    "%(counter)s line ignored.": (
+        ("%(counter)s ligne ignorée.", "%(counter)s lignes ignorées."),
+        ("%(counter)s regel genegeerd.", "%(counter)s regels genegeerd."),
+    ),
 }
 
 
@@ -3,6 +3,7 @@ from django.contrib import admin
 
 # from django.contrib.auth.admin import UserAdmin, GroupAdmin
 from django.contrib.auth.admin import UserAdmin
+from django.shortcuts import redirect
 from django.utils.translation import gettext_lazy as _
 from modeltranslation.admin import TranslationAdmin
 
@@ -13,6 +14,8 @@ from .models import (
     AVAILABLE_LANGUAGE_CHOICES,
     Account,
     Branch,
+    Household,
+    HouseholdMember,
     ImportantDocument,
     Person,
     SchoolYear,
@@ -228,8 +231,15 @@ class SiteSettingsAdmin(TranslationAdmin):
     )
 
     def has_add_permission(self, request):
-        # Only allow one instance of site settings
-        return not SiteSettings.objects.exists()
+        # Only one instance: get_settings() creates it on first use.
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        # Skip the one-row list and open the singleton directly.
+        site_settings = SiteSettings.get_settings()
+        return redirect(
+            "admin:members_sitesettings_change", object_id=site_settings.pk
+        )
 
     def has_delete_permission(self, request, obj=None):
         # Don't allow deleting the site settings
@@ -240,3 +250,23 @@ class SiteSettingsAdmin(TranslationAdmin):
 class ImportantDocumentAdmin(TranslationAdmin):
     list_display = ("title", "url", "file", "created_at")
     search_fields = ("title",)
+
+
+class HouseholdMemberInline(admin.TabularInline):
+    model = HouseholdMember
+    readonly_fields = ("person",)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Household)
+class HouseholdAdmin(admin.ModelAdmin):
+    """Households are kept in sync from the persons' addresses."""
+
+    list_display = ("address", "key")
+    search_fields = ("address", "key")
+    readonly_fields = ("key",)
+    inlines = (HouseholdMemberInline,)
@@ -6,4 +6,66 @@ class MembersConfig(AppConfig):
     name = "members"
 
     def ready(self):
-        pass
+        from django.db.models.signals import m2m_changed, post_delete, post_save
+        from post_office.signals import email_queued
+
+        from . import (
+            households,
+            mail_counters,
+            mail_dispatch,
+            school_years,
+            settings_cache,
+            viewer,
+        )
+
+        post_save.connect(
+            school_years.invalidate,
+            sender="members.SchoolYear",
+            dispatch_uid="school_years_saved",
+        )
+        post_delete.connect(
+            school_years.invalidate,
+            sender="members.SchoolYear",
+            dispatch_uid="school_years_deleted",
+        )
+        post_save.connect(
+            settings_cache.invalidate,
+            sender="members.SiteSettings",
+            dispatch_uid="site_settings_saved",
+        )
+        # Rows a viewer profile is built from.
+        for model in ("PersonRole", "Enrollment", "ParentChild", "Person"):
+            for signal, event in ((post_save, "saved"), (post_delete, "deleted")):
+                signal.connect(
+                    viewer.invalidate,
+                    sender=f"members.{model}",
+                    dispatch_uid=f"viewer_{model}_{event}",
+                )
+        m2m_changed.connect(
+            viewer.invalidate,
+            sender="members.PersonRole",
+            dispatch_uid="viewer_roles_changed",
+        )
+        # Rows household memberships are derived from (see members.households).
+        post_save.connect(
+            households.on_person_saved,
+            sender="members.Person",
+            dispatch_uid="households_person_saved",
+        )
+        for signal, event in ((post_save, "saved"), (post_delete, "deleted")):
+            signal.connect(
+                households.on_parent_child_changed,
+                sender="members.ParentChild",
+                dispatch_uid=f"households_parent_child_{event}",
+            )
+        post_delete.connect(
+            households.on_member_deleted,
+            sender="members.HouseholdMember",
+            dispatch_uid="households_member_deleted",
+        )
+        email_queued.connect(
+            mail_counters.on_email_queued, dispatch_uid="mail_counters_queued"
+        )
+        email_queued.connect(
+            mail_dispatch.on_email_queued, dispatch_uid="mail_dispatch_queued"
+        )
@@ -2,11 +2,14 @@ from django.conf import settings
 from django.utils import translation
 
 from .models import SiteSettings
+from .viewer import viewer_for
 
 
 def contact_info(request):
     """Make contact information available to all templates."""
-    site_settings = SiteSettings.get_settings()
+    site_settings = getattr(request, "site_settings", None)
+    if site_settings is None:
+        site_settings = SiteSettings.get_settings()
     available = getattr(request, "available_languages", None)
     if available is None:
         available = list(site_settings.available_languages or [settings.LANGUAGE_CODE])
@@ -28,53 +31,25 @@ def contact_info(request):
 
 def nav_sections(request):
     """Provide sections the current user is connected to for the navigation dropdown."""
-    from .models import Enrollment, SchoolYear, Section
+    from .models import Section
 
-    if not hasattr(request, "user") or not request.user.is_authenticated:
+    viewer = viewer_for(request)
+    if not viewer.is_authenticated:
         return {"nav_sections": Section.objects.none()}
 
-    if request.user.is_staff:
-        sections = Section.objects.select_related("branch").order_by(
-            "branch__name", "name"
-        )
+    sections = Section.objects.select_related("branch").order_by("branch__name", "name")
+    if viewer.is_staff:
         return {"nav_sections": sections}
 
-    if not hasattr(request.user, "person"):
-        return {"nav_sections": Section.objects.none()}
-
-    person = request.user.person
-    current_year = SchoolYear.current()
-    if not current_year:
-        return {"nav_sections": Section.objects.none()}
-
-    # Direct enrollments (animateurs and children)
-    direct_ids = Enrollment.objects.filter(
-        user=person, school_year=current_year
-    ).values_list("section_id", flat=True)
-
-    # Sections where user is a parent of an enrolled child
-    parent_ids = Enrollment.objects.filter(
-        user__as_child__parent=person, school_year=current_year
-    ).values_list("section_id", flat=True)
-
-    all_ids = set(direct_ids) | set(parent_ids)
-
-    sections = Section.objects.filter(pk__in=all_ids).select_related("branch").order_by(
-        "branch__name", "name"
-    )
-    return {"nav_sections": sections}
+    # Direct enrollments (animateurs and children) and sections where the user
+    # is a parent of an enrolled child, for the current school year.
+    return {"nav_sections": sections.filter(pk__in=viewer.nav_section_ids)}
 
 
 def mail_queue_status(request):
     """Expose the failed-email count to staff for the queue warning banner."""
-    if not (
-        hasattr(request, "user")
-        and request.user.is_authenticated
-        and request.user.is_staff
-    ):
+    if not viewer_for(request).is_staff:
         return {}
-    from post_office.models import STATUS, Email
+    from .mail_counters import get_counts
 
-    return {
-        "failed_mail_count": Email.objects.filter(status=STATUS.failed).count(),
-    }
+    return {"failed_mail_count": get_counts()["failed"]}
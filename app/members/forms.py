@@ -82,10 +82,7 @@ class AdminUserUpdateForm(forms.ModelForm):
         current_year = SchoolYear.current()
         self.current_year = current_year
 
-        try:
-            self.next_year = SchoolYear.objects.get(name=current_year.name + 1)
-        except SchoolYear.DoesNotExist:
-            self.next_year = None
+        self.next_year = SchoolYear.next_school_year()
 
         # Set section labels with year ranges
         self.fields["current_section"].label = _("Section %(range)s") % {
@@ -0,0 +1,166 @@
+"""Households: the persons billed together.
+
+A household is identified by the normalized address of its members, so
+"Rue des Fleurs 10, 1300 Limal" and "rue des fleurs n°10 - 1300 LIMAL"
+are one household. A person without an address belongs to the household
+of a parent (the primary contact first), which is how children are
+usually registered.
+
+HouseholdMember rows are kept in sync by the receivers below, connected in
+MembersConfig.ready(). household_changed is sent with the ids of the
+persons who moved and of a saved Person, whose role, status or birthday
+decide who pays the full fee in a household, so that rows derived from
+households (the finance ledger) can follow. It is sent once the
+memberships are written, whatever order the receivers run in.
+"""
+
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.dispatch import Signal
+
+from .models import Household, HouseholdMember, ParentChild, Person
+
+household_changed = Signal()
+
+ABBREVIATIONS = {
+    "av": "avenue",
+    "ave": "avenue",
+    "bd": "boulevard",
+    "boul": "boulevard",
+    "ch": "chaussee",
+    "chee": "chaussee",
+    "pl": "place",
+    "sq": "square",
+    "str": "straat",
+}
+# Number markers ("n°10", "nr 10") that some spell out and others don't.
+NOISE = {"n", "no", "nr", "num"}
+# Person fields deciding who pays the full fee in a household.
+BILLING_FIELDS = {"primary_role", "status", "birthday"}
+
+
+def normalize_address(address):
+    """The household key of an address; "" when there is none."""
+    text = unicodedata.normalize("NFKD", address or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = re.findall(r"[a-z]+|\d+", text.lower())
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words if word not in NOISE)[:200]
+
+
+def resolve(person_ids):
+    """Return {person pk: (key, address)} for some persons; key is "" when
+    neither the person nor any parent has an address."""
+    resolved = {
+        pk: (normalize_address(address), address)
+        for pk, address in Person.objects.filter(pk__in=person_ids).values_list(
+            "pk", "address"
+        )
+    }
+    homeless = [pk for pk, (key, _address) in resolved.items() if not key]
+    if homeless:
+        links = (
+            ParentChild.objects.filter(child_id__in=homeless)
+            .exclude(parent__address__isnull=True)
+            .exclude(parent__address="")
+            .order_by("-primary_contact", "parent_id")
+            .values_list("child_id", "parent__address")
+        )
+        for child_id, address in links:
+            key = normalize_address(address)
+            if key and not resolved[child_id][0]:
+                resolved[child_id] = (key, address)
+    return resolved
+
+
+def sync(person_ids, changed=()):
+    """Put some persons, and their children, in their household.
+
+    Sends household_changed with the ids of the persons who moved and of
+    ``changed``; returns the ids of the persons whose household changed.
+    """
+    person_ids = set(person_ids)
+    # Children without an address follow their parents.
+    person_ids |= set(
+        ParentChild.objects.filter(parent_id__in=person_ids).values_list(
+            "child_id", flat=True
+        )
+    )
+    resolved = resolve(person_ids)
+    addresses = {key: address.strip() for key, address in resolved.values() if key}
+
+    with transaction.atomic():
+        Household.objects.bulk_create(
+            [Household(key=key, address=address) for key, address in addresses.items()],
+            ignore_conflicts=True,
+        )
+        households = dict(
+            Household.objects.filter(key__in=list(addresses)).values_list("key", "pk")
+        )
+        current = dict(
+            HouseholdMember.objects.filter(person_id__in=list(resolved)).values_list(
+                "person_id", "household_id"
+            )
+        )
+        moved = {
+            pk: households.get(key)
+            for pk, (key, _address) in resolved.items()
+            if households.get(key) != current.get(pk)
+        }
+        if moved:
+            HouseholdMember.objects.filter(
+                person_id__in=[pk for pk, household_id in moved.items() if household_id is None]
+            ).delete()
+            HouseholdMember.objects.bulk_create(
+                [
+                    HouseholdMember(person_id=pk, household_id=household_id)
+                    for pk, household_id in moved.items()
+                    if household_id is not None
+                ],
+                update_conflicts=True,
+                unique_fields=["person"],
+                update_fields=["household"],
+            )
+            left = {current[pk] for pk in moved if pk in current}
+            Household.objects.filter(pk__in=left, members__isnull=True).delete()
+
+    notified = set(moved) | set(changed)
+    if notified:
+        household_changed.send(sender=Household, person_ids=list(notified))
+    return list(moved)
+
+
+def on_person_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Person post_save receiver: the address, role, status or birthday may
+    have changed. A save listing its ``update_fields`` only does what those
+    fields call for."""
+    if raw:
+        return
+    if update_fields is None or "address" in update_fields:
+        sync([instance.pk], changed=[instance.pk])
+    elif BILLING_FIELDS & set(update_fields):
+        household_changed.send(sender=Household, person_ids=[instance.pk])
+
+
+def on_parent_child_changed(sender, instance, raw=False, origin=None, **kwargs):
+    """ParentChild post_save/post_delete receiver."""
+    if raw or _deleting(instance.child_id, origin):
+        return
+    sync([instance.child_id])
+
+
+def on_member_deleted(sender, instance, **kwargs):
+    """HouseholdMember post_delete receiver: drop the emptied household."""
+    Household.objects.filter(pk=instance.household_id, members__isnull=True).delete()
+
+
+def _deleting(person_id, origin):
+    """Whether the delete started from ``origin`` removes this person, whose
+    membership must then not be recreated."""
+    if isinstance(origin, Person):
+        return origin.pk == person_id
+    if isinstance(origin, QuerySet) and origin.model is Person:
+        return origin.filter(pk=person_id).exists()
+    return False
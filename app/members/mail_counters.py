@@ -0,0 +1,74 @@
+"""Per-status counters of the post_office queue, kept in the shared cache.
+
+The failed-mail banner (shown on every staff page) and the mail queue
+dashboard read these instead of running COUNT(*) over post_office's Email
+table. They are adjusted when mail is queued, by each batch a
+members.mail_dispatch run sends and by the requeue/purge actions, and
+recomputed with one GROUP BY query:
+
+  * periodically by the reconcile_mail_counters beat task, which also
+    corrects any drift;
+  * on read, whenever a counter is missing from the cache.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from post_office.models import STATUS, Email
+
+COUNTED_STATUSES = {
+    "queued": STATUS.queued,
+    "requeued": STATUS.requeued,
+    "failed": STATUS.failed,
+}
+KEY_PREFIX = "mail_counters:"
+
+
+def _key(name):
+    return f"{KEY_PREFIX}{name}"
+
+
+def get_counts():
+    """Return {"queued": n, "requeued": n, "failed": n}."""
+    keys = [_key(name) for name in COUNTED_STATUSES]
+    values = cache.get_many(keys)
+    if len(values) < len(keys):
+        return reconcile()
+    return {name: max(values[_key(name)], 0) for name in COUNTED_STATUSES}
+
+
+def reconcile():
+    """Recount the queue from the database and store the result."""
+    rows = (
+        Email.objects.filter(status__in=COUNTED_STATUSES.values())
+        .values("status")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    by_status = {row["status"]: row["total"] for row in rows}
+    counts = {
+        name: by_status.get(status, 0) for name, status in COUNTED_STATUSES.items()
+    }
+    cache.set_many({_key(name): total for name, total in counts.items()}, None)
+    return counts
+
+
+def adjust(**deltas):
+    """Apply ``name=delta`` changes once the current transaction commits."""
+    transaction.on_commit(lambda: _apply(deltas))
+
+
+def _apply(deltas):
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(_key(name), delta)
+        except ValueError:
+            # Counter not loaded yet: the next read recounts everything.
+            pass
+
+
+def on_email_queued(sender, emails, **kwargs):
+    """post_office ``email_queued`` receiver."""
+    adjust(queued=len(emails))
@@ -0,0 +1,254 @@
+"""Priority-aware delivery of the post_office queue.
+
+Each post_office priority has its own Celery queue (see QUEUES) and its own
+dispatch_mail runs, so a large low-priority fan-out never delays password
+resets or registration notices. A run claims a batch of due emails of its
+priority with SELECT ... FOR UPDATE SKIP LOCKED and sends it before
+committing, so parallel runs never pick the same row. It claims batches
+until none is left and stores its throughput in the cache, shown on the
+mail queue dashboard next to the age of the oldest waiting email.
+
+Runs are scheduled when mail is queued (post_office's email_queued signal,
+once the transaction commits) and by the send_queued_mail beat backstop.
+While the runs scheduled for a priority have not started, queueing more
+mail schedules nothing: they will claim it anyway.
+"""
+
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from post_office.connections import connections
+from post_office.models import PRIORITY, STATUS, Email, Log
+from post_office.settings import (
+    get_batch_size,
+    get_log_level,
+    get_max_retries,
+    get_retry_timedelta,
+    get_threads_per_process,
+)
+
+from . import mail_counters
+
+QUEUES = {
+    PRIORITY.high: "mail.high",
+    PRIORITY.medium: "mail.medium",
+    PRIORITY.low: "mail.low",
+}
+PRIORITY_NAMES = {PRIORITY.high: "high", PRIORITY.medium: "medium", PRIORITY.low: "low"}
+STATS_KEY = "mail_dispatch:stats:"
+PENDING_KEY = "mail_dispatch:pending:"
+# Runs not started by then are presumed lost and may be scheduled again.
+PENDING_TIMEOUT = 60
+PENDING_STATUSES = [STATUS.queued, STATUS.requeued]
+
+
+def schedule(priorities=QUEUES):
+    """Start MAIL_DISPATCH_PARALLELISM runs on the queue of each priority
+    that has none waiting to start."""
+    from troopconnect.tasks import dispatch_mail
+
+    parallelism = getattr(settings, "MAIL_DISPATCH_PARALLELISM", 1)
+    for priority in priorities:
+        if priority not in QUEUES:
+            continue
+        if not cache.add(f"{PENDING_KEY}{priority}", True, PENDING_TIMEOUT):
+            continue
+        for _run in range(parallelism):
+            dispatch_mail.apply_async(args=[priority], queue=QUEUES[priority])
+
+
+def on_email_queued(sender, emails, **kwargs):
+    """post_office ``email_queued`` receiver: flush the affected queues."""
+    priorities = {email.priority for email in emails}
+    transaction.on_commit(lambda: schedule(priorities))
+
+
+def dispatch(priority, batch_size=None):
+    """Send due emails of one priority, batch by batch, until none is left.
+
+    Returns {"sent", "failed", "requeued", "seconds", "rate"}.
+    """
+    # Mail queued from now on may come after this run's last claim.
+    cache.delete(f"{PENDING_KEY}{priority}")
+    batch_size = batch_size or get_batch_size()
+    totals = {"sent": 0, "failed": 0, "requeued": 0}
+    started = time.monotonic()
+    while True:
+        with transaction.atomic():
+            emails = _claim(priority, batch_size)
+            if not emails:
+                break
+            claimed = Counter(email.status for email in emails)
+            sent, failed, requeued = _send(emails)
+            # The cached counters follow once the batch commits.
+            mail_counters.adjust(
+                queued=-claimed[STATUS.queued],
+                requeued=requeued - claimed[STATUS.requeued],
+                failed=failed,
+            )
+        totals["sent"] += sent
+        totals["failed"] += failed
+        totals["requeued"] += requeued
+
+    if not any(totals.values()):
+        return {**totals, "seconds": 0, "rate": 0}
+    seconds = time.monotonic() - started
+    stats = {
+        **totals,
+        "seconds": round(seconds, 3),
+        "rate": round(totals["sent"] / seconds, 2) if seconds else 0,
+        "finished_at": timezone.now(),
+    }
+    cache.set(f"{STATS_KEY}{priority}", stats, None)
+    return stats
+
+
+def metrics():
+    """Per-priority due emails, age of the oldest one and last run stats."""
+    now = timezone.now()
+    rows = (
+        Email.objects.filter(status__in=PENDING_STATUSES)
+        .filter(Q(scheduled_time__lte=now) | Q(scheduled_time=None))
+        .values("priority")
+        .annotate(waiting=Count("id"), oldest=Min("created"))
+        .order_by()
+    )
+    by_priority = {row["priority"]: row for row in rows}
+    last_runs = cache.get_many([f"{STATS_KEY}{priority}" for priority in QUEUES])
+    result = []
+    for priority, queue in QUEUES.items():
+        row = by_priority.get(priority)
+        result.append({
+            "priority": PRIORITY_NAMES[priority],
+            "queue": queue,
+            "waiting": row["waiting"] if row else 0,
+            "oldest": row["oldest"] if row else None,
+            "age": (now - row["oldest"]).total_seconds() if row else None,
+            "last_run": last_runs.get(f"{STATS_KEY}{priority}"),
+        })
+    return result
+
+
+def _claim(priority, batch_size):
+    """Lock and return up to ``batch_size`` due emails nobody else holds."""
+    now = timezone.now()
+    emails = list(
+        Email.objects.filter(status__in=PENDING_STATUSES, priority=priority)
+        .filter(Q(scheduled_time__lte=now) | Q(scheduled_time=None))
+        .filter(Q(expires_at__gt=now) | Q(expires_at=None))
+        .select_for_update(skip_locked=True, of=("self",))
+        .order_by("id")
+        # Loaded by separate queries, so only the email rows are locked.
+        .prefetch_related("attachments", "template")[:batch_size]
+    )
+    return emails
+
+
+def _send(emails):
+    """Send a claimed batch; returns (sent, failed, requeued).
+
+    A backend that can take the whole batch in one call (MailerSend's bulk
+    endpoint) gets it; otherwise the emails are sent one by one with
+    Email.dispatch() over post_office's THREADS_PER_PROCESS threads. Either
+    way the results are recorded here, as post_office's own sender would.
+    """
+    alias = emails[0].backend_alias or "default"
+    connection = connections[alias]
+    single_backend = all((email.backend_alias or "default") == alias for email in emails)
+
+    prepared = []
+    failed = []
+    for email in emails:
+        # Rendered before sending, so that the threads need no database.
+        try:
+            email.prepare_email_message()
+            prepared.append(email)
+        except Exception as error:
+            failed.append((email, error))
+    try:
+        if getattr(connection, "bulk", False) and single_backend and len(prepared) > 1:
+            try:
+                connection.send_messages([email.email_message() for email in prepared])
+            except Exception as error:
+                failed.extend((email, error) for email in prepared)
+                prepared = []
+        elif prepared:
+            threads = min(get_threads_per_process(), len(prepared))
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                errors = list(pool.map(_dispatch, prepared))
+            failed.extend(
+                (email, error)
+                for email, error in zip(prepared, errors, strict=True)
+                if error is not None
+            )
+            prepared = [
+                email for email, error in zip(prepared, errors, strict=True) if error is None
+            ]
+    finally:
+        connections.close()
+
+    Email.objects.filter(pk__in=[email.pk for email in prepared]).update(
+        status=STATUS.sent, last_updated=timezone.now()
+    )
+    requeued = _record_failures(failed)
+    _log(prepared, failed)
+    return len(prepared), len(failed) - requeued, requeued
+
+
+def _dispatch(email):
+    """Send one prepared email; returns the error, or None once sent."""
+    try:
+        # commit=False: raises instead of saving the status, which _send
+        # records for the whole batch. Each thread keeps its own connection
+        # (post_office's connections are per thread) for the batch.
+        email.dispatch(commit=False, disconnect_after_delivery=False)
+    except Exception as error:
+        return error
+    return None
+
+
+def _record_failures(failed):
+    """Requeue failed emails until MAX_RETRIES, then mark them failed."""
+    max_retries = get_max_retries()
+    scheduled_time = timezone.now() + get_retry_timedelta()
+    requeued = 0
+    emails = [email for email, _error in failed]
+    for email in emails:
+        retries = email.number_of_retries or 0
+        if retries < max_retries:
+            email.number_of_retries = retries + 1
+            email.status = STATUS.requeued
+            email.scheduled_time = scheduled_time
+            requeued += 1
+        else:
+            email.status = STATUS.failed
+        email.last_updated = timezone.now()
+    Email.objects.bulk_update(
+        emails, ["status", "scheduled_time", "number_of_retries", "last_updated"]
+    )
+    return requeued
+
+
+def _log(sent, failed):
+    """Write post_office Log rows as its own sender would."""
+    log_level = get_log_level()
+    logs = []
+    if log_level >= 1:
+        logs += [
+            Log(
+                email=email,
+                status=STATUS.failed,
+                message=str(error),
+                exception_type=type(error).__name__,
+            )
+            for email, error in failed
+        ]
+    if log_level > 1:
+        logs += [Log(email=email, status=STATUS.sent) for email in sent]
+    Log.objects.bulk_create(logs)
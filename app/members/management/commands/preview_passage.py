@@ -0,0 +1,75 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from members.passage import ACTION_LABELS, preview_passage
+
+CSV_FIELDS = [
+    "last_name",
+    "first_name",
+    "birthday",
+    "age_dec_31",
+    "action",
+    "current_section",
+    "target_section",
+]
+
+
+class Command(BaseCommand):
+    help = "Show what the automatic passage will do, without changing anything"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=["text", "json", "csv"],
+            default="text",
+            help="Output format (default: text)",
+        )
+        parser.add_argument(
+            "--changes-only",
+            action="store_true",
+            help="Leave out the children who stay in their section",
+        )
+
+    def handle(self, *args, **options):
+        report = preview_passage()
+        if report is None:
+            raise CommandError("No next school year found. Create it first.")
+
+        if options["changes_only"]:
+            report["rows"] = [row for row in report["rows"] if row["action"] != "stay"]
+
+        if options["format"] == "json":
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        elif options["format"] == "csv":
+            writer = csv.DictWriter(
+                self.stdout, fieldnames=CSV_FIELDS, extrasaction="ignore"
+            )
+            writer.writeheader()
+            writer.writerows(report["rows"])
+        else:
+            self._write_text(report)
+
+    def _write_text(self, report):
+        self.stdout.write(
+            f"Passage {report['current_year']} → {report['target_year']} "
+            f"(due on {report['trigger_date']})"
+        )
+        if report["already_applied"]:
+            self.stdout.write(
+                self.style.WARNING("Already applied: run_passage will not run again.")
+            )
+        if not report["branches_defined"]:
+            self.stdout.write(self.style.WARNING("No branches defined."))
+            return
+
+        for action, label in ACTION_LABELS.items():
+            self.stdout.write(f"  {label}: {report['summary'][action]}")
+
+        for row in report["rows"]:
+            self.stdout.write(
+                f"{row['last_name']} {row['first_name']}: "
+                f"{row['current_section'] or '-'} → {row['target_section'] or '-'} "
+                f"[{row['action']}]"
+            )
@@ -2,6 +2,10 @@ from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils import translation
+from django.utils.functional import SimpleLazyObject
+
+from . import school_years
+from .viewer import get_viewer
 
 
 class OnboardingMiddleware:
@@ -69,13 +73,18 @@ class AvailableLanguagesMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        available = self._available_languages()
+        # Read once per request; the contact_info context processor reuses it.
+        from .models import SiteSettings
+
+        site_settings = SiteSettings.get_settings()
+        request.site_settings = site_settings
+        available = self._available_languages(site_settings)
         request.available_languages = available
 
         active = translation.get_language()
         clamped = False
         if active not in available:
-            default = self._default_language()
+            default = self._default_language(site_settings)
             active = default if default in available else available[0]
             translation.activate(active)
             request.LANGUAGE_CODE = active
@@ -101,20 +110,42 @@ class AvailableLanguagesMiddleware:
         return response
 
     @staticmethod
-    def _available_languages():
-        # Local import to avoid a circular import at module load time
-        # (models imports nothing from middleware, but keep it lazy).
-        from .models import SiteSettings
-
-        available = list(SiteSettings.get_settings().available_languages or [])
+    def _available_languages(site_settings):
+        available = list(site_settings.available_languages or [])
         if not available:
             available = [settings.LANGUAGE_CODE]
         return available
 
     @staticmethod
-    def _default_language():
-        # Local import to avoid a circular import at module load time.
-        from .models import SiteSettings
+    def _default_language(site_settings):
+        return site_settings.default_language or settings.LANGUAGE_CODE
+
+
+class SchoolYearMiddleware:
+    """Resolve the current/next school year at most once per request.
+
+    Placed first so that every middleware, view, context processor and
+    template rendered for the request shares the memo (see
+    members.school_years).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with school_years.request_memo():
+            return self.get_response(request)
+
+
+class ViewerProfileMiddleware:
+    """Attach a lazily loaded ``request.viewer`` (see members.viewer).
+
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
 
-        default = SiteSettings.get_settings().default_language
-        return default or settings.LANGUAGE_CODE
+    def __call__(self, request):
+        request.viewer = SimpleLazyObject(lambda: get_viewer(request))
+        return self.get_response(request)
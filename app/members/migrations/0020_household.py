@@ -0,0 +1,90 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:01
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ABBREVIATIONS = {
+    "av": "avenue", "ave": "avenue", "bd": "boulevard", "boul": "boulevard",
+    "ch": "chaussee", "chee": "chaussee", "pl": "place", "sq": "square",
+    "str": "straat",
+}
+NOISE = {"n", "no", "nr", "num"}
+
+
+def normalize_address(address):
+    """Copy of members.households.normalize_address at the time of writing."""
+    text = unicodedata.normalize("NFKD", address or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = re.findall(r"[a-z]+|\d+", text.lower())
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words if word not in NOISE)[:200]
+
+
+def backfill(apps, schema_editor):
+    """Put every person in their household, as members.households.sync() does."""
+    Person = apps.get_model("members", "Person")
+    ParentChild = apps.get_model("members", "ParentChild")
+    Household = apps.get_model("members", "Household")
+    HouseholdMember = apps.get_model("members", "HouseholdMember")
+
+    resolved = {
+        pk: (normalize_address(address), address)
+        for pk, address in Person.objects.values_list("pk", "address")
+    }
+    links = (
+        ParentChild.objects.exclude(parent__address__isnull=True)
+        .exclude(parent__address="")
+        .order_by("-primary_contact", "parent_id")
+        .values_list("child_id", "parent__address")
+    )
+    for child_id, address in links:
+        key = normalize_address(address)
+        if key and not resolved[child_id][0]:
+            resolved[child_id] = (key, address)
+
+    addresses = {key: address.strip() for key, address in resolved.values() if key}
+    Household.objects.bulk_create(
+        [Household(key=key, address=address) for key, address in addresses.items()],
+        batch_size=500,
+    )
+    households = dict(Household.objects.values_list("key", "pk"))
+    HouseholdMember.objects.bulk_create(
+        [
+            HouseholdMember(person_id=pk, household_id=households[key])
+            for pk, (key, _address) in resolved.items()
+            if key
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0019_email_template_language'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Household',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True)),
+                ('address', models.CharField(max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Household',
+                'verbose_name_plural': 'Households',
+            },
+        ),
+        migrations.CreateModel(
+            name='HouseholdMember',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='household_member', serialize=False, to='members.person')),
+                ('household', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='members.household')),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
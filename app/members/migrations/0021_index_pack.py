@@ -0,0 +1,48 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:58
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.db.models.functions.text
+import members.models
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0020_household'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AlterField(
+            model_name='person',
+            name='primary_role',
+            field=models.ForeignKey(db_index=False, default=members.models.default_role, limit_choices_to={'is_primary': True}, on_delete=django.db.models.deletion.PROTECT, related_name='primary_persons', to='members.role'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['school_year', 'section'], name='enrollment_year_section'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['user', 'school_year'], name='enrollment_user_year'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['status', 'archived_date'], name='person_status_archived'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['primary_role', 'status'], name='person_role_status'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('first_name'), name='gin_trgm_ops'), name='person_first_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('last_name'), name='gin_trgm_ops'), name='person_last_name_trgm'),
+        ),
+    ]
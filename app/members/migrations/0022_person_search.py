@@ -0,0 +1,38 @@
+# Generated by Django 6.0.3 on 2026-10-18 12:15
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+import members.models
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations, models
+
+
+# unaccent() is only STABLE (its dictionary could change), which indexes
+# refuse; the dictionary is named so that the wrapper may be IMMUTABLE.
+CREATE_UNACCENT = """
+CREATE FUNCTION members_unaccent(text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+"""
+DROP_UNACCENT = "DROP FUNCTION members_unaccent(text)"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('members', '0021_index_pack'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(CREATE_UNACCENT, DROP_UNACCENT),
+        migrations.AddIndex(
+            model_name='account',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['email'], name='account_email_trgm', opclasses=['gist_trgm_ops(siglen=256)']),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GistIndex(django.contrib.postgres.indexes.OpClass(members.models.ImmutableUnaccent(django.db.models.functions.text.Concat('first_name', models.Value(' '), 'last_name', models.Value(' '), 'totem', models.Value(' '), 'address', output_field=models.TextField())), name='gist_trgm_ops(siglen=256)'), name='person_search_trgm'),
+        ),
+    ]
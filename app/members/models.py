@@ -1,5 +1,5 @@
 import uuid
-from datetime import date, datetime
+from datetime import date
 
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -7,12 +7,16 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Concat, Upper
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
 
+from . import school_years, settings_cache
+
 # class CustomAccountManager(BaseUserManager):
 #     def create_user(
 #         self,
@@ -64,6 +68,30 @@ def default_available_languages():
     return ["fr"]
 
 
+class ImmutableUnaccent(models.Func):
+    """unaccent() declared IMMUTABLE, so that it can be indexed (the
+    members_unaccent function is created by migration 0022)."""
+
+    function = "members_unaccent"
+    output_field = models.TextField()
+
+
+def person_search_document():
+    """The text of a Person the member search matches (see members.search)."""
+    return ImmutableUnaccent(
+        Concat(
+            "first_name",
+            models.Value(" "),
+            "last_name",
+            models.Value(" "),
+            "totem",
+            models.Value(" "),
+            "address",
+            output_field=models.TextField(),
+        )
+    )
+
+
 class Person(models.Model):
     """
     Represents any person in the system (parents, children, leaders, ...).  Only those who need a login get an Account.
@@ -98,6 +126,8 @@ class Person(models.Model):
         limit_choices_to={"is_primary": True},
         related_name="primary_persons",
         default=default_role,
+        # Covered by the person_role_status index (see Meta).
+        db_index=False,
     )
     status = models.CharField(
         max_length=2,
@@ -139,6 +169,28 @@ class Person(models.Model):
         blank=True,
     )
 
+    class Meta:
+        indexes = [
+            # Retention tasks (archived for N years).
+            models.Index(fields=["status", "archived_date"], name="person_status_archived"),
+            # Passage and billing (active children, animateurs).
+            models.Index(fields=["primary_role", "status"], name="person_role_status"),
+            # PersonFilter's icontains filters compare UPPER(name) LIKE '%...%'.
+            GinIndex(
+                OpClass(Upper("first_name"), name="gin_trgm_ops"),
+                name="person_first_name_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("last_name"), name="gin_trgm_ops"),
+                name="person_last_name_trgm",
+            ),
+            # Member search (typo tolerant, accent insensitive).
+            GistIndex(
+                OpClass(person_search_document(), name="gist_trgm_ops(siglen=256)"),
+                name="person_search_trgm",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -309,6 +361,37 @@ class ParentChild(models.Model):
         return f"{self.parent} → {self.child}"
 
 
+class Household(models.Model):
+    """Persons billed together, identified by their normalized address.
+
+    Memberships are kept in sync by members.households.
+    """
+
+    key = models.CharField(max_length=200, unique=True)
+    address = models.CharField(max_length=200)
+
+    class Meta:
+        verbose_name = _("Household")
+        verbose_name_plural = _("Households")
+
+    def __str__(self):
+        return self.address
+
+
+class HouseholdMember(models.Model):
+    """The household a person belongs to."""
+
+    person = models.OneToOneField(
+        Person, on_delete=models.CASCADE, primary_key=True, related_name="household_member"
+    )
+    household = models.ForeignKey(
+        Household, on_delete=models.CASCADE, related_name="members"
+    )
+
+    def __str__(self):
+        return f"{self.person} → {self.household}"
+
+
 class AccountManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -385,6 +468,14 @@ class Account(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # Member search by email (see members.search).
+            GistIndex(
+                fields=["email"], opclasses=["gist_trgm_ops(siglen=256)"], name="account_email_trgm"
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -621,21 +712,13 @@ class SchoolYear(models.Model):
         }
 
     def current():
-        current_time = datetime.now().date()
-        return SchoolYear.objects.filter(
-            start_date__lte=current_time, end_date__gte=current_time
-        ).first()
+        """The school year containing today (cached, see members.school_years)."""
+        return school_years.current()
 
     @staticmethod
     def next_school_year():
-        current_year = SchoolYear.current()
-        if not current_year:
-            return None
-        return (
-            SchoolYear.objects.filter(start_date__gt=current_year.start_date)
-            .order_by("start_date")
-            .first()
-        )
+        """The school year after the current one (cached)."""
+        return school_years.next_school_year()
 
     # def birth_year_range():
     #     """
@@ -716,6 +799,10 @@ class Enrollment(models.Model):
                 fields=["user", "section", "school_year"], name="uniq_enrollment"
             ),
         ]
+        indexes = [
+            models.Index(fields=["school_year", "section"], name="enrollment_year_section"),
+            models.Index(fields=["user", "school_year"], name="enrollment_user_year"),
+        ]
 
     def __str__(self):
         return f"{self.user.first_name} - {self.section.name} ({self.school_year.year})"
@@ -816,9 +903,12 @@ class SiteSettings(models.Model):
 
     @classmethod
     def get_settings(cls):
-        """Get the site settings, creating them if they don't exist."""
-        settings, created = cls.objects.get_or_create(pk=1)
-        return settings
+        """Get the site settings, creating them if they don't exist.
+
+        Served from a per-process copy (see members.settings_cache); each call
+        returns its own instance, so it can be modified and saved.
+        """
+        return settings_cache.get_settings()
 
     def clean(self):
         """The default language must be one of the enabled languages."""
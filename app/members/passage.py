@@ -0,0 +1,303 @@
+"""Set-based passage engine used by the run_passage task.
+
+The passage is computed in two steps so the whole troop is handled in a
+handful of queries instead of several round trips per child:
+
+  1. plan_passage() loads the active children, their current enrollments,
+     the branches and the first section of each branch in bulk, then decides
+     in memory what happens to every child.
+  2. apply_passage() writes the plan in one transaction: one bulk insert and
+     one bulk update for the target-year enrollments, one bulk update for the
+     Person rows and a single ParentChild delete for children who age out.
+
+preview_passage() reuses step 1 only, so staff can review the outcome (staff
+view and `manage.py preview_passage`) before the task commits anything.
+
+Bulk writes send no model signals: apply_passage() sends passage_applied
+with the ids of the children it changed instead, so that rows derived from
+them (the finance ledger) can follow.
+"""
+
+from datetime import date
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils.translation import gettext_lazy as _
+
+from . import viewer
+
+passage_applied = Signal()
+
+# Per-child outcome of a passage plan.
+STAY = "stay"  # still fits the current branch → same section next year
+MOVE = "move"  # next branch by age → alphabetically first section
+OVERRIDE = "override"  # manual Person.next_section override
+AGE_OUT = "age_out"  # older than every branch → becomes Animateur
+SKIP_NO_BIRTHDAY = "skip_no_birthday"
+SKIP_NO_ENROLLMENT = "skip_no_enrollment"
+SKIP_NO_SECTION = "skip_no_section"  # target branch has no section
+
+SKIP_ACTIONS = (SKIP_NO_BIRTHDAY, SKIP_NO_ENROLLMENT, SKIP_NO_SECTION)
+
+# Actions that write a target-year enrollment.
+ENROLL_ACTIONS = (STAY, MOVE, OVERRIDE)
+
+# Display order and labels of the preview report.
+ACTION_LABELS = {
+    MOVE: _("Moves to another section"),
+    OVERRIDE: _("Manual assignment"),
+    STAY: _("Stays in the same section"),
+    AGE_OUT: _("Ages out (becomes an animator)"),
+    SKIP_NO_BIRTHDAY: _("Skipped: no date of birth"),
+    SKIP_NO_ENROLLMENT: _("Skipped: no section this year"),
+    SKIP_NO_SECTION: _("Skipped: no section in the target branch"),
+}
+
+
+def _target_branch(branches, age):
+    """Return the first branch (youngest first) whose age range contains `age`."""
+    for branch in branches:
+        if branch.min_age_dec_31 is not None and branch.max_age_dec_31 is not None:
+            if branch.min_age_dec_31 <= age <= branch.max_age_dec_31:
+                return branch
+    return None
+
+
+def plan_passage(target_year, current_year):
+    """Decide the passage of every active child without writing anything.
+
+    Returns None when no Branch is defined, otherwise a dict:
+      {target_year, current_year, decisions}
+    where each decision is a dict:
+      {child, action, age, current_section, target_section, target_branch}
+    ``target_section`` is set for the ENROLL_ACTIONS, ``target_branch`` only
+    for SKIP_NO_SECTION, and ``age`` is None when the child has no birthday.
+    """
+    from .models import Branch, Enrollment, Person, Section
+
+    branches = list(Branch.objects.order_by("min_age_dec_31"))
+    if not branches:
+        return None
+
+    # Alphabetically first section of every branch, in a single query.
+    first_sections = {}
+    for section in (
+        Section.objects.filter(branch__isnull=False)
+        .select_related("branch")
+        .order_by("branch_id", "name")
+    ):
+        first_sections.setdefault(section.branch_id, section)
+
+    children = list(
+        Person.objects.filter(primary_role__short="e", status="a")
+        .select_related("primary_role", "next_section")
+        .order_by("last_name", "first_name")
+    )
+
+    # Current enrollment per child (first by pk, as .first() would return).
+    current_enrollments = {}
+    for enrollment in (
+        Enrollment.objects.filter(
+            user__in=[child.pk for child in children], school_year=current_year
+        )
+        .select_related("section__branch")
+        .order_by("pk")
+    ):
+        current_enrollments.setdefault(enrollment.user_id, enrollment)
+
+    # Dec 31 of the next school year (starts Aug `name`, ends Jul `name + 1`)
+    dec_31 = date(target_year.name + 1, 12, 31)
+
+    decisions = []
+    for child in children:
+        enrollment = current_enrollments.get(child.pk)
+        decision = {
+            "child": child,
+            "action": None,
+            "age": None,
+            "current_section": enrollment.section if enrollment else None,
+            "target_section": None,
+            "target_branch": None,
+        }
+        decisions.append(decision)
+
+        if not child.birthday:
+            decision["action"] = SKIP_NO_BIRTHDAY
+            continue
+
+        age = (dec_31 - child.birthday).days // 365
+        decision["age"] = age
+
+        # Manual override
+        if child.next_section:
+            decision["action"] = OVERRIDE
+            decision["target_section"] = child.next_section
+            continue
+
+        if not enrollment:
+            decision["action"] = SKIP_NO_ENROLLMENT
+            continue
+
+        # Child still fits in current branch → stay in the same section
+        current_branch = enrollment.section.branch
+        if (
+            current_branch is not None
+            and current_branch.max_age_dec_31 is not None
+            and age <= current_branch.max_age_dec_31
+        ):
+            decision["action"] = STAY
+            decision["target_section"] = enrollment.section
+            continue
+
+        target_branch = _target_branch(branches, age)
+        if target_branch is None:
+            # Child exceeds all branches → age out to Animateur
+            decision["action"] = AGE_OUT
+            continue
+
+        target_section = first_sections.get(target_branch.pk)
+        if target_section is None:
+            decision["action"] = SKIP_NO_SECTION
+            decision["target_branch"] = target_branch
+            continue
+
+        decision["action"] = MOVE
+        decision["target_section"] = target_section
+
+    return {
+        "target_year": target_year,
+        "current_year": current_year,
+        "decisions": decisions,
+    }
+
+
+def apply_passage(plan):
+    """Write a plan produced by plan_passage() in a single transaction.
+
+    Target-year enrollments keep the update_or_create(user, school_year)
+    semantics of the manual admin form: an existing enrollment of the child
+    for the target year is moved to the new section, otherwise one is created.
+
+    Returns {"promoted": int, "aged_out": int}.
+    """
+    from .models import Enrollment, ParentChild, Person, Role
+
+    target_year = plan["target_year"]
+    decisions = plan["decisions"]
+
+    to_enroll = {
+        d["child"].pk: d["target_section"]
+        for d in decisions
+        if d["action"] in ENROLL_ACTIONS
+    }
+    overridden = [d["child"] for d in decisions if d["action"] == OVERRIDE]
+    aged_out = [d["child"] for d in decisions if d["action"] == AGE_OUT]
+
+    with transaction.atomic():
+        existing = {}
+        for enrollment in Enrollment.objects.filter(
+            user__in=list(to_enroll), school_year=target_year
+        ).order_by("pk"):
+            existing.setdefault(enrollment.user_id, enrollment)
+
+        to_update = []
+        to_create = []
+        for person_id, section in to_enroll.items():
+            enrollment = existing.get(person_id)
+            if enrollment is None:
+                to_create.append(
+                    Enrollment(user_id=person_id, section=section, school_year=target_year)
+                )
+            elif enrollment.section_id != section.pk:
+                enrollment.section = section
+                to_update.append(enrollment)
+
+        if to_update:
+            Enrollment.objects.bulk_update(to_update, ["section"])
+        if to_create:
+            # The conflict clause only guards against an identical row created
+            # concurrently (e.g. by a staff edit) since the prefetch above.
+            Enrollment.objects.bulk_create(
+                to_create,
+                update_conflicts=True,
+                unique_fields=["user", "section", "school_year"],
+                update_fields=["section"],
+            )
+
+        persons = []
+        for child in overridden:
+            child.next_section = None
+            persons.append(child)
+        if aged_out:
+            role_animateur = Role.objects.get(short="a")
+            for child in aged_out:
+                child.primary_role = role_animateur
+                persons.append(child)
+            ParentChild.objects.filter(child__in=aged_out).delete()
+        if persons:
+            Person.objects.bulk_update(persons, ["next_section", "primary_role"])
+
+        # Bulk writes send no model signals: refresh cached viewer profiles
+        # and whatever is derived from the children involved.
+        viewer.invalidate()
+        passage_applied.send(
+            sender=Person, person_ids=[*to_enroll, *(child.pk for child in persons)]
+        )
+
+    promoted = sum(1 for d in decisions if d["action"] in (MOVE, OVERRIDE))
+    return {"promoted": promoted, "aged_out": len(aged_out)}
+
+
+def preview_passage():
+    """Dry run of the passage for the upcoming school year.
+
+    Loads and decides exactly like run_passage (same plan_passage() call) but
+    writes nothing. Returns None when there is no next school year, otherwise
+    a JSON-friendly dict:
+      {target_year, current_year, trigger_date, already_applied,
+       branches_defined, summary: {action: count}, rows: [...]}
+    with one row per active child, ordered by name.
+    """
+    from .models import SchoolYear, SiteSettings
+    from .tasks import PASSAGE_TRIGGER_DAY, PASSAGE_TRIGGER_MONTH
+
+    target_year = SchoolYear.next_school_year()
+    if not target_year:
+        return None
+    current_year = SchoolYear.current()
+
+    plan = plan_passage(target_year, current_year)
+    decisions = plan["decisions"] if plan else []
+
+    rows = []
+    summary = dict.fromkeys(ACTION_LABELS, 0)
+    for decision in decisions:
+        child = decision["child"]
+        current_section = decision["current_section"]
+        target_section = decision["target_section"]
+        summary[decision["action"]] += 1
+        rows.append({
+            "person_id": str(child.pk),
+            "first_name": child.first_name,
+            "last_name": child.last_name,
+            "birthday": child.birthday.isoformat() if child.birthday else None,
+            "age_dec_31": decision["age"],
+            "action": decision["action"],
+            "action_label": str(ACTION_LABELS[decision["action"]]),
+            "current_section": current_section.name if current_section else None,
+            "target_section": target_section.name if target_section else None,
+        })
+
+    return {
+        "target_year": target_year.name,
+        "current_year": current_year.name if current_year else None,
+        "trigger_date": date(
+            target_year.name, PASSAGE_TRIGGER_MONTH, PASSAGE_TRIGGER_DAY
+        ).isoformat(),
+        "already_applied": (
+            SiteSettings.get_settings().last_passage_school_year == target_year.name
+        ),
+        "branches_defined": plan is not None,
+        "summary": summary,
+        "rows": rows,
+    }
@@ -0,0 +1,99 @@
+"""Cached resolution of the current and next SchoolYear.
+
+SchoolYear.current() and SchoolYear.next_school_year() are called from model
+methods, filters, context processors and templates (often once per rendered
+row), so both go through this resolver instead of querying directly:
+
+  1. a per-request memo, opened by SchoolYearMiddleware, so a request resolves
+     the pair at most once;
+  2. a shared cache entry holding (current, next), loaded with one query and
+     expiring at the next school-year boundary.
+
+SchoolYear saves and deletes drop both (see MembersConfig.ready()).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_KEY = "members:school_years"
+
+# Used when no boundary is known yet (no current nor upcoming school year).
+FALLBACK_TIMEOUT = 60 * 60
+
+_request_memo = ContextVar("school_years_memo", default=None)
+
+
+def current():
+    """Return the SchoolYear containing today, or None."""
+    return _resolve()[0]
+
+
+def next_school_year():
+    """Return the SchoolYear following the current one, or None."""
+    return _resolve()[1]
+
+
+@contextmanager
+def request_memo():
+    """Memoize the resolved school years for the duration of the block."""
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+def invalidate(**kwargs):
+    """Signal receiver: forget the cached school years."""
+    memo = _request_memo.get()
+    if memo is not None:
+        memo.pop("years", None)
+    cache.delete(CACHE_KEY)
+    # A request may have refilled the entry from the old rows before commit.
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+
+def _resolve():
+    memo = _request_memo.get()
+    if memo is not None and "years" in memo:
+        return memo["years"]
+
+    years = cache.get(CACHE_KEY)
+    if years is None:
+        years, timeout = _load()
+        cache.set(CACHE_KEY, years, timeout)
+
+    if memo is not None:
+        memo["years"] = years
+    return years
+
+
+def _load():
+    """Query (current, next) at once and the seconds until they may change."""
+    from .models import SchoolYear
+
+    now = datetime.now()
+    today = now.date()
+    years = list(SchoolYear.objects.filter(end_date__gte=today).order_by("start_date"))
+
+    current_year = next((y for y in years if y.start_date <= today), None)
+    next_year = None
+    if current_year is not None:
+        next_year = next(
+            (y for y in years if y.start_date > current_year.start_date), None
+        )
+
+    boundaries = [y.start_date for y in years if y.start_date > today]
+    if current_year is not None:
+        boundaries.append(current_year.end_date + timedelta(days=1))
+    if boundaries:
+        expires = datetime.combine(min(boundaries), time.min)
+        timeout = max(int((expires - now).total_seconds()), 1)
+    else:
+        timeout = FALLBACK_TIMEOUT
+
+    return (current_year, next_year), timeout
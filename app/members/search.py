@@ -0,0 +1,72 @@
+"""Typo-tolerant member search.
+
+Matches a query against the first name, last name, totem and address of a
+Person and the email of its account, with PostgreSQL trigrams (pg_trgm)
+on unaccented text: "helene dupnt" finds "Hélène Dupont".
+
+A person matches when some extent of its text is similar enough to the
+query (word similarity, see THRESHOLD); results come closest first
+("Martin" before "Martinez" for "martin"). Both texts have a GiST trigram
+index (person_search_trgm, account_email_trgm) that returns rows in that
+order, so a search reads about ``limit`` rows per index whatever the
+number of persons, even for a query most of them match.
+"""
+
+from django.contrib.postgres.search import TrigramWordDistance
+from django.db import connection, transaction
+from django.db.models import Value
+
+from .models import ImmutableUnaccent, Person, person_search_document
+
+LIMIT = 10
+MIN_LENGTH = 2
+MAX_LENGTH = 100
+# Share of the query's trigrams an extent of the text must have. Lower
+# than pg_trgm's default (0.6) so that one typo in a short name still
+# matches.
+THRESHOLD = 0.4
+
+
+def search_persons(query, persons=None, limit=LIMIT):
+    """Return up to ``limit`` persons of ``persons`` (default: everyone)
+    matching ``query``, closest first, each annotated with its ``distance``
+    (0: the query appears as is).
+
+    Queries shorter than MIN_LENGTH return nothing.
+    """
+    query = " ".join(query.split())[:MAX_LENGTH]
+    if len(query) < MIN_LENGTH:
+        return []
+    if persons is None:
+        persons = Person.objects.all()
+    term = ImmutableUnaccent(Value(query))
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Only for this transaction.
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(THRESHOLD)],
+            )
+        # Ordered on the distance alone, so that the index scan stops after
+        # ``limit`` rows even when most persons match ("rue").
+        by_text = list(
+            persons.alias(document=person_search_document())
+            .filter(document__trigram_word_similar=term)
+            .annotate(distance=TrigramWordDistance(term, "document"))
+            .order_by("distance")[:limit]
+        )
+        by_email = list(
+            persons.filter(account__email__trigram_word_similar=term)
+            .annotate(distance=TrigramWordDistance(term, "account__email"))
+            .order_by("distance")[:limit]
+        )
+
+    found = {}
+    for person in [*by_text, *by_email]:
+        if person.pk not in found or person.distance < found[person.pk].distance:
+            found[person.pk] = person
+    return sorted(
+        found.values(),
+        key=lambda person: (person.distance, person.last_name, person.first_name),
+    )[:limit]
@@ -0,0 +1,59 @@
+"""Per-process copy of the SiteSettings singleton.
+
+SiteSettings.get_settings() is read by middleware, context processors, forms
+and tasks on almost every request. Each process keeps the row in memory and
+only checks a version key in the shared cache; saving SiteSettings bumps the
+version (see MembersConfig.ready()), so every process reloads on its next
+read.
+"""
+
+import copy
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "members:site_settings_version"
+
+_lock = threading.Lock()
+_local = {"version": None, "settings": None}
+
+
+def get_settings():
+    """Return a private copy of the SiteSettings row, creating it if needed."""
+    from .models import SiteSettings
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+
+    with _lock:
+        if _local["version"] == version and _local["settings"] is not None:
+            # Callers may modify and save what they get; keep ours clean.
+            return copy.deepcopy(_local["settings"])
+
+    # Outside the lock: creating the row fires post_save, which bumps the
+    # version; the row we just created is the one matching the new version.
+    site_settings, created = SiteSettings.objects.get_or_create(pk=1)
+    if created:
+        version = cache.get(VERSION_KEY)
+    with _lock:
+        _local["settings"] = site_settings
+        _local["version"] = version
+    return copy.deepcopy(site_settings)
+
+
+def invalidate(**kwargs):
+    """Signal receiver: make every process reload the settings."""
+    _bump()
+    # Reload again once committed, in case another process read the old row
+    # between the save and the commit.
+    transaction.on_commit(_bump)
+
+
+def _bump():
+    with _lock:
+        _local["version"] = None
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
@@ -80,23 +80,26 @@ def run_passage():
          Celery comes back, the daily tick sees the marker unset for the
          current target year and performs the passage exactly once.
 
-    Promotion logic per active child:
+    Promotion logic per active child (see members.passage):
       - If Person.next_section is set, use that override (then clear it).
       - Otherwise compute the age on Dec 31 of the next school year:
         * exceeding the current Branch max age → next Branch (ordered by
           min_age_dec_31); with several sections, the alphabetically first.
         * exceeding the oldest Branch → switch role to Animateur and remove
           ParentChild links (out of household billing).
+
+    The whole troop is planned in memory from a few bulk queries and written
+    in one transaction, instead of several queries per child.
     """
-    from .models import (
-        Branch,
-        Enrollment,
-        ParentChild,
-        Person,
-        Role,
-        SchoolYear,
-        Section,
-        SiteSettings,
+    from .models import SchoolYear, SiteSettings
+    from .passage import (
+        AGE_OUT,
+        MOVE,
+        SKIP_NO_BIRTHDAY,
+        SKIP_NO_ENROLLMENT,
+        SKIP_NO_SECTION,
+        apply_passage,
+        plan_passage,
     )
 
     target_year = SchoolYear.next_school_year()
@@ -123,104 +126,36 @@ def run_passage():
         )
         return
 
-    # Dec 31 of the next school year (starts Aug `name`, ends Jul `name + 1`)
-    dec_31 = date(target_year.name + 1, 12, 31)
-    current_year = SchoolYear.current()
-
-    role_anime = Role.objects.get(short="e")
-    role_animateur = Role.objects.get(short="a")
-
-    children = Person.objects.filter(
-        primary_role=role_anime, status="a"
-    ).select_related("primary_role")
-
-    branches = list(Branch.objects.order_by("min_age_dec_31"))
-    if not branches:
+    plan = plan_passage(target_year, SchoolYear.current())
+    if plan is None:
         logger.warning("No branches defined. Passage skipped.")
         return
 
-    promoted = 0
-    aged_out = 0
-
-    for child in children:
-        if not child.birthday:
+    for decision in plan["decisions"]:
+        child = decision["child"]
+        action = decision["action"]
+        if action == SKIP_NO_BIRTHDAY:
             logger.warning(f"Skipping {child}: no birthday set")
-            continue
-
-        age_on_dec_31 = (dec_31 - child.birthday).days // 365
-
-        # Manual override
-        if child.next_section:
-            Enrollment.objects.update_or_create(
-                user=child,
-                school_year=target_year,
-                defaults={"section": child.next_section},
-            )
-            child.next_section = None
-            child.save(update_fields=["next_section"])
-            promoted += 1
-            continue
-
-        current_enrollment = Enrollment.objects.filter(
-            user=child,
-            school_year=current_year,
-        ).select_related("section__branch").first()
-
-        if not current_enrollment:
+        elif action == SKIP_NO_ENROLLMENT:
             logger.warning(f"Skipping {child}: no enrollment for current year")
-            continue
-
-        current_branch = current_enrollment.section.branch
-
-        # Child still fits in current branch → stay in the same section
-        if (
-            current_branch.max_age_dec_31 is not None
-            and age_on_dec_31 <= current_branch.max_age_dec_31
-        ):
-            Enrollment.objects.update_or_create(
-                user=child,
-                school_year=target_year,
-                defaults={"section": current_enrollment.section},
-            )
-            continue
-
-        # Find the branch matching the child's age
-        target_branch = None
-        for branch in branches:
-            if branch.min_age_dec_31 is not None and branch.max_age_dec_31 is not None:
-                if branch.min_age_dec_31 <= age_on_dec_31 <= branch.max_age_dec_31:
-                    target_branch = branch
-                    break
-
-        if target_branch is None:
-            # Child exceeds all branches → age out to Animateur
-            child.primary_role = role_animateur
-            child.save(update_fields=["primary_role"])
-            ParentChild.objects.filter(child=child).delete()
-            aged_out += 1
+        elif action == SKIP_NO_SECTION:
+            logger.warning(f"No section found for branch {decision['target_branch']}")
+        elif action == AGE_OUT:
             logger.info(f"{child} aged out → Animateur")
-            continue
+        elif action == MOVE:
+            logger.info(f"{child} → {decision['target_section']}")
 
-        # Assign the alphabetically first section in the target branch
-        target_section = Section.objects.filter(branch=target_branch).order_by("name").first()
-        if not target_section:
-            logger.warning(f"No section found for branch {target_branch}")
-            continue
-
-        Enrollment.objects.update_or_create(
-            user=child,
-            school_year=target_year,
-            defaults={"section": target_section},
-        )
-        promoted += 1
-        logger.info(f"{child} → {target_section}")
+    result = apply_passage(plan)
 
     # --- Record the marker so passage runs at most once per target year ----
     site_settings.last_passage_school_year = target_year.name
     site_settings.save(update_fields=["last_passage_school_year"])
 
-    logger.info(f"Passage complete: {promoted} promoted, {aged_out} aged out")
-    return {"promoted": promoted, "aged_out": aged_out}
+    logger.info(
+        f"Passage complete: {result['promoted']} promoted, "
+        f"{result['aged_out']} aged out"
+    )
+    return result
 
 
 @shared_task(name="notify_upcoming_deletion")
@@ -27,6 +27,7 @@ urlpatterns = [
     path("addchildkey", views.add_child_key_view, name="add_key_child"),
     path("children", views.child_list, name="child_list"),
     path("adminlist", views.AdminListView.as_view(), name="admin_list"),
+    path("adminlist/search", views.PersonSearchView.as_view(), name="person_search"),
     path("adminupdate/<str:pk>", views.AdminUpdateView.as_view(), name="admin_update"),
     path("child/<str:pk>/edit", views.edit_child, name="edit_child"),
     path("dettach/<str:pk>", views.dettach_child, name="dettach_child"),
@@ -49,4 +50,7 @@ urlpatterns = [
     ),
     path("documents/", views.DocumentListView.as_view(), name="documents"),
     path("mailqueue", views.MailQueueView.as_view(), name="mail_queue"),
+    path(
+        "passage/preview", views.PassagePreviewView.as_view(), name="passage_preview"
+    ),
 ]
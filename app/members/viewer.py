@@ -0,0 +1,201 @@
+"""Per-request profile of the logged-in user (the "viewer").
+
+Context processors and permission helpers all need the same facts about the
+user: role shorts, staff flag, current-year sections and family links.
+ViewerProfileMiddleware attaches a lazy ``request.viewer`` that loads them
+once (two queries) and keeps them in the session. The cached copy is dropped
+when the school year changes or when a PersonRole, Enrollment, ParentChild or
+Person row of the user, of one of their children or of one of their parents
+is written: each person has a version in the cache, bumped for the persons a
+written row is about and their families (see MembersConfig.ready()). Writes
+that cannot be traced to persons bump the version shared by everyone.
+"""
+
+import uuid
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+SESSION_KEY = "_viewer_profile"
+VERSION_KEY = "members:viewer_version"
+PERSON_VERSION_KEY = "members:viewer_version:{}"
+
+# Secondary roles allowed to message every member.
+SEND_ALL_ROLES = {"ar", "ad"}
+ANIMATEUR_ROLES = {"a", "ar"}
+
+
+class ViewerProfile:
+    """What templates and permission checks need to know about a user."""
+
+    def __init__(self, user, data=None):
+        data = data or {}
+        self.is_authenticated = bool(user and user.is_authenticated)
+        self.is_staff = bool(self.is_authenticated and user.is_staff)
+        self.is_superuser = bool(self.is_authenticated and user.is_superuser)
+        self.person_id = data.get("person_id")
+        self.primary_role = data.get("primary_role")
+        self.role_shorts = frozenset(data.get("role_shorts", ()))
+        self.section_ids = frozenset(data.get("section_ids", ()))
+        self.child_section_ids = frozenset(data.get("child_section_ids", ()))
+        self.child_ids = frozenset(data.get("child_ids", ()))
+        self.parent_ids = frozenset(data.get("parent_ids", ()))
+
+    @property
+    def has_person(self):
+        return self.person_id is not None
+
+    @property
+    def is_animateur(self):
+        return self.primary_role in ANIMATEUR_ROLES
+
+    @property
+    def can_send_all(self):
+        return self.is_staff or bool(self.role_shorts & SEND_ALL_ROLES)
+
+    @property
+    def is_tresorier(self):
+        return "t" in self.role_shorts
+
+    @property
+    def nav_section_ids(self):
+        """Sections the user is enrolled in, directly or through a child."""
+        return self.section_ids | self.child_section_ids
+
+
+def get_viewer(request):
+    """Return the ViewerProfile for ``request.user``, using the session copy."""
+    user = getattr(request, "user", None)
+    person_id = getattr(user, "person_id", None)
+    if not (user and user.is_authenticated and person_id):
+        return ViewerProfile(user)
+
+    from .models import SchoolYear
+
+    current_year = SchoolYear.current()
+    stamp = {
+        "version": _versions(VERSION_KEY, PERSON_VERSION_KEY.format(person_id)),
+        "user": str(user.pk),
+        "year": current_year.pk if current_year else None,
+    }
+    session = getattr(request, "session", None)
+    cached = session.get(SESSION_KEY) if session is not None else None
+    if cached and cached.get("stamp") == stamp:
+        return ViewerProfile(user, cached["data"])
+
+    data = _load(person_id, current_year)
+    if session is not None:
+        session[SESSION_KEY] = {"stamp": stamp, "data": data}
+    return ViewerProfile(user, data)
+
+
+def viewer_for(request):
+    """``request.viewer``, or a fresh profile when the middleware did not run."""
+    viewer = getattr(request, "viewer", None)
+    return viewer if viewer is not None else get_viewer(request)
+
+
+def invalidate(instance=None, **kwargs):
+    """Signal receiver: the cached profiles of the persons a written row is
+    about and of their parents and children are reloaded on next use; every
+    profile when the row does not say (or without ``instance``)."""
+    person_ids = _persons(instance, **kwargs)
+    if person_ids is None:
+        keys = [VERSION_KEY]
+    else:
+        keys = [PERSON_VERSION_KEY.format(pk) for pk in _with_family(person_ids)]
+    _bump(keys)
+    # Again once committed, in case a request cached the old rows meanwhile.
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def _persons(instance, pk_set=None, **kwargs):
+    """Ids of the persons a PersonRole, Enrollment, ParentChild or Person row
+    is about, or None when unknown."""
+    from .models import Enrollment, ParentChild, Person, PersonRole, Role
+
+    if isinstance(instance, Person):
+        return {instance.pk}
+    if isinstance(instance, PersonRole):
+        return {instance.person_id}
+    if isinstance(instance, Enrollment):
+        return {instance.user_id}
+    if isinstance(instance, ParentChild):
+        return {instance.parent_id, instance.child_id}
+    if isinstance(instance, Role) and pk_set is not None:
+        # Role.persons changed: pk_set holds the persons.
+        return set(pk_set)
+    return None
+
+
+def _with_family(person_ids):
+    from .models import ParentChild
+
+    family = set(person_ids)
+    for parent_id, child_id in ParentChild.objects.filter(
+        Q(parent__in=person_ids) | Q(child__in=person_ids)
+    ).values_list("parent_id", "child_id"):
+        family.update((parent_id, child_id))
+    return family
+
+
+def _bump(keys):
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+def _versions(*keys):
+    """The current versions of ``keys``, created when missing."""
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def _load(person_id, current_year):
+    """Load the profile data of a person (JSON-serializable for the session)."""
+    from .models import Enrollment, Person
+
+    rows = (
+        Person.objects.filter(pk=person_id)
+        .values("pk", "primary_role__short")
+        .annotate(
+            role_shorts=ArrayAgg(
+                "roles__short", distinct=True, filter=Q(roles__isnull=False)
+            ),
+            child_ids=ArrayAgg(
+                "as_parent__child", distinct=True, filter=Q(as_parent__isnull=False)
+            ),
+            parent_ids=ArrayAgg(
+                "as_child__parent", distinct=True, filter=Q(as_child__isnull=False)
+            ),
+        )
+    )
+    person = next(iter(rows), {})
+
+    section_ids = set()
+    child_section_ids = set()
+    if current_year is not None:
+        enrollments = Enrollment.objects.filter(
+            Q(user=person_id) | Q(user__as_child__parent=person_id),
+            school_year=current_year,
+        ).values_list("user_id", "section_id")
+        for user_id, section_id in enrollments.distinct():
+            if str(user_id) == str(person_id):
+                section_ids.add(section_id)
+            else:
+                child_section_ids.add(section_id)
+
+    return {
+        "person_id": str(person_id),
+        "primary_role": person.get("primary_role__short"),
+        "role_shorts": sorted(person.get("role_shorts") or []),
+        "section_ids": sorted(section_ids),
+        "child_section_ids": sorted(child_section_ids),
+        "child_ids": [str(pk) for pk in person.get("child_ids") or []],
+        "parent_ids": [str(pk) for pk in person.get("parent_ids") or []],
+    }
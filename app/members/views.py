@@ -1,3 +1,4 @@
+import csv
 import json
 
 # from django.contrib.auth import get_user_model
@@ -5,6 +6,18 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.sites.models import Site
+from django.db import transaction
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import ExtractYear
 from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
@@ -13,6 +26,7 @@ from django.views.generic import ListView, TemplateView, UpdateView
 from post_office import mail
 from post_office.models import STATUS, Email
 
+from . import mail_counters, mail_dispatch
 from .constants import (
     ERROR_MESSAGES,
 )
@@ -27,12 +41,14 @@ from .forms import (
 )
 from .models import (
     Account,
+    Enrollment,
     ImportantDocument,
     Person,
-    Role,
     SchoolYear,
     get_registration_admins,
 )
+from .passage import ACTION_LABELS, preview_passage
+from .search import MIN_LENGTH, search_persons
 
 
 class Login(TemplateView):
@@ -76,6 +92,10 @@ class AdminListView(UserPassesTestMixin, ListView):
     """
     Filter : first_name + totem, last_name, birthday (upper, lower), year selection, parents/members/all
     List: first_name + totem, last_name, if adult => adult type, section or status
+
+    Section, branch bounds and the age check for the selected year are
+    annotated on the queryset, so a page costs the same number of queries
+    whatever its size (``?per_page=``, up to ``max_paginate_by``).
     """
 
     model = Person
@@ -83,6 +103,8 @@ class AdminListView(UserPassesTestMixin, ListView):
     template_name = "members/admin_list.html"
     context_object_name = "members"
     paginate_by = 15
+    max_paginate_by = 500
+    page_size_choices = (15, 50, 100, 250, 500)
 
     # Define sortable fields and their corresponding model fields
     sortable_fields = {
@@ -112,57 +134,44 @@ class AdminListView(UserPassesTestMixin, ListView):
         # Default ordering
         return "last_name"
 
-    def get_context_data(self, *args, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get_paginate_by(self, queryset):
+        try:
+            per_page = int(self.request.GET.get("per_page", self.paginate_by))
+        except ValueError:
+            return self.paginate_by
+        return min(max(per_page, 1), self.max_paginate_by)
 
-        # Get the selected year from the request, default to current year if not specified
+    def get_selected_year(self):
+        """The school year picked in the filter, defaulting to the current one."""
         selected_year_id = self.request.GET.get("year", None)
         if selected_year_id:
-            selected_year = SchoolYear.objects.get(pk=selected_year_id)
-        else:
-            selected_year = SchoolYear.current()
+            return SchoolYear.objects.get(pk=selected_year_id)
+        return SchoolYear.current()
 
-        # Create the filter with the current queryset
-        context["filter"] = PersonFilter(self.request.GET, queryset=self.get_queryset())
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context["filter"] = self.filterset
 
-        # For each person in the (paginated) object_list, add their section for the selected year
         for person in context["object_list"]:
-            try:
-                enrollment = person.enrollment_set.filter(
-                    school_year=selected_year
-                ).select_related("section__branch").first()
-                person.section_display = enrollment.section.name if enrollment else "-"
-                # Check age compatibility with section's branch
-                person.age_mismatch = False
-                if enrollment and person.birthday and enrollment.section.branch:
-                    age_at_dec_31 = selected_year.name - person.birthday.year
-                    branch = enrollment.section.branch
-                    if branch.min_age_dec_31 is not None and branch.max_age_dec_31 is not None:
-                        if not (branch.min_age_dec_31 <= age_at_dec_31 <= branch.max_age_dec_31):
-                            person.age_mismatch = True
-                            person.age_mismatch_detail = _(
-                                "%(age)s years old — branch %(branch)s: "
-                                "%(min)s-%(max)s years old"
-                            ) % {
-                                "age": age_at_dec_31,
-                                "branch": branch.name,
-                                "min": branch.min_age_dec_31,
-                                "max": branch.max_age_dec_31,
-                            }
-            except (SchoolYear.DoesNotExist, AttributeError):
-                person.section_display = "-"
-                person.age_mismatch = False
-
-            # Get the primary role
-            person.role = Role.objects.get(id=person.primary_role_id)
-            #     person=person, role__is_primary=True
-            # ).first()
-            # person.role = primary_role.role.name if primary_role else "-"
+            person.section_display = person.section_name or "-"
+            if person.age_mismatch:
+                person.age_mismatch_detail = _(
+                    "%(age)s years old — branch %(branch)s: "
+                    "%(min)s-%(max)s years old"
+                ) % {
+                    "age": person.age_dec_31,
+                    "branch": person.branch_name,
+                    "min": person.branch_min_age,
+                    "max": person.branch_max_age,
+                }
 
         # Add sorting information to context
         context["current_sort"] = self.request.GET.get("sort", "last_name")
         context["current_direction"] = self.request.GET.get("direction", "asc")
         context["sortable_fields"] = self.sortable_fields.keys()
+        context["page_size_choices"] = self.page_size_choices
+        context["per_page"] = self.get_paginate_by(self.object_list)
 
         # Define field names and their display names
         context["fields_map"] = [
@@ -178,14 +187,72 @@ class AdminListView(UserPassesTestMixin, ListView):
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        queryset = PersonFilter(self.request.GET, queryset=queryset).qs
+        self.filterset = PersonFilter(self.request.GET, queryset=queryset)
+        queryset = self.filterset.qs
 
         # Apply ordering
         ordering = self.get_ordering()
         if ordering:
             queryset = queryset.order_by(ordering)
 
-        return queryset
+        return self.annotate_section(queryset, self.get_selected_year())
+
+    @staticmethod
+    def annotate_section(queryset, school_year):
+        """Annotate each person's section and branch age bounds for ``school_year``.
+
+        ``age_mismatch`` is True when the whole-year age on 31 December
+        (year name minus birth year) falls outside the branch bounds.
+        """
+        enrollment = Enrollment.objects.filter(
+            user=OuterRef("pk"), school_year=school_year
+        ).order_by("pk")
+        queryset = queryset.select_related("primary_role").annotate(
+            section_name=Subquery(enrollment.values("section__name")[:1]),
+            branch_name=Subquery(enrollment.values("section__branch__name")[:1]),
+            branch_min_age=Subquery(
+                enrollment.values("section__branch__min_age_dec_31")[:1]
+            ),
+            branch_max_age=Subquery(
+                enrollment.values("section__branch__max_age_dec_31")[:1]
+            ),
+        )
+        if school_year is None:
+            return queryset.annotate(
+                age_dec_31=Value(None, output_field=IntegerField()),
+                age_mismatch=Value(False),
+            )
+        return queryset.annotate(
+            age_dec_31=Value(school_year.name) - ExtractYear("birthday"),
+            age_mismatch=Case(
+                When(
+                    Q(age_dec_31__lt=F("branch_min_age"))
+                    | Q(age_dec_31__gt=F("branch_max_age")),
+                    branch_min_age__isnull=False,
+                    branch_max_age__isnull=False,
+                    then=Value(True),
+                ),
+                default=Value(False),
+            ),
+        )
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+class PersonSearchView(UserPassesTestMixin, TemplateView):
+    """Typeahead of the member list: the persons best matching ``?q=``."""
+
+    template_name = "members/_person_search.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "")
+        context["searched"] = len(query.strip()) >= MIN_LENGTH
+        context["persons"] = search_persons(
+            query, Person.objects.select_related("primary_role")
+        )
+        return context
 
     def test_func(self):
         return self.request.user.is_staff
@@ -225,16 +292,13 @@ class AdminUpdateView(UserPassesTestMixin, UpdateView):
 
         # Get next section enrollment if it exists
         try:
-            next_year_name = current_year.name + 1
-            try:
-                next_year = SchoolYear.objects.get(name=next_year_name)
+            next_year = SchoolYear.next_school_year()
+            if next_year:
                 enrollment = self.object.enrollment_set.filter(
                     school_year=next_year
                 ).first()
                 if enrollment:
                     form.fields["next_section"].initial = enrollment.section
-            except SchoolYear.DoesNotExist:
-                pass
         except (AttributeError, KeyError):
             pass
 
@@ -580,9 +644,11 @@ class MailQueueView(UserPassesTestMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["queued_count"] = Email.objects.filter(status=STATUS.queued).count()
-        context["requeued_count"] = Email.objects.filter(status=STATUS.requeued).count()
-        context["failed_count"] = Email.objects.filter(status=STATUS.failed).count()
+        counts = mail_counters.get_counts()
+        context["queued_count"] = counts["queued"]
+        context["requeued_count"] = counts["requeued"]
+        context["failed_count"] = counts["failed"]
+        context["dispatch_metrics"] = mail_dispatch.metrics()
         return context
 
     def post(self, request, *args, **kwargs):
@@ -593,10 +659,64 @@ class MailQueueView(UserPassesTestMixin, TemplateView):
                 number_of_retries=0,
                 scheduled_time=None,
             )
+            mail_counters.adjust(failed=-count, queued=count)
+            transaction.on_commit(mail_dispatch.schedule)
             messages.success(
                 request, _("%(count)s email(s) requeued.") % {"count": count}
             )
         elif action == "purge":
-            count, _deleted = Email.objects.filter(status=STATUS.failed).delete()
+            _total, deleted = Email.objects.filter(status=STATUS.failed).delete()
+            # The total also counts cascaded logs and attachment links.
+            count = deleted.get(Email._meta.label, 0)
+            mail_counters.adjust(failed=-count)
             messages.success(request, _("%(count)s email(s) purged.") % {"count": count})
         return redirect("members:mail_queue")
+
+
+class PassagePreviewView(UserPassesTestMixin, TemplateView):
+    """Staff dry run of the automatic passage (nothing is written).
+
+    ``?format=csv`` exports the same rows as a spreadsheet.
+    """
+
+    template_name = "members/passage_preview.html"
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        report = preview_passage()
+        if report is not None and request.GET.get("format") == "csv":
+            return self._csv_response(report)
+        return self.render_to_response(self.get_context_data(report=report))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        report = kwargs["report"]
+        if report is not None:
+            context["summary"] = [
+                (action, label, report["summary"][action])
+                for action, label in ACTION_LABELS.items()
+            ]
+        return context
+
+    @staticmethod
+    def _csv_response(report):
+        response = HttpResponse(content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = (
+            f'attachment; filename="passage-{report["target_year"]}.csv"'
+        )
+        writer = csv.writer(response)
+        writer.writerow([
+            _("Last name"), _("First name"), _("Date of birth"),
+            _("Age on December 31"), _("Outcome"),
+            _("Current section"), _("Next section"),
+        ])
+        for row in report["rows"]:
+            writer.writerow([
+                row["last_name"], row["first_name"], row["birthday"] or "",
+                "" if row["age_dec_31"] is None else row["age_dec_31"],
+                row["action_label"],
+                row["current_section"] or "", row["target_section"] or "",
+            ])
+        return response
@@ -6,11 +6,11 @@ from .models import SectionMessage, SectionMessageRecipient
 class SectionMessageRecipientInline(admin.TabularInline):
     model = SectionMessageRecipient
     extra = 0
-    readonly_fields = ("parent", "sent_at")
+    readonly_fields = ("parent", "selected", "sent_at")
 
 
 @admin.register(SectionMessage)
 class SectionMessageAdmin(admin.ModelAdmin):
-    list_display = ("subject", "section", "sender", "created_at")
+    list_display = ("subject", "section", "sender", "created_at", "dispatched_at")
     list_filter = ("section", "created_at")
     inlines = [SectionMessageRecipientInline]
@@ -0,0 +1,201 @@
+"""Queue the emails of a SectionMessage outside the request.
+
+compose_message only stores the message and its recipient rows, then hands
+the message id to the send_section_message task. The task walks the pending
+recipients in batches: the section_message template is rendered once per
+language, the Email rows of a batch are written with one bulk insert, the
+message's files are shared post_office attachments linked to every Email,
+and the batch's recipients get their sent_at. A retried task only
+picks up recipients that are still pending.
+"""
+
+import logging
+from email.utils import make_msgid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Count, Q
+from django.template import Context, Template
+from django.utils import timezone, translation
+from django.utils.translation import gettext as _
+from post_office.models import PRIORITY, STATUS, Attachment, Email, EmailTemplate
+from post_office.settings import get_message_id_enabled, get_message_id_fqdn
+from post_office.signals import email_queued
+from post_office.utils import create_attachments, get_email_template
+
+from .models import SectionMessage, SectionMessageRecipient
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME = "section_message"
+BATCH_SIZE = 200
+
+
+def progress(message):
+    """Return {"total", "sent", "done"} for the selected recipients of a message."""
+    counts = message.recipients.aggregate(
+        total=Count("pk", filter=Q(selected=True)),
+        sent=Count("pk", filter=Q(selected=True, sent_at__isnull=False)),
+    )
+    counts["done"] = message.dispatched_at is not None
+    return counts
+
+
+def dispatch(message_id):
+    """Queue the emails of every pending recipient of a message.
+
+    Returns the number of recipients marked as sent.
+    """
+    message = (
+        SectionMessage.objects.select_related("sender", "section")
+        .filter(pk=message_id)
+        .first()
+    )
+    if message is None or message.dispatched_at is not None:
+        return 0
+
+    attachments = None
+    rendered = {}
+    sent = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            SectionMessageRecipient.objects.filter(
+                message=message, selected=True, sent_at__isnull=True, pk__gt=last_pk
+            )
+            .select_related("parent__account")
+            .order_by("pk")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        by_language = {}
+        for recipient in batch:
+            account = getattr(recipient.parent, "account", None)
+            language = (account and account.preferred_language) or settings.LANGUAGE_CODE
+            by_language.setdefault(language, []).append(recipient)
+
+        emails = []
+        for language, recipients in by_language.items():
+            if language not in rendered:
+                rendered[language] = _render(message, language)
+            for recipient in recipients:
+                address = _address(recipient)
+                if address:
+                    emails.append(_build_email(address, rendered[language]))
+
+        with transaction.atomic():
+            if emails and attachments is None:
+                attachments = _email_attachments(message)
+            _queue(emails, attachments or [])
+            SectionMessageRecipient.objects.filter(
+                pk__in=[recipient.pk for recipient in batch]
+            ).update(sent_at=timezone.now())
+        if emails:
+            # Once committed, so the flush triggered by it sees the rows.
+            email_queued.send(sender=Email, emails=emails)
+        sent += len(batch)
+
+    message.dispatched_at = timezone.now()
+    message.save(update_fields=["dispatched_at"])
+    return sent
+
+
+def _address(recipient):
+    """Return the recipient's email address, or None if it has no usable one."""
+    account = getattr(recipient.parent, "account", None)
+    if account is None or not account.email:
+        return None
+    try:
+        validate_email(account.email)
+    except ValidationError:
+        logger.warning("Skipping invalid address %r for message recipient %s",
+                       account.email, recipient.pk)
+        return None
+    return account.email
+
+
+def _get_template(language):
+    try:
+        return get_email_template(TEMPLATE_NAME, language)
+    except EmailTemplate.DoesNotExist:
+        # No translation for this language: use the default template.
+        return get_email_template(TEMPLATE_NAME)
+
+
+def _render(message, language):
+    """Render subject, text and HTML bodies of a message in one language."""
+    template = _get_template(language)
+    with translation.override(language):
+        context = Context({
+            "sender_name": str(message.sender),
+            "section_name": message.section.name if message.section else _("All members"),
+            "subject": message.subject,
+            "body": message.body,
+        })
+        return {
+            "template": template,
+            "subject": Template(template.subject).render(context),
+            "message": Template(template.content).render(context),
+            "html_message": Template(template.html_content).render(context),
+        }
+
+
+def _build_email(address, rendered):
+    return Email(
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[address],
+        subject=rendered["subject"],
+        message=rendered["message"],
+        html_message=rendered["html_message"],
+        template=rendered["template"],
+        message_id=_message_id(),
+        # Below the default: a large fan-out must not hold up other mail.
+        priority=PRIORITY.low,
+        status=STATUS.queued,
+    )
+
+
+def _message_id():
+    if not get_message_id_enabled():
+        return None
+    return make_msgid(domain=get_message_id_fqdn())
+
+
+def _email_attachments(message):
+    """Return the post_office attachments of a message's files.
+
+    Each file is copied into post_office once and the copy is reused by
+    every later message carrying the same file.
+    """
+    result = []
+    for attachment in message.attachments.select_related("email_attachment"):
+        if attachment.email_attachment is None:
+            attachment.email_attachment = create_attachments(
+                {attachment.original_name: attachment.file}
+            )[0]
+            attachment.save(update_fields=["email_attachment"])
+        result.append(attachment.email_attachment)
+    return result
+
+
+def _queue(emails, attachments):
+    """Insert pre-rendered Email rows and link the attachments to each.
+
+    Does what post_office.mail.send_many() does, except that send_many()
+    re-renders every subject and body as a template, once per email, and
+    cannot attach files.
+    """
+    if not emails:
+        return
+    Email.objects.bulk_create(emails)
+    if attachments:
+        Through = Attachment.emails.through
+        Through.objects.bulk_create([
+            Through(attachment_id=attachment.pk, email_id=email.pk)
+            for email in emails
+            for attachment in attachments
+        ])
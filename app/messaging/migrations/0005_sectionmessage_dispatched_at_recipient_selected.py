@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill(apps, schema_editor):
+    SectionMessage = apps.get_model("messaging", "SectionMessage")
+    SectionMessageRecipient = apps.get_model("messaging", "SectionMessageRecipient")
+    # Messages used to be sent inside the request: everything is dispatched,
+    # and every recipient with a sent_at was checked.
+    SectionMessage.objects.update(dispatched_at=F("created_at"))
+    SectionMessageRecipient.objects.filter(sent_at__isnull=False).update(selected=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0004_messageattachment_sectionmessage_attachments"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sectionmessage",
+            name="dispatched_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="sectionmessagerecipient",
+            name="selected",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
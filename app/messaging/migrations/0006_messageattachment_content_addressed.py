@@ -0,0 +1,26 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:09
+
+import django.db.models.deletion
+import messaging.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_sectionmessage_dispatched_at_recipient_selected'),
+        ('post_office', '0014_alter_email_recipient_delivery_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messageattachment',
+            name='email_attachment',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='post_office.attachment'),
+        ),
+        migrations.AlterField(
+            model_name='messageattachment',
+            name='file',
+            field=models.FileField(upload_to=messaging.models.attachment_path),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0021_index_pack'),
+        ('messaging', '0006_messageattachment_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sectionmessage',
+            index=models.Index(fields=['section', 'school_year', 'created_at'], name='message_section_year_created'),
+        ),
+    ]
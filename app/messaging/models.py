@@ -1,17 +1,33 @@
+import os
 import uuid
 
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
+def attachment_path(instance, filename):
+    """Content-addressed path: message_attachments/<h[:2]>/<sha256><ext>."""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"message_attachments/{instance.content_hash[:2]}/{instance.content_hash}{ext}"
+
+
 class MessageAttachment(models.Model):
     """File attachment with content-hash deduplication."""
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    file = models.FileField(upload_to="message_attachments/")
+    file = models.FileField(upload_to=attachment_path)
     original_name = models.CharField(max_length=255)
     content_hash = models.CharField(max_length=64, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # post_office copy of the file, linked to every email that carries it.
+    email_attachment = models.ForeignKey(
+        "post_office.Attachment",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+    )
 
     def __str__(self):
         return self.original_name
@@ -38,9 +54,17 @@ class SectionMessage(models.Model):
         MessageAttachment, blank=True, related_name="messages"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set once every selected recipient's email is queued (see messaging.fanout).
+    dispatched_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["section", "school_year", "created_at"],
+                name="message_section_year_created",
+            ),
+        ]
 
     def __str__(self):
         section_name = self.section.name if self.section else _("All users")
@@ -54,11 +78,18 @@ class SectionMessageRecipient(models.Model):
     parent = models.ForeignKey(
         "members.Person", on_delete=models.CASCADE, related_name="received_messages"
     )
+    # Checked in the compose form; sent_at is set once its email is queued.
+    selected = models.BooleanField(default=False)
     sent_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = [("message", "parent")]
 
     def __str__(self):
-        status = _("sent") if self.sent_at else _("ignored")
+        if self.sent_at:
+            status = _("sent")
+        elif self.selected:
+            status = _("pending")
+        else:
+            status = _("ignored")
         return f"{self.parent} - {self.message.subject} ({status})"
@@ -0,0 +1,172 @@
+"""Resolve the recipient groups loaded in the compose form.
+
+Every loaded token ("group", "group:section_id", or "person:person_id" for
+one person picked with the search) becomes a predicate on Person; the predicates are OR-ed into one query that also fetches the
+account and aggregates, for parents, the first names of their children
+enrolled in the loaded sections. Loading more groups adds predicates, not
+queries.
+"""
+
+import uuid
+
+from django.db.models import Q, StringAgg, Value
+
+from members.models import Enrollment, ParentChild, Person
+
+from .forms import RECIPIENT_GROUP_CHOICES
+
+SECTION_GROUPS = {"section_parents", "section_animateurs", "section_animes", "section_all"}
+PERSON_GROUP = "person"
+
+VALID_GROUPS = {choice[0] for choice in RECIPIENT_GROUP_CHOICES}
+
+ANIMATEUR_ROLES = ["a", "ar"]
+STAFF_ROLES = ["ar", "ad", "t", "ri"]
+
+
+def parse_token(token):
+    """Split a "group" or "group:section_id" token, returning (group, section_id).
+
+    A "person:person_id" token returns (PERSON_GROUP, person_id). Returns
+    (None, None) for malformed or unknown groups.
+    """
+    group, _, section_id = token.partition(":")
+    if group == PERSON_GROUP:
+        try:
+            return group, str(uuid.UUID(section_id))
+        except ValueError:
+            return None, None
+    if group not in VALID_GROUPS:
+        return None, None
+    return group, section_id or None
+
+
+def searchable_persons(school_year, sender, locked_section=None):
+    """The persons the sender may pick one by one with the search.
+
+    Animateurs locked to their section may pick anyone of it; the others
+    anyone who can be emailed.
+    """
+    if locked_section is not None:
+        predicate = _group_predicate("section_all", locked_section.pk, school_year)
+    else:
+        predicate = _group_predicate("everyone", None, school_year)
+    return Person.objects.filter(predicate).exclude(pk=sender.pk)
+
+
+def resolve_recipients(tokens, school_year, sender, locked_section=None):
+    """Resolve loaded tokens into one sorted, deduplicated recipient list.
+
+    Returns [{"person": Person, "detail": str}] with ``person.account``
+    already loaded. Section tokens of animateurs locked to their section
+    (``locked_section``) are resolved against that section, whatever the
+    posted section id, and their person tokens only match people of that
+    section. The sender is left out.
+    """
+    predicate = Q()
+    parent_sections = set()
+    groups = set()
+    for token in tokens:
+        group, section_id = parse_token(token)
+        if group is None:
+            continue
+        if group == PERSON_GROUP:
+            groups.add(group)
+            person = Q(pk=section_id)
+            if locked_section is not None:
+                person &= _group_predicate("section_all", locked_section.pk, school_year)
+            predicate |= person
+            continue
+        if group in SECTION_GROUPS:
+            if locked_section is not None:
+                section_id = locked_section.pk
+            elif not str(section_id or "").isdigit():
+                continue
+            section_id = int(section_id)
+            if group in ("section_parents", "section_all"):
+                parent_sections.add(section_id)
+        groups.add(group)
+        predicate |= _group_predicate(group, section_id, school_year)
+
+    if not groups:
+        return []
+
+    persons = (
+        Person.objects.filter(predicate)
+        .exclude(pk=sender.pk)
+        .select_related("account")
+        .order_by("last_name", "first_name")
+    )
+    if parent_sections:
+        persons = persons.annotate(
+            children_names=_children_names(parent_sections, school_year),
+        )
+
+    result = []
+    for person in persons:
+        detail = getattr(person, "children_names", None) or ""
+        account = getattr(person, "account", None)
+        if not detail and groups & {"everyone", PERSON_GROUP} and account is not None:
+            detail = account.email
+        result.append({"person": person, "detail": detail})
+    return result
+
+
+def _enrolled(section_id, school_year):
+    return Q(pk__in=Enrollment.objects.filter(
+        section_id=section_id, school_year=school_year,
+    ).values("user_id"))
+
+
+def _parents_of_enrolled(section_id, school_year):
+    return Q(pk__in=ParentChild.objects.filter(
+        child__enrollment__section_id=section_id,
+        child__enrollment__school_year=school_year,
+    ).values("parent_id"))
+
+
+def _with_roles(shorts):
+    return Q(pk__in=Person.objects.filter(roles__short__in=shorts).values("pk"))
+
+
+def _group_predicate(group, section_id, school_year):
+    """Return the Q matching the persons of one group."""
+    if group == "section_parents":
+        return _parents_of_enrolled(section_id, school_year)
+    if group == "section_animateurs":
+        return Q(primary_role__short__in=ANIMATEUR_ROLES) & _enrolled(section_id, school_year)
+    if group == "section_animes":
+        return Q(primary_role__short="e") & _enrolled(section_id, school_year)
+    if group == "section_all":
+        return (
+            _parents_of_enrolled(section_id, school_year)
+            | (
+                Q(primary_role__short__in=[*ANIMATEUR_ROLES, "e"])
+                & _enrolled(section_id, school_year)
+            )
+        )
+    if group == "all_animateurs":
+        return Q(primary_role__short__in=ANIMATEUR_ROLES)
+    if group == "animateurs_staff":
+        return Q(primary_role__short__in=ANIMATEUR_ROLES) | _with_roles(STAFF_ROLES)
+    if group == "staff":
+        return _with_roles(STAFF_ROLES)
+    if group == "active_parents":
+        return Q(primary_role__short="p") & _with_roles(["pa"])
+    if group == "everyone":
+        return Q(account__isnull=False, account__email__isnull=False) & ~Q(account__email="")
+    raise ValueError(group)
+
+
+def _children_names(section_ids, school_year):
+    """First names of a parent's children enrolled in one of ``section_ids``."""
+    return StringAgg(
+        "as_parent__child__first_name",
+        delimiter=Value(", "),
+        distinct=True,
+        order_by="as_parent__child__first_name",
+        filter=Q(
+            as_parent__child__enrollment__section_id__in=section_ids,
+            as_parent__child__enrollment__school_year=school_year,
+        ),
+    )
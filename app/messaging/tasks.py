@@ -47,3 +47,13 @@ def cleanup_orphaned_attachments():
     else:
         logger.info("No orphaned attachments to clean up")
     return deleted_count
+
+
+@shared_task(name="send_section_message")
+def send_section_message(message_id):
+    """Queue the emails of a composed message (see messaging.fanout)."""
+    from messaging import fanout
+
+    sent = fanout.dispatch(message_id)
+    logger.info(f"Queued message {message_id} for {sent} recipients")
+    return sent
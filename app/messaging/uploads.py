@@ -0,0 +1,54 @@
+"""Upload handlers that hash files while they stream in.
+
+Installed through FILE_UPLOAD_HANDLERS, they behave like Django's memory and
+temporary-file handlers and additionally set ``uploaded_file.sha256`` from
+the chunks they receive, so the content hash costs no second read and no
+in-memory copy of the file.
+"""
+
+import hashlib
+
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+
+
+class HashingMixin:
+    def new_file(self, *args, **kwargs):
+        # Before super(): an activated memory handler raises StopFutureHandlers.
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes chunks on once a file is too big for it;
+        # the temporary-file handler that receives them does the hashing.
+        if getattr(self, "activated", True):
+            self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.sha256 = self.sha256.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def sha256_of(uploaded_file):
+    """Return the hex SHA-256 of an uploaded file, reading it in chunks if needed."""
+    digest = getattr(uploaded_file, "sha256", None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        sha256.update(chunk)
+    uploaded_file.seek(0)
+    return sha256.hexdigest()
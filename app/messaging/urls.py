@@ -6,7 +6,13 @@ app_name = "messaging"
 
 urlpatterns = [
     path("compose/", views.compose_message, name="compose"),
+    path("compose/persons/", views.recipient_search, name="recipient_search"),
     path("history/", views.animateur_history, name="animateur_history"),
     path("history/<uuid:message_id>/", views.message_detail, name="message_detail"),
+    path(
+        "history/<uuid:message_id>/progress/",
+        views.message_progress,
+        name="message_progress",
+    ),
     path("section/<int:section_id>/", views.section_history, name="section_history"),
 ]
@@ -1,217 +1,69 @@
-import hashlib
-
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import Http404
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from post_office import mail
 
 from homepage.models import Event
 from members.models import (
     Enrollment,
     ImportantDocument,
-    Person,
-    Role,
     SchoolYear,
     Section,
 )
-
-from .forms import RECIPIENT_GROUP_CHOICES, ComposeMessageForm
-from .models import MessageAttachment, SectionMessage, SectionMessageRecipient
+from members.search import MIN_LENGTH, search_persons
+
+from . import fanout
+from .forms import ComposeMessageForm
+from .models import (
+    MessageAttachment,
+    SectionMessage,
+    SectionMessageRecipient,
+    attachment_path,
+)
+from .recipients import (
+    PERSON_GROUP,
+    SECTION_GROUPS,
+    resolve_recipients,
+    searchable_persons,
+)
+from .tasks import send_section_message
+from .uploads import sha256_of
 
 
-def _get_animateur_person(user):
+def _get_animateur_person(request):
     """Return the Person for an animateur user, or None."""
-    if not hasattr(user, "person"):
-        return None
-    person = user.person
-    if person.primary_role.short != "a":
+    if request.viewer.primary_role != "a":
         return None
-    return person
+    return request.user.person
 
 
-def _can_send_all(user):
+def _can_send_all(request):
     """Check if user can send messages to all members.
 
     Staff or users with secondary role 'ar' or 'ad' can send to all.
     Regular animateurs can only send to their section.
     """
-    if user.is_staff:
-        return True
-    if not hasattr(user, "person"):
-        return False
-    person = user.person
-    if person.roles.filter(short__in=["ar", "ad"]).exists():
-        return True
-    return False
+    return request.viewer.can_send_all
 
 
-def _is_authorized(user):
+def _is_authorized(request):
     """Check if user can access the messaging system at all."""
-    if _can_send_all(user):
+    if _can_send_all(request):
         return True
-    return _get_animateur_person(user) is not None
-
-
-def _get_section_parents(section, school_year):
-    """Return parents of children enrolled in a section, with annotated children list."""
-    parents = (
-        Person.objects.filter(
-            as_parent__child__enrollment__section=section,
-            as_parent__child__enrollment__school_year=school_year,
-        )
-        .distinct()
-        .order_by("last_name", "first_name")
-    )
-
-    result = []
-    for parent in parents:
-        children = Person.objects.filter(
-            as_child__parent=parent,
-            enrollment__section=section,
-            enrollment__school_year=school_year,
-        ).distinct()
-        result.append({"person": parent, "detail": ", ".join(c.first_name for c in children)})
-    return result
-
-
-def _get_section_animateurs(section, school_year):
-    """Return animateurs enrolled in a section for a given school year."""
-    animateurs = (
-        Person.objects.filter(
-            primary_role__short__in=["a", "ar"],
-            enrollment__section=section,
-            enrollment__school_year=school_year,
-        )
-        .distinct()
-        .order_by("last_name", "first_name")
-    )
-    return [{"person": p, "detail": ""} for p in animateurs]
-
-
-def _get_section_animes(section, school_year):
-    """Return animés (children) enrolled in a section for a given school year."""
-    animes = (
-        Person.objects.filter(
-            primary_role__short="e",
-            enrollment__section=section,
-            enrollment__school_year=school_year,
-        )
-        .distinct()
-        .order_by("last_name", "first_name")
-    )
-    return [{"person": p, "detail": ""} for p in animes]
-
-
-def _get_section_all(section, school_year):
-    """Return parents, animés, and animateurs of a section (deduplicated)."""
-    parents = _get_section_parents(section, school_year)
-    animes = _get_section_animes(section, school_year)
-    animateurs = _get_section_animateurs(section, school_year)
-
-    seen = set()
-    result = []
-    for entry in parents + animes + animateurs:
-        pk = entry["person"].pk
-        if pk not in seen:
-            seen.add(pk)
-            result.append(entry)
-    return result
-
-
-def _get_all_animateurs():
-    """Return all persons with primary role Animateur."""
-    animateurs = (
-        Person.objects.filter(primary_role__short__in=["a", "ar"])
-        .order_by("last_name", "first_name")
-    )
-    return [{"person": p, "detail": ""} for p in animateurs]
-
-
-def _get_animateurs_plus_staff():
-    """Return all animateurs + persons with staff secondary roles."""
-    staff_roles = Role.objects.filter(short__in=["ar", "ad", "t", "ri"])
-    animateurs = Person.objects.filter(primary_role__short__in=["a", "ar"])
-    staff = Person.objects.filter(roles__in=staff_roles)
-    persons = (animateurs | staff).distinct().order_by("last_name", "first_name")
-    return [{"person": p, "detail": ""} for p in persons]
-
-
-def _get_staff():
-    """Return persons with staff secondary roles (ar, ad, t, ri)."""
-    staff_roles = Role.objects.filter(short__in=["ar", "ad", "t", "ri"])
-    persons = (
-        Person.objects.filter(roles__in=staff_roles)
-        .distinct()
-        .order_by("last_name", "first_name")
-    )
-    return [{"person": p, "detail": ""} for p in persons]
-
-
-def _get_active_parents():
-    """Return parents who have the 'Parent actif' secondary role."""
-    persons = (
-        Person.objects.filter(
-            primary_role__short="p",
-            roles__short="pa",
-        )
-        .distinct()
-        .order_by("last_name", "first_name")
-    )
-    return [{"person": p, "detail": ""} for p in persons]
+    return _get_animateur_person(request) is not None
 
 
-def _get_everyone():
-    """Return all persons who have an account with an email."""
-    persons = (
-        Person.objects.filter(account__isnull=False, account__email__isnull=False)
-        .exclude(account__email="")
-        .select_related("account")
-        .order_by("last_name", "first_name")
+def _locked_section(request, school_year):
+    """The section of an animateur who cannot send to all, or None."""
+    enrollment = (
+        Enrollment.objects.filter(user=request.user.person, school_year=school_year)
+        .select_related("section")
+        .first()
     )
-    return [{"person": p, "detail": p.account.email} for p in persons]
-
-
-SECTION_GROUPS = {"section_parents", "section_animateurs", "section_animes", "section_all"}
-
-VALID_GROUPS = {choice[0] for choice in RECIPIENT_GROUP_CHOICES}
-
-
-def _resolve_recipients(group, section, school_year):
-    """Resolve recipient group + section into a list of {person, detail} dicts."""
-    if group == "section_parents":
-        return _get_section_parents(section, school_year)
-    elif group == "section_animateurs":
-        return _get_section_animateurs(section, school_year)
-    elif group == "section_animes":
-        return _get_section_animes(section, school_year)
-    elif group == "section_all":
-        return _get_section_all(section, school_year)
-    elif group == "all_animateurs":
-        return _get_all_animateurs()
-    elif group == "animateurs_staff":
-        return _get_animateurs_plus_staff()
-    elif group == "staff":
-        return _get_staff()
-    elif group == "active_parents":
-        return _get_active_parents()
-    elif group == "everyone":
-        return _get_everyone()
-    return []
-
-
-def _parse_group_token(token):
-    """Split a "group" or "group:section_id" token, returning (group, section_id).
-
-    Returns (None, None) for malformed or unknown groups.
-    """
-    group, _, section_id = token.partition(":")
-    if group not in VALID_GROUPS:
-        return None, None
-    return group, section_id or None
+    return enrollment.section if enrollment else None
 
 
 def _loaded_group_tokens(request_post, current_group, current_section_id, append_current=True):
@@ -239,34 +91,6 @@ def _loaded_group_tokens(request_post, current_group, current_section_id, append
     return tokens
 
 
-def _resolve_all_recipients(tokens, school_year, person, animateur_section):
-    """Resolve every loaded token into one merged, deduplicated recipient list.
-
-    Animateurs locked to their section have section-group tokens resolved
-    against their own section, regardless of the posted section id.
-    The sender is filtered out of the result.
-    """
-    merged = []
-    seen = set()
-    for token in tokens:
-        group, section_id = _parse_group_token(token)
-        if group is None:
-            continue
-        section = None
-        if group in SECTION_GROUPS:
-            if animateur_section is not None:
-                section = animateur_section
-            elif section_id:
-                section = Section.objects.filter(pk=section_id).first()
-        for entry in _resolve_recipients(group, section, school_year):
-            pk = entry["person"].pk
-            if pk not in seen and pk != person.pk:
-                seen.add(pk)
-                merged.append(entry)
-    merged.sort(key=lambda e: (e["person"].last_name, e["person"].first_name))
-    return merged
-
-
 def _checked_recipient_pks(request_post):
     """Return the set of person pks (as strings) whose recipient checkbox is checked.
 
@@ -302,27 +126,26 @@ def _handle_attachment_and_docs(request, msg):
     """Process file attachments and ImportantDocument checkboxes.
 
     Modifies msg.body in place (appends document links) and saves the model.
-    Returns a dict of {filename: file} for email attachment.
+    The files are attached to the emails by the send_section_message task.
     """
     # Handle file uploads with content-hash dedup (max 10)
     uploaded_files = request.FILES.getlist("attachments")[:10]
-    email_attachments = {}
     for uploaded_file in uploaded_files:
-        file_content = uploaded_file.read()
-        content_hash = hashlib.sha256(file_content).hexdigest()
-        uploaded_file.seek(0)
-
-        existing = MessageAttachment.objects.filter(content_hash=content_hash).first()
-        if existing:
-            attachment_obj = existing
-        else:
-            attachment_obj = MessageAttachment.objects.create(
-                file=uploaded_file,
+        content_hash = sha256_of(uploaded_file)
+        attachment_obj = MessageAttachment.objects.filter(content_hash=content_hash).first()
+        if attachment_obj is None:
+            attachment_obj = MessageAttachment(
                 original_name=uploaded_file.name,
                 content_hash=content_hash,
             )
+            path = attachment_path(attachment_obj, uploaded_file.name)
+            if attachment_obj.file.storage.exists(path):
+                # Same content already stored (e.g. by a deleted row): reuse it.
+                attachment_obj.file.name = path
+            else:
+                attachment_obj.file.save(uploaded_file.name, uploaded_file, save=False)
+            attachment_obj.save()
         msg.attachments.add(attachment_obj)
-        email_attachments[attachment_obj.original_name] = attachment_obj.file
 
     # Handle ImportantDocument checkboxes — append links to body
     selected_docs = []
@@ -339,42 +162,41 @@ def _handle_attachment_and_docs(request, msg):
 
     msg.save()
 
-    return email_attachments
-
 
 @login_required
 def compose_message(request):
     """Unified compose message view with recipient group selection."""
-    if not _is_authorized(request.user):
+    if not _is_authorized(request):
         raise Http404
 
     person = request.user.person
-    can_send_all = _can_send_all(request.user)
-    is_animateur = _get_animateur_person(request.user) is not None
+    can_send_all = _can_send_all(request)
+    is_animateur = _get_animateur_person(request) is not None
     current_year = SchoolYear.current()
 
     # Determine the animateur's section (if applicable)
     animateur_section = None
     if is_animateur and not can_send_all:
-        enrollment = Enrollment.objects.filter(
-            user=person, school_year=current_year
-        ).first()
-        if not enrollment:
+        animateur_section = _locked_section(request, current_year)
+        if animateur_section is None:
             messages.error(request, _("You are not enrolled in any section this year."))
             return redirect("homepage")
-        animateur_section = enrollment.section
 
     # Handle HTMX request to load recipients
     if request.method == "POST" and request.POST.get("hx_load_recipients"):
         group = request.POST.get("recipient_group")
         section_id = request.POST.get("section")
+        added = request.POST.get("add_recipient")
+        if added:
+            # One person picked with the search.
+            group, section_id = f"{PERSON_GROUP}:{added}", None
 
         # Animateurs locked to their own section cannot load other sections
         if is_animateur and not can_send_all and group in SECTION_GROUPS:
             section_id = animateur_section.pk if animateur_section else None
 
         tokens = _loaded_group_tokens(request.POST, group, section_id)
-        recipients = _resolve_all_recipients(
+        recipients = resolve_recipients(
             tokens, current_year, person,
             animateur_section if (is_animateur and not can_send_all) else None,
         )
@@ -415,7 +237,7 @@ def compose_message(request):
                 section.pk if section else None,
                 append_current=False,
             )
-            recipients = _resolve_all_recipients(
+            recipients = resolve_recipients(
                 tokens, current_year, person,
                 animateur_section if (is_animateur and not can_send_all) else None,
             )
@@ -442,49 +264,30 @@ def compose_message(request):
                     created_from_message=msg,
                 )
 
-            email_attachments = _handle_attachment_and_docs(request, msg)
-
-            sent_count = 0
-            for entry in recipients:
-                recipient = entry["person"]
-                checkbox_name = f"recipient_{recipient.pk}"
-                is_checked = checkbox_name in request.POST
-
-                if is_checked:
-                    SectionMessageRecipient.objects.create(
-                        message=msg, parent=recipient, sent_at=timezone.now()
-                    )
-                    if hasattr(recipient, "account"):
-                        try:
-                            mail.send(
-                                recipients=[recipient.account.email],
-                                sender=settings.DEFAULT_FROM_EMAIL,
-                                template="section_message",
-                                language=getattr(recipient.account, "preferred_language", None) or settings.LANGUAGE_CODE,
-                                context={
-                                    "sender_name": str(person),
-                                    "section_name": msg_section.name if msg_section else _("All members"),
-                                    "subject": msg.subject,
-                                    "body": msg.body,
-                                },
-                                attachments=email_attachments or None,
-                            )
-                        except Exception:
-                            messages.error(
-                                request,
-                                _("Failed to send to %(email)s.") % {"email": recipient.account.email},
-                            )
-                    sent_count += 1
-                else:
-                    SectionMessageRecipient.objects.create(
-                        message=msg, parent=recipient, sent_at=None
-                    )
+            _handle_attachment_and_docs(request, msg)
+
+            checked_pks = _checked_recipient_pks(request.POST)
+            rows = [
+                SectionMessageRecipient(
+                    message=msg,
+                    parent=entry["person"],
+                    selected=str(entry["person"].pk) in checked_pks,
+                )
+                for entry in recipients
+            ]
+            SectionMessageRecipient.objects.bulk_create(rows)
+            selected_count = sum(row.selected for row in rows)
+
+            # The emails are rendered and queued by a worker; the message
+            # page shows the progress.
+            message_id = str(msg.pk)
+            transaction.on_commit(lambda: send_section_message.delay(message_id))
 
             messages.success(
                 request,
-                _("Message sent to %(count)s recipient(s).") % {"count": sent_count},
+                _("Message queued for %(count)s recipient(s).") % {"count": selected_count},
             )
-            return redirect("messaging:animateur_history")
+            return redirect("messaging:message_detail", message_id=msg.pk)
     else:
         form = ComposeMessageForm()
 
@@ -506,22 +309,51 @@ def compose_message(request):
     )
 
 
+@login_required
+def recipient_search(request):
+    """Typeahead of the compose form: the persons best matching ``?q=``."""
+    if not _is_authorized(request):
+        raise Http404
+    current_year = SchoolYear.current()
+    locked_section = None
+    if not _can_send_all(request):
+        locked_section = _locked_section(request, current_year)
+        if locked_section is None:
+            raise Http404
+    query = request.GET.get("q", "")
+    persons = searchable_persons(current_year, request.user.person, locked_section)
+    return render(request, "messaging/_recipient_choices.html", {
+        "persons": search_persons(query, persons),
+        "searched": len(query.strip()) >= MIN_LENGTH,
+    })
+
+
 @login_required
 def animateur_history(request):
     person = getattr(request.user, "person", None)
-    if person is None or not _is_authorized(request.user):
+    if person is None or not _is_authorized(request):
         raise Http404
 
     sent_messages = (
         SectionMessage.objects.filter(sender=person)
         .select_related("section", "school_year")
+        .annotate(
+            total=Count("recipients"),
+            selected=Count("recipients", filter=Q(recipients__selected=True)),
+            sent=Count("recipients", filter=Q(recipients__sent_at__isnull=False)),
+        )
     )
 
-    messages_data = []
-    for msg in sent_messages:
-        total = msg.recipients.count()
-        sent = msg.recipients.filter(sent_at__isnull=False).count()
-        messages_data.append({"message": msg, "total": total, "sent": sent})
+    messages_data = [
+        {
+            "message": msg,
+            "total": msg.total,
+            "sent": msg.sent,
+            "pending": msg.selected - msg.sent,
+            "ignored": msg.total - msg.selected,
+        }
+        for msg in sent_messages
+    ]
 
     return render(
         request,
@@ -530,10 +362,9 @@ def animateur_history(request):
     )
 
 
-@login_required
-def message_detail(request, message_id):
-    """Show the full detail of a sent message (content, recipients, attachments)."""
-    if not _is_authorized(request.user):
+def _get_own_message(request, message_id):
+    """Return a message the user sent (any message for staff), or raise 404."""
+    if not _is_authorized(request):
         raise Http404
 
     message = get_object_or_404(SectionMessage, pk=message_id)
@@ -543,6 +374,13 @@ def message_detail(request, message_id):
     is_owner = person is not None and message.sender_id == person.pk
     if not is_owner and not request.user.is_staff:
         raise Http404
+    return message
+
+
+@login_required
+def message_detail(request, message_id):
+    """Show the full detail of a sent message (content, recipients, attachments)."""
+    message = _get_own_message(request, message_id)
 
     recipients = (
         message.recipients.select_related("parent__account")
@@ -552,7 +390,26 @@ def message_detail(request, message_id):
     return render(
         request,
         "messaging/message_detail.html",
-        {"message": message, "recipients": recipients},
+        {
+            "message": message,
+            "recipients": recipients,
+            "progress": fanout.progress(message),
+        },
+    )
+
+
+@login_required
+def message_progress(request, message_id):
+    """Sending progress of a message: JSON, or the polled HTMX fragment."""
+    message = _get_own_message(request, message_id)
+    progress = fanout.progress(message)
+
+    if not request.headers.get("HX-Request"):
+        return JsonResponse({"id": str(message.pk), **progress})
+    return render(
+        request,
+        "messaging/_message_progress.html",
+        {"message": message, "progress": progress},
     )
 
 
@@ -2,7 +2,7 @@
  *
  * The page content area only is editable — the navbar and surrounding
  * layout are Django-rendered and outside the canvas. Uploaded images are
- * stored server-side (ImageAsset) and served from /media/.
+ * stored server-side (ImageAsset), served from /media/ and listed on demand.
  *
  * Uses GrapesJS 0.23.5 core only (no preset plugin — grapesjs-preset-webpage
  * 0.1.5 is incompatible with modern core, crashes in addComponents).
@@ -36,9 +36,94 @@
     }
 
     var projectData = parseJsonScript("project-json");
-    var initialAssets = (parseJsonScript("assets-json") || []).map(function (asset) {
-        return { src: asset.src, name: asset.name };
-    });
+
+    function toAsset(asset) {
+        return { src: asset.src, name: asset.name, thumbnail: asset.thumbnail };
+    }
+
+    /* Image library, fetched a page at a time once the asset manager opens
+     * (see homepage.asset_library): scrolling to the bottom of the list loads
+     * the next page, the search box starts over from the first one. A new
+     * search aborts the request in flight, whose results would be stale.
+     */
+    var library = { next: null, query: "", controller: null, loaded: false };
+
+    function loadAssets(reset) {
+        if (reset) {
+            if (library.controller) {
+                library.controller.abort();
+            }
+        } else if (library.controller || !library.next) {
+            return;
+        }
+        var controller = new AbortController();
+        library.controller = controller;
+        var params = new URLSearchParams();
+        if (!reset) {
+            params.set("cursor", library.next);
+        }
+        if (library.query) {
+            params.set("q", library.query);
+        }
+        fetch(assetsUrl + "?" + params.toString(), {
+            credentials: "same-origin",
+            signal: controller.signal,
+        })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error("Asset listing failed: " + response.status);
+                }
+                return response.json();
+            })
+            .then(function (data) {
+                if (controller.signal.aborted) {
+                    return;
+                }
+                if (reset) {
+                    editor.AssetManager.getAll().reset();
+                }
+                editor.AssetManager.add(data.assets.map(toAsset));
+                library.next = data.next;
+                library.loaded = true;
+            })
+            .catch(function (err) {
+                if (err.name !== "AbortError") {
+                    console.error(err);
+                }
+            })
+            .finally(function () {
+                if (library.controller === controller) {
+                    library.controller = null;
+                }
+            });
+    }
+
+    function attachLibraryControls() {
+        var list = document.querySelector(".gjs-am-assets");
+        if (!list || list.dataset.libraryControls) {
+            return;
+        }
+        list.dataset.libraryControls = "1";
+        list.addEventListener("scroll", function () {
+            if (list.scrollTop + list.clientHeight >= list.scrollHeight - 50) {
+                loadAssets(false);
+            }
+        });
+        var search = document.createElement("input");
+        search.type = "search";
+        search.placeholder = i18n.searchImages;
+        search.className = "gjs-field";
+        search.style.cssText = "width: 100%; margin-bottom: .5rem; padding: .4rem;";
+        var timer = null;
+        search.addEventListener("input", function () {
+            window.clearTimeout(timer);
+            timer = window.setTimeout(function () {
+                library.query = search.value.trim();
+                loadAssets(true);
+            }, 300);
+        });
+        list.parentNode.insertBefore(search, list);
+    }
 
     // Upload wiring for the asset manager: our own CSRF-protected endpoint.
     function uploadFiles(files) {
@@ -59,7 +144,7 @@
                 return response.json();
             })
             .then(function (data) {
-                editor.AssetManager.add([{ src: data.src, name: data.name }]);
+                editor.AssetManager.add([toAsset(data)]);
             })
             .catch(function (err) {
                 console.error(err);
@@ -118,6 +203,28 @@
         });
     }
 
+    // Library previews show the small variant rather than the full upload.
+    function troopconnectAssets(editor) {
+        editor.AssetManager.addType("image", {
+            view: {
+                getPreview: function () {
+                    var src = this.model.get("thumbnail") || this.model.get("src");
+                    return (
+                        '<div class="' + this.pfx + 'preview" style="background-image: url(\'' +
+                        src + '\');"></div><div class="' + this.pfx + "preview-bg " +
+                        this.ppfx + 'checker-bg"></div>'
+                    );
+                },
+            },
+        });
+        editor.on("asset:open", function () {
+            if (!library.loaded) {
+                loadAssets(true);
+            }
+            attachLibraryControls();
+        });
+    }
+
     // Mirror the real front-end styles inside the canvas for fidelity.
     var canvasStyles = [
         "https://cdn.jsdelivr.net/npm/bootstrap@5.3.6/css/bootstrap.min.css",
@@ -128,7 +235,7 @@
 
     var editor = grapesjs.init({
         container: "#gjs",
-        plugins: [troopconnectBlocks],
+        plugins: [troopconnectBlocks, troopconnectAssets],
         // Seed with the default/stored markup; a saved project replaces it
         // once the editor finished loading (see 'load' handler — calling
         // loadProjectData earlier races the canvas postLoad and crashes).
@@ -142,7 +249,7 @@
             styles: canvasStyles,
         },
         assetManager: {
-            assets: initialAssets,
+            assets: [],
             uploadFile: uploadFiles,
         },
         styleManager: {
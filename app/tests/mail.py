@@ -3,6 +3,9 @@ from unittest import mock
 from django.conf import settings
 from django.test import TestCase, override_settings
 
+from finance.tasks import send_fee_reminders
+from messaging.tasks import send_section_message
+
 # Route all sends through the no-op dummy backend so mail tests never touch the
 # real MailerSend API.
 DUMMY_POST_OFFICE = {
@@ -15,11 +18,15 @@ class MailTestCase(TestCase):
     """Base TestCase that uses the dummy backend and never dispatches to Celery.
 
     With DEFAULT_PRIORITY="medium", ``mail.send()`` queues an Email and fires
-    post_office's ``email_queued`` signal; with CELERY_ENABLED the handler calls
-    ``send_queued_mail.delay()``, which would enqueue to the real broker (and a
-    running worker would really send). Patching that out keeps queueing
+    post_office's ``email_queued`` signal; once committed, members.mail_dispatch
+    then starts ``dispatch_mail`` runs, which would enqueue to the real broker
+    (and a running worker would really send). Patching that out keeps queueing
     side-effect-free. Tests that want to exercise actual delivery can call
-    ``post_office.mail.send_queued_mail_until_done()`` directly.
+    ``members.mail_dispatch.dispatch(priority)`` directly.
+
+    The send_section_message and send_fee_reminders tasks run inline instead
+    of going to the broker; since the views dispatch them on commit, wrap the
+    request in ``self.captureOnCommitCallbacks(execute=True)`` to run them.
     """
 
     def setUp(self):
@@ -27,6 +34,18 @@ class MailTestCase(TestCase):
         self._po_override = override_settings(POST_OFFICE=DUMMY_POST_OFFICE)
         self._po_override.enable()
         self.addCleanup(self._po_override.disable)
-        self._delay_patcher = mock.patch("post_office.tasks.send_queued_mail.delay")
-        self._delay_patcher.start()
-        self.addCleanup(self._delay_patcher.stop)
+        self._dispatch_patcher = mock.patch("troopconnect.tasks.dispatch_mail.apply_async")
+        self._dispatch_patcher.start()
+        self.addCleanup(self._dispatch_patcher.stop)
+        fanout_patcher = mock.patch(
+            "messaging.tasks.send_section_message.delay",
+            side_effect=send_section_message,
+        )
+        fanout_patcher.start()
+        self.addCleanup(fanout_patcher.stop)
+        reminders_patcher = mock.patch(
+            "finance.tasks.send_fee_reminders.delay",
+            side_effect=send_fee_reminders,
+        )
+        reminders_patcher.start()
+        self.addCleanup(reminders_patcher.stop)
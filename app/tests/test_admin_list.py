@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from post_office.models import EmailTemplate
 
@@ -137,3 +139,80 @@ class AdminListFilterTest(TestCase):
         )
         self.assertEqual(response.context["current_sort"], "first_name")
         self.assertEqual(response.context["current_direction"], "asc")
+
+
+class AdminListQueryTest(TestCase):
+    """Rows are annotated in SQL: the page size does not change the query count."""
+
+    @classmethod
+    def setUpTestData(cls):
+        EmailTemplate.objects.create(
+            name="new_child_staff", subject="Test", content="Test",
+        )
+        cls.role_parent = Role.objects.get(short="p")
+        cls.role_anime = Role.objects.get(short="e")
+        staff_person = Person.objects.create(
+            first_name="Admin", last_name="Staff",
+            primary_role=cls.role_parent, status="a",
+        )
+        cls.staff_user = Account.objects.create_user(
+            email="admin@test.com", password="pass",
+            person=staff_person, is_staff=True,
+        )
+        cls.branch = Branch.objects.create(
+            name="Louveteaux", min_age_dec_31=8, max_age_dec_31=11,
+        )
+        cls.section = Section.objects.create(name="Meute", branch=cls.branch)
+        cls.year = SchoolYear.current()
+
+    def _make_children(self, count, age=9):
+        for i in range(count):
+            child = Person.objects.create(
+                first_name=f"Child{i}", last_name="Zulu",
+                birthday=f"{self.year.name - age}-06-01",
+                primary_role=self.role_anime, status="a",
+            )
+            Enrollment.objects.create(
+                user=child, section=self.section, school_year=self.year,
+            )
+
+    def _get(self, **params):
+        return self.client.get(reverse("members:admin_list"), params)
+
+    def test_query_count_independent_of_page_size(self):
+        self.client.force_login(self.staff_user)
+        self._make_children(3)
+        self._get(per_page=500)  # warm up the session and cached lookups
+        with CaptureQueriesContext(connection) as small:
+            self._get(per_page=500)
+        self._make_children(40)
+        with CaptureQueriesContext(connection) as large:
+            response = self._get(per_page=500)
+
+        self.assertEqual(len(response.context["object_list"]), 44)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_per_page_is_capped(self):
+        self.client.force_login(self.staff_user)
+        response = self._get(per_page=100000)
+        self.assertEqual(response.context["paginator"].per_page, 500)
+        response = self._get(per_page="abc")
+        self.assertEqual(response.context["paginator"].per_page, 15)
+
+    def test_section_and_age_mismatch(self):
+        self.client.force_login(self.staff_user)
+        self._make_children(1, age=9)
+        old = Person.objects.create(
+            first_name="Old", last_name="Zulu",
+            birthday=f"{self.year.name - 14}-06-01",
+            primary_role=self.role_anime, status="a",
+        )
+        Enrollment.objects.create(user=old, section=self.section, school_year=self.year)
+
+        response = self._get(last_name="Zulu")
+        rows = {p.first_name: p for p in response.context["object_list"]}
+        self.assertEqual(rows["Child0"].section_display, "Meute")
+        self.assertFalse(rows["Child0"].age_mismatch)
+        self.assertTrue(rows["Old"].age_mismatch)
+        self.assertIn("Louveteaux", rows["Old"].age_mismatch_detail)
+        self.assertEqual(rows["Old"].primary_role, self.role_anime)
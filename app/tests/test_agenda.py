@@ -1,11 +1,16 @@
 from datetime import timedelta
 
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 
-from homepage.models import Event
+from homepage.calendar import serialize
+from homepage.models import CalendarFeed, Event
 from homepage.tasks import cleanup_old_events
-from members.models import Section
+from members.models import Account, Person, Role, SchoolYear, Section
+from messaging.models import SectionMessage
 
 
 class EventModelTest(TestCase):
@@ -114,3 +119,118 @@ class AgendaViewTest(TestCase):
         Event.objects.create(title="Past event", date=self.today - timedelta(days=5))
         response = self.client.get("/agenda/")
         self.assertContains(response, "text-muted")
+
+
+class CalendarFeedTest(TestCase):
+    """Private iCalendar feeds of the agenda."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.person = Person.objects.create(
+            first_name="Alice", last_name="Dupont",
+            primary_role=Role.objects.get(short="p"), status="a",
+        )
+        cls.account = Account.objects.create_user(
+            email="alice@test.be", password="pass", person=cls.person
+        )
+        cls.louveteaux = Section.objects.create(name="Louveteaux")
+        cls.scouts = Section.objects.create(name="Scouts")
+        cls.today = timezone.now().date()
+
+    def _feed(self, section=None):
+        feed = CalendarFeed.objects.create(person=self.person, section=section)
+        return reverse("calendar_feed", args=[feed.token])
+
+    def test_agenda_lists_private_links_to_members(self):
+        self.client.force_login(self.account)
+        response = self.client.get(reverse("agenda"))
+        feed = CalendarFeed.objects.get(person=self.person, section=None)
+        self.assertContains(response, reverse("calendar_feed", args=[feed.token]))
+        # Opening the page again keeps the same link, without writing.
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("agenda"))
+        self.assertEqual(CalendarFeed.objects.filter(person=self.person).count(), 1)
+        self.assertFalse(
+            [q for q in ctx.captured_queries if "INSERT" in q["sql"] and "calendarfeed" in q["sql"]]
+        )
+
+    def test_anonymous_agenda_has_no_links(self):
+        response = self.client.get(reverse("agenda"))
+        self.assertNotContains(response, "/agenda/feed/")
+
+    def test_unit_feed_lists_every_event(self):
+        message = SectionMessage.objects.create(
+            sender=self.person,
+            section=self.scouts,
+            school_year=SchoolYear.objects.create_year(2090),
+            subject="Hike",
+            body="Bring boots",
+        )
+        Event.objects.create(title="Camp", date=self.today, section=self.louveteaux)
+        Event.objects.create(
+            title="Hike", description="Bring boots", date=self.today,
+            section=self.scouts, created_from_message=message,
+        )
+        Event.objects.create(title="Fête d'unité", date=self.today)
+
+        response = self.client.get(self._feed())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        content = response.content.decode()
+        self.assertTrue(content.startswith("BEGIN:VCALENDAR\r\n"))
+        for title in ("Camp", "Hike", "Fête d'unité"):
+            self.assertIn(f"SUMMARY:{title}\r\n", content)
+        self.assertIn("DESCRIPTION:Bring boots\r\n", content)
+        self.assertIn(f"DTSTART;VALUE=DATE:{self.today:%Y%m%d}\r\n", content)
+
+    def test_section_feed_adds_unit_events(self):
+        Event.objects.create(title="Camp", date=self.today, section=self.louveteaux)
+        Event.objects.create(title="Hike", date=self.today, section=self.scouts)
+        Event.objects.create(title="Fête", date=self.today)
+        content = self.client.get(self._feed(self.louveteaux)).content.decode()
+        self.assertIn("SUMMARY:Camp", content)
+        self.assertIn("SUMMARY:Fête", content)
+        self.assertNotIn("SUMMARY:Hike", content)
+        self.assertIn("X-WR-CALNAME:", content)
+        self.assertIn("Louveteaux\r\n", content)
+
+    def test_unknown_token_is_404(self):
+        response = self.client.get(reverse("calendar_feed", args=["nope"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_deleted_feed_stops_working(self):
+        url = self._feed()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        CalendarFeed.objects.all().delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_repeat_poll_is_a_conditional_get(self):
+        url = self._feed()
+        Event.objects.create(title="Camp", date=self.today)
+        etag = self.client.get(url)["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_event_change_changes_etag(self):
+        url = self._feed()
+        event = Event.objects.create(title="Camp", date=self.today)
+        etag = self.client.get(url)["ETag"]
+        event.title = "Grand camp"
+        event.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "SUMMARY:Grand camp")
+
+    def test_serialize_escapes_and_folds(self):
+        event = Event.objects.create(
+            title="Réunion; parents, animateurs", description="é" * 60, date=self.today
+        )
+        content = serialize([event], "Unité")
+        self.assertIn("SUMMARY:Réunion\\; parents\\, animateurs\r\n", content)
+        for line in content.split("\r\n"):
+            self.assertLessEqual(len(line.encode()), 75)
+        # Unfolding restores the value.
+        self.assertIn("DESCRIPTION:" + "é" * 60, content.replace("\r\n ", ""))
@@ -1,26 +1,43 @@
 from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from post_office.models import EmailTemplate
+from post_office.models import PRIORITY, STATUS, Email, EmailTemplate
 
+from finance import bank_import, ledger, reminders
 from finance.models import (
+    BankImport,
+    BankLine,
     CotisationConfig,
+    HouseholdLedger,
+    LedgerEntry,
     Payment,
+    ReminderBatch,
+    ReminderRecipient,
     calculate_balances,
     get_adults_with_balance,
 )
+from members.households import normalize_address
 from members.models import (
     Account,
     Branch,
     Enrollment,
+    Household,
+    HouseholdMember,
     ParentChild,
     Person,
     Role,
     SchoolYear,
     Section,
 )
+from tests.mail import MailTestCase
 
 
 class FinanceTestBase(TestCase):
@@ -291,6 +308,682 @@ class BulkReminderTest(FinanceTestBase):
         self.assertEqual(len(adults), 0)
 
 
+class AdultsWithBalanceTest(FinanceTestBase):
+    """Parents are resolved from the ledger in one grouped query."""
+
+    def _by_email(self):
+        return {a["email"]: a for a in get_adults_with_balance(self.current_year)}
+
+    def test_totals_and_children_per_parent(self):
+        adults = self._by_email()
+        self.assertEqual(set(adults), {"alice@test.com", "bob@test.com"})
+        self.assertEqual(adults["alice@test.com"]["person"], self.parent1)
+        self.assertEqual(adults["alice@test.com"]["balance"], Decimal("220.00"))
+        self.assertEqual(
+            adults["alice@test.com"]["children_names"],
+            "Charlie Dupont, Diana Dupont, Eve Martin",
+        )
+        self.assertEqual(adults["bob@test.com"]["balance"], Decimal("80.00"))
+        self.assertEqual(adults["bob@test.com"]["children_names"], "Charlie Dupont")
+
+    def test_paid_children_left_out(self):
+        Payment.objects.create(
+            person=self.child_eldest, school_year=self.current_year,
+            amount=Decimal("80.00"),
+        )
+        adults = self._by_email()
+        self.assertNotIn("bob@test.com", adults)
+        self.assertEqual(adults["alice@test.com"]["balance"], Decimal("140.00"))
+        self.assertEqual(
+            adults["alice@test.com"]["children_names"], "Diana Dupont, Eve Martin",
+        )
+
+    def test_late_penalty_included(self):
+        self.config.late_deadline = timezone.now().date() - timedelta(days=1)
+        self.config.save()
+        self.assertEqual(
+            self._by_email()["alice@test.com"]["balance"], Decimal("242.00"),
+        )
+
+    def test_query_count_independent_of_parents(self):
+        for index in range(5):
+            parent = Person.objects.create(
+                first_name=f"Parent{index}", last_name="Extra",
+                primary_role=self.role_parent, status="a",
+            )
+            Account.objects.create_user(
+                email=f"extra{index}@test.com", password="testpass", person=parent,
+            )
+            ParentChild.objects.create(parent=parent, child=self.child_other)
+        with CaptureQueriesContext(connection) as ctx:
+            adults = get_adults_with_balance(self.current_year)
+        self.assertEqual(len(adults), 7)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+
+class UnpaidBalancesViewTest(FinanceTestBase):
+    """The reminders screen loads its recipients page by page."""
+
+    url = "/finance/reminders/unpaid/"
+
+    def test_sorted_and_paged_json(self):
+        self._login_tresorier()
+        response = self.client.get(
+            self.url, {"sort": "balance", "direction": "desc", "per_page": 1},
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["num_pages"], 2)
+        self.assertEqual(data["results"][0]["email"], "alice@test.com")
+        self.assertEqual(data["results"][0]["balance"], "220.00")
+
+        data = self.client.get(
+            self.url,
+            {"sort": "balance", "direction": "desc", "per_page": 1, "page": 2},
+        ).json()
+        self.assertEqual(data["results"][0]["email"], "bob@test.com")
+
+    def test_htmx_page_loads_the_next(self):
+        self._login_tresorier()
+        response = self.client.get(
+            self.url, {"per_page": 1}, HTTP_HX_REQUEST="true",
+        )
+        self.assertContains(response, "Alice Dupont")
+        self.assertNotContains(response, "Bob Dupont")
+        self.assertContains(response, "page=2")
+        self.assertContains(response, 'hx-trigger="revealed"')
+
+    def test_reminders_page_counts_recipients(self):
+        self._login_tresorier()
+        response = self.client.get("/finance/reminders/")
+        self.assertEqual(response.context["adult_count"], 2)
+
+    def test_plain_parent_cannot_list(self):
+        self.client.login(email="alice@test.com", password="testpass")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class LedgerTest(FinanceTestBase):
+    """The ledger follows the rows it is derived from."""
+
+    HOUSEHOLD = "Rue des Fleurs 10, 1300 Limal"
+
+    def _household(self, address=HOUSEHOLD):
+        return HouseholdLedger.objects.get(
+            school_year=self.current_year, household__key=normalize_address(address),
+        )
+
+    def test_household_totals(self):
+        household = self._household()
+        self.assertEqual(household.children, 2)
+        self.assertEqual(household.amount_due, Decimal("140.00"))
+        self.assertEqual(household.amount_paid, Decimal("0.00"))
+
+    def test_payment_updates_person_and_household(self):
+        payment = Payment.objects.create(
+            person=self.child_youngest, school_year=self.current_year,
+            amount=Decimal("25.00"),
+        )
+        entry = LedgerEntry.objects.get(person=self.child_youngest)
+        self.assertEqual(entry.amount_paid, Decimal("25.00"))
+        self.assertEqual(self._household().amount_paid, Decimal("25.00"))
+
+        payment.delete()
+        self.assertEqual(self._household().amount_paid, Decimal("0.00"))
+
+    def test_moving_child_splits_household(self):
+        self.child_eldest.address = "Avenue Louise 50, 1050 Bruxelles"
+        self.child_eldest.save()
+
+        self.assertEqual(
+            LedgerEntry.objects.get(person=self.child_youngest).kind,
+            LedgerEntry.Kind.FULL,
+        )
+        # Charlie (8) is now the eldest of Eve's (7) household.
+        self.assertEqual(
+            LedgerEntry.objects.get(person=self.child_other).kind,
+            LedgerEntry.Kind.SIBLING,
+        )
+        self.assertEqual(self._household().children, 1)
+        self.assertEqual(
+            self._household("Avenue Louise 50, 1050 Bruxelles").amount_due,
+            Decimal("140.00"),
+        )
+
+    def test_unenrolling_removes_entry(self):
+        Enrollment.objects.filter(user=self.child_eldest).delete()
+        self.assertFalse(LedgerEntry.objects.filter(person=self.child_eldest).exists())
+        self.assertEqual(
+            LedgerEntry.objects.get(person=self.child_youngest).amount_due,
+            Decimal("80.00"),
+        )
+
+    def test_fee_change_updates_amounts(self):
+        self.config.full_fee = Decimal("100.00")
+        self.config.save()
+        self.assertEqual(
+            LedgerEntry.objects.get(person=self.child_youngest).amount_due,
+            Decimal("80.00"),
+        )
+        self.assertEqual(self._household().amount_due, Decimal("180.00"))
+
+    def test_balances_read_is_constant(self):
+        calculate_balances(self.current_year)
+        for _i in range(5):
+            Payment.objects.create(
+                person=self.child_eldest, school_year=self.current_year,
+                amount=Decimal("1.00"),
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            balances = calculate_balances(self.current_year)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        eldest = next(b for b in balances if b["person_id"] == self.child_eldest.pk)
+        self.assertEqual(eldest["amount_paid"], Decimal("5.00"))
+
+    def test_rebuild_command_checks_and_repairs(self):
+        out = StringIO()
+        call_command("rebuild_ledger", "--check", stdout=out)
+        self.assertIn("consistent", out.getvalue())
+
+        LedgerEntry.objects.filter(person=self.animateur).update(amount_due=0)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_ledger", "--check", stdout=StringIO())
+
+        call_command("rebuild_ledger", stdout=StringIO())
+        self.assertEqual(ledger.check(self.current_year.pk), [])
+        self.assertEqual(
+            LedgerEntry.objects.get(person=self.animateur).amount_due, Decimal("30.00"),
+        )
+
+
+class ReminderBatchTest(MailTestCase, FinanceTestBase):
+    """Reminders are queued by a background task and tracked per recipient."""
+
+    def _post(self, body="Hi {prenom}, you owe {solde}€. {prenom}!"):
+        self._login_tresorier()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/finance/reminders/", {
+                "subject": "Fees", "body": body,
+            })
+        return response
+
+    def test_compiled_body(self):
+        render = reminders.compile_body("{prenom}: {solde} {other} {prenom}")
+        self.assertEqual(render(prenom="Ann", solde="5"), "Ann: 5 {other} Ann")
+
+    def test_post_queues_batch(self):
+        response = self._post()
+        batch = ReminderBatch.objects.get()
+        self.assertRedirects(response, f"/finance/reminders/{batch.pk}/")
+        self.assertIsNotNone(batch.dispatched_at)
+
+        emails = {email.to[0]: email for email in Email.objects.all()}
+        self.assertEqual(set(emails), {"alice@test.com", "bob@test.com"})
+        self.assertEqual(
+            emails["alice@test.com"].message, "Hi Alice, you owe 220.00€. Alice!",
+        )
+        self.assertEqual(emails["bob@test.com"].priority, PRIORITY.low)
+        self.assertEqual(
+            set(batch.recipients.values_list("status", flat=True)),
+            {ReminderRecipient.Status.QUEUED},
+        )
+
+    def test_post_does_not_resolve_recipients(self):
+        self._login_tresorier()
+        with mock.patch("finance.tasks.send_fee_reminders.delay"):
+            with CaptureQueriesContext(connection) as ctx:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post("/finance/reminders/", {"subject": "S", "body": "B"})
+        self.assertFalse(any("finance_ledgerentry" in q["sql"] for q in ctx.captured_queries))
+        self.assertFalse(Email.objects.exists())
+
+    def test_progress_counts_delivery(self):
+        self._post()
+        batch = ReminderBatch.objects.get()
+        self.assertEqual(
+            reminders.progress(batch),
+            {"total": 2, "sent": 0, "failed": 0, "waiting": 2, "done": False},
+        )
+        Email.objects.filter(to="alice@test.com").update(status=STATUS.sent)
+        Email.objects.filter(to="bob@test.com").update(status=STATUS.failed)
+
+        response = self.client.get(f"/finance/reminders/{batch.pk}/progress/")
+        self.assertEqual(
+            response.json(),
+            {"id": batch.pk, "total": 2, "sent": 1, "failed": 1, "waiting": 0, "done": True},
+        )
+        page = self.client.get(f"/finance/reminders/{batch.pk}/")
+        self.assertEqual(page.context["progress"]["sent"], 1)
+
+    def test_invalid_address_recorded_as_failed(self):
+        Account.objects.filter(pk=self.parent2_account.pk).update(email="not-an-email")
+        self._post()
+        recipient = ReminderRecipient.objects.get(person=self.parent2)
+        self.assertEqual(recipient.status, ReminderRecipient.Status.FAILED)
+        self.assertIsNone(recipient.email)
+        self.assertEqual(Email.objects.count(), 1)
+
+    def test_dispatch_runs_once(self):
+        self._post()
+        batch = ReminderBatch.objects.get()
+        self.assertEqual(reminders.dispatch(batch.pk), 0)
+        self.assertEqual(Email.objects.count(), 2)
+
+    def test_text_is_not_parsed_as_a_template(self):
+        Person.objects.filter(pk=self.parent1.pk).update(first_name="Jean {% Jean %}")
+        self._post(body="Hi {prenom}, {{ x }} and {% if %}: {solde}€")
+        batch = ReminderBatch.objects.get()
+        self.assertIsNotNone(batch.dispatched_at)
+        self.assertEqual(
+            Email.objects.get(to="alice@test.com").message,
+            "Hi Jean {% Jean %}, {{ x }} and {% if %}: 220.00€",
+        )
+        self.assertEqual(Email.objects.count(), 2)
+
+    def test_communication_placeholder(self):
+        def communication(child):
+            return LedgerEntry.objects.get(person=child).communication
+
+        # Diana's fee is paid: her reference is not quoted.
+        Payment.objects.create(
+            person=self.child_youngest, school_year=self.current_year, amount=Decimal("60.00"),
+        )
+        self._post(body="{prenom}: {communication}")
+        # Bob has one child, Alice several: each of their references is named.
+        self.assertEqual(
+            Email.objects.get(to="bob@test.com").message,
+            f"Bob: {communication(self.child_eldest)}",
+        )
+        self.assertEqual(
+            Email.objects.get(to="alice@test.com").message,
+            f"Alice: {communication(self.child_eldest)} (Charlie), "
+            f"{communication(self.child_other)} (Eve)",
+        )
+
+
+class BankImportTest(FinanceTestBase):
+    """Bank statements are parsed, matched and recorded in bulk."""
+
+    HEADER = "Date;Montant;Nom de la contrepartie;Communication\n"
+
+    def _upload(self, content, name="statement.csv", encoding="utf-8"):
+        return SimpleUploadedFile(name, content.encode(encoding))
+
+    def _import(self, rows):
+        content = self.HEADER + "".join(f"{row}\n" for row in rows)
+        return bank_import.import_statement(
+            self._upload(content), self.current_year, None,
+        )
+
+    def _reference(self, person):
+        return LedgerEntry.objects.get(person=person).communication
+
+    def _coda_movement(
+        self, amount, communication, name, sign="0", sequence=1, detail=0, grouped=" ",
+    ):
+        amount = f"{int(amount * 1000):015d}"
+        number = f"{sequence:04d}{detail:04d}"
+        movement = (
+            f"21{number}{'REF':<21}{sign}{amount}"
+            f"{'150925':<6}{'00150000':<8}{communication:<54}150925001{grouped}0"
+        ).ljust(128)
+        party = f"23{number}{'BE68539007547034':<37}{name:<35}".ljust(128)
+        return [movement, party]
+
+    def test_csv_parsing(self):
+        content = (
+            self.HEADER
+            + "15/09/2025;\"1.080,50\";Jean Dupré;Cotisation\n"
+            + "16/09/2025;-20,00;Boulangerie;Pain\n"
+            + "\n"
+        )
+        lines = list(bank_import.read(self._upload(content, encoding="cp1252"), "csv"))
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0].amount, Decimal("1080.50"))
+        self.assertEqual(lines[0].counterparty, "Jean Dupré")
+        self.assertEqual(lines[0].date.isoformat(), "2025-09-15")
+
+    def test_coda_parsing(self):
+        reference = LedgerEntry.objects.get(person=self.child_other).reference
+        records = [
+            "0" * 5 + " " * 123,
+            *self._coda_movement(Decimal("80"), f"1101{reference}", "MARTIN PAUL"),
+            *self._coda_movement(Decimal("12.5"), "0Frais", "BANQUE", sign="1"),
+            "9" + " " * 127,
+        ]
+        upload = self._upload("\n".join(records), name="statement.cod")
+        self.assertEqual(bank_import.detect_format(upload), BankImport.Format.CODA)
+
+        lines = list(bank_import.read(upload, BankImport.Format.CODA))
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0].amount, Decimal("80.00"))
+        self.assertEqual(lines[0].communication, reference)
+        self.assertEqual(lines[0].counterparty, "MARTIN PAUL")
+
+    def test_coda_globalised_movement_counts_once(self):
+        records = [
+            "0" * 5 + " " * 123,
+            *self._coda_movement(Decimal("150"), "0Cotisations", "", grouped="1"),
+            *self._coda_movement(
+                Decimal("100"), "0Martin Paul", "MARTIN PAUL", detail=1, grouped="1",
+            ),
+            *self._coda_movement(
+                Decimal("50"), "0Dupont Marie", "DUPONT MARIE", detail=2, grouped="1",
+            ),
+            *self._coda_movement(Decimal("80"), "0Cotisation", "DURAND LEA", sequence=2),
+            "9" + " " * 127,
+        ]
+        upload = self._upload("\n".join(records), name="statement.cod")
+
+        lines = list(bank_import.read(upload, BankImport.Format.CODA))
+
+        self.assertEqual(
+            [(line.amount, line.counterparty) for line in lines],
+            [(Decimal("150.00"), ""), (Decimal("80.00"), "DURAND LEA")],
+        )
+
+    def test_structured_reference_is_valid(self):
+        entry = LedgerEntry.objects.get(person=self.child_eldest)
+        self.assertEqual(bank_import.references(entry.communication), [entry.reference])
+        self.assertEqual(bank_import.references("+++123/4567/89000+++"), [])
+
+    def test_match_by_reference(self):
+        statement = self._import([
+            f"15/09/2025;80,00;Someone Else;{self._reference(self.child_other)}",
+        ])
+        line = statement.lines.get()
+        self.assertEqual(line.status, BankLine.Status.MATCHED)
+        self.assertEqual(line.match, BankLine.Match.REFERENCE)
+        self.assertEqual(line.person_ids, [str(self.child_other.pk)])
+
+    def test_match_by_name(self):
+        statement = self._import(["15/09/2025;80,00;MARTIN EVE;cotisation"])
+        line = statement.lines.get()
+        self.assertEqual(line.match, BankLine.Match.NAME)
+        self.assertEqual(line.person_ids, [str(self.child_other.pk)])
+
+    def test_parent_name_pays_for_household(self):
+        statement = self._import(["15/09/2025;80,00;Dupont Bob;scouts"])
+        line = statement.lines.get()
+        self.assertEqual(line.status, BankLine.Status.MATCHED)
+        self.assertEqual(line.person_ids, [str(self.child_eldest.pk)])
+
+    def test_amount_settles_ambiguous_names(self):
+        # Alice pays for her three children (220€), Eve alone owes 80€.
+        statement = self._import([
+            "15/09/2025;80,00;Alice Dupont;Eve Martin",
+            "15/09/2025;50,00;Alice Dupont;Eve Martin",
+        ])
+        exact, ambiguous = statement.lines.order_by("line_number")
+        self.assertEqual(exact.person_ids, [str(self.child_other.pk)])
+        self.assertEqual(ambiguous.status, BankLine.Status.AMBIGUOUS)
+        self.assertEqual(len(ambiguous.candidates), 2)
+
+    def test_record_splits_household_payment(self):
+        statement = self._import([
+            "15/09/2025;150,00;Dupont Bob;",
+            "16/09/2025;140,00;Dupont Alice;",
+            "17/09/2025;10,00;Inconnu;",
+        ])
+        self.assertEqual(bank_import.record(statement, None), 2)
+
+        paid = {
+            row["person_id"]: row["amount_paid"]
+            for row in calculate_balances(self.current_year)
+        }
+        # Bob's 150€ for Charlie (80€) overpays him; Alice's 140€ then
+        # goes to the children still owing.
+        self.assertEqual(paid[self.child_eldest.pk], Decimal("150.00"))
+        self.assertEqual(paid[self.child_youngest.pk], Decimal("60.00"))
+        self.assertEqual(paid[self.child_other.pk], Decimal("80.00"))
+        self.assertEqual(Payment.objects.count(), 3)
+        self.assertEqual(ledger.check(self.current_year.pk), [])
+        self.assertEqual(
+            statement.lines.filter(status=BankLine.Status.RECORDED).count(), 2,
+        )
+        self.assertEqual(bank_import.record(statement, None), 0)
+
+    def test_queries_do_not_grow_with_lines(self):
+        rows = ["15/09/2025;80,00;MARTIN EVE;"]
+        with CaptureQueriesContext(connection) as small:
+            bank_import.record(self._import(rows), None)
+        with CaptureQueriesContext(connection) as large:
+            bank_import.record(self._import(rows * 200), None)
+        self.assertEqual(len(large), len(small))
+
+    def test_review_and_record(self):
+        self._login_tresorier()
+        response = self.client.post("/finance/import/", {
+            "file": self._upload(
+                self.HEADER
+                + "15/09/2025;50,00;Alice Dupont;Eve Martin\n"
+                + "16/09/2025;30,00;F. Leader;animateur\n"
+                + "17/09/2025;5,00;Bank;interest\n"
+            ),
+        })
+        statement = BankImport.objects.get()
+        self.assertRedirects(response, f"/finance/import/{statement.pk}/")
+        ambiguous, unmatched, interest = statement.lines.order_by("line_number")
+
+        response = self.client.get(f"/finance/import/{statement.pk}/")
+        self.assertEqual(len(response.context["to_review"]), 3)
+        self.assertContains(response, self._reference(self.animateur))
+
+        candidate = ambiguous.candidates.index([str(self.child_other.pk)])
+        self.client.post(f"/finance/import/{statement.pk}/", {
+            f"line-{ambiguous.pk}": f"c{candidate}",
+            f"line-{unmatched.pk}": self._reference(self.animateur),
+            f"line-{interest.pk}": "ignore",
+            "record": "1",
+        })
+
+        self.assertEqual(
+            set(Payment.objects.values_list("person_id", "amount")),
+            {(self.child_other.pk, Decimal("50.00")), (self.animateur.pk, Decimal("30.00"))},
+        )
+        interest.refresh_from_db()
+        self.assertEqual(interest.status, BankLine.Status.IGNORED)
+
+    def test_unreadable_file(self):
+        self._login_tresorier()
+        response = self.client.post("/finance/import/", {
+            "file": self._upload("foo;bar\n1;2\n"),
+        }, follow=True)
+        self.assertContains(response, "missing column")
+        self.assertFalse(BankImport.objects.exists())
+
+    def test_access_restricted(self):
+        self.client.login(email="alice@test.com", password="testpass")
+        self.assertEqual(self.client.get("/finance/import/").status_code, 404)
+
+
+class HouseholdTest(FinanceTestBase):
+    """Households follow normalized addresses and the parent links."""
+
+    def _household(self, person):
+        return HouseholdMember.objects.get(person=person).household
+
+    def test_normalize_address(self):
+        self.assertEqual(
+            normalize_address("Rue des Fleurs 10, 1300 Limal"),
+            normalize_address("  rue des fleurs n°10 - 1300 LIMAL"),
+        )
+        self.assertEqual(
+            normalize_address("Av. Louise 50"), normalize_address("Avenue Louise 50"),
+        )
+        self.assertEqual(normalize_address(None), "")
+
+    def test_spelling_variants_share_a_household(self):
+        self.child_other.address = "RUE DES FLEURS n° 10 - 1300 Limal"
+        self.child_other.save()
+
+        self.assertEqual(self._household(self.child_other), self._household(self.child_eldest))
+        # Eve (7) is now the second eldest of the Dupont household.
+        self.assertEqual(
+            LedgerEntry.objects.get(person=self.child_other).kind, LedgerEntry.Kind.SIBLING,
+        )
+        self.assertEqual(ledger.check(self.current_year.pk), [])
+
+    def test_save_refreshes_ledger_once(self):
+        self.child_other.address = "Rue des Fleurs 10, 1300 Limal"
+        with mock.patch("finance.ledger.refresh_persons", wraps=ledger.refresh_persons) as refresh:
+            self.child_other.save()
+        refresh.assert_called_once_with([self.child_other.pk])
+        self.assertEqual(ledger.check(self.current_year.pk), [])
+
+        # A save without a move refreshes the person too: status, role and
+        # birthday decide who pays the full fee.
+        self.child_eldest.status = "ar"
+        with mock.patch("finance.ledger.refresh_persons", wraps=ledger.refresh_persons) as refresh:
+            self.child_eldest.save()
+        refresh.assert_called_once_with([self.child_eldest.pk])
+        self.assertEqual(ledger.check(self.current_year.pk), [])
+
+    def test_save_of_other_fields_skips_households(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.child_other.note = "Allergic to nuts"
+            self.child_other.save(update_fields=["note"])
+        self.assertFalse(
+            [q for q in ctx.captured_queries if "members_household" in q["sql"]]
+        )
+
+        self.child_other.status = "ar"
+        with mock.patch("finance.ledger.refresh_persons", wraps=ledger.refresh_persons) as refresh:
+            self.child_other.save(update_fields=["status"])
+        refresh.assert_called_once_with([self.child_other.pk])
+        self.assertFalse(LedgerEntry.objects.filter(person=self.child_other).exists())
+
+        self.child_other.address = "Rue des Fleurs 10, 1300 Limal"
+        self.child_other.save(update_fields=["address"])
+        self.assertEqual(self._household(self.child_other), self._household(self.child_eldest))
+
+    def test_child_without_address_follows_parent(self):
+        child = Person.objects.create(
+            first_name="Gus", last_name="Martin",
+            primary_role=self.role_anime, status="a",
+        )
+        self.assertFalse(HouseholdMember.objects.filter(person=child).exists())
+
+        ParentChild.objects.create(parent=self.parent2, child=child)
+        self.assertEqual(self._household(child), self._household(self.parent2))
+
+        self.parent2.address = "Place Verte 1, 4000 Liège"
+        self.parent2.save()
+        self.assertEqual(self._household(child).address, "Place Verte 1, 4000 Liège")
+
+        ParentChild.objects.filter(child=child).delete()
+        self.assertFalse(HouseholdMember.objects.filter(person=child).exists())
+
+    def test_move_updates_ledger(self):
+        Enrollment.objects.create(
+            user=Person.objects.create(
+                first_name="Gus", last_name="Dupont",
+                primary_role=self.role_anime, status="a",
+                birthday=timezone.now().date() - timedelta(days=365 * 10),
+            ),
+            section=self.section, school_year=self.current_year,
+        )
+        gus = Person.objects.get(first_name="Gus")
+        self.assertEqual(LedgerEntry.objects.get(person=gus).household, None)
+
+        ParentChild.objects.create(parent=self.parent1, child=gus, primary_contact=True)
+
+        # Gus (10) becomes the eldest of the Dupont household.
+        self.assertEqual(LedgerEntry.objects.get(person=gus).household, self._household(self.parent1))
+        self.assertEqual(
+            LedgerEntry.objects.get(person=self.child_eldest).kind, LedgerEntry.Kind.SIBLING,
+        )
+        self.assertEqual(ledger.check(self.current_year.pk), [])
+
+    def test_deleting_last_member_drops_household(self):
+        self.child_other.delete()
+        self.assertFalse(Household.objects.filter(key=normalize_address("Avenue Louise 50, 1050 Bruxelles")).exists())
+        # A child deleted with its parent links is not put back in a household.
+        self.child_youngest.delete()
+        self.assertFalse(HouseholdMember.objects.filter(person_id=self.child_youngest.pk).exists())
+
+    def test_balances_carry_household(self):
+        balances = {row["person_id"]: row for row in calculate_balances(self.current_year)}
+        self.assertEqual(balances[self.child_eldest.pk]["household"], "Rue des Fleurs 10, 1300 Limal")
+        self.assertIsNone(balances[self.animateur.pk]["household"])
+
+
+class BillingOverviewTest(FinanceTestBase):
+    """The billing overview filters, sorts and pages in the database."""
+
+    def _names(self, response):
+        return [entry.person.first_name for entry in response.context["page_obj"]]
+
+    def setUp(self):
+        super().setUp()
+        self._login_tresorier()
+
+    def test_lists_children_and_animateurs(self):
+        response = self.client.get("/finance/")
+        self.assertEqual(self._names(response), ["Charlie", "Diana", "Eve"])
+        self.assertEqual(
+            [entry.person for entry in response.context["animateur_balances"]],
+            [self.animateur],
+        )
+        self.assertContains(response, "Louveteaux")
+        self.assertContains(response, "Rue des Fleurs 10, 1300 Limal")
+        self.assertContains(
+            response, LedgerEntry.objects.get(person=self.child_eldest).communication
+        )
+        self.assertContains(
+            response, LedgerEntry.objects.get(person=self.animateur).communication
+        )
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.client.get("/finance/")
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/finance/")
+        for index in range(5):
+            child = Person.objects.create(
+                first_name=f"Kid{index}", last_name="Extra",
+                primary_role=self.role_anime, status="a",
+                address=f"Rue {index}, 1000 Bruxelles",
+            )
+            Enrollment.objects.create(user=child, section=self.section, school_year=self.current_year)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get("/finance/")
+        self.assertEqual(len(response.context["page_obj"]), 8)
+        self.assertEqual(len(many), len(few))
+
+    def test_status_filters(self):
+        Payment.objects.create(
+            person=self.child_youngest, school_year=self.current_year, amount=Decimal("60.00"),
+        )
+        response = self.client.get("/finance/?status=paid")
+        self.assertEqual(self._names(response), ["Diana"])
+        self.assertEqual(response.context["animateur_balances"], [])
+        response = self.client.get("/finance/?status=unpaid")
+        self.assertEqual(self._names(response), ["Charlie", "Eve"])
+        self.assertEqual(self._names(self.client.get("/finance/?status=late")), [])
+
+        self.config.late_deadline = timezone.now().date() - timedelta(days=1)
+        self.config.save()
+        response = self.client.get("/finance/?status=late&sort=balance&direction=desc")
+        # Diana's 60€ no longer cover her fee with the penalty.
+        self.assertEqual(self._names(response), ["Eve", "Charlie", "Diana"])
+        self.assertEqual(response.context["page_obj"][0].balance, Decimal("88.00"))
+
+    def test_section_filter(self):
+        other = Section.objects.create(name="Scouts", branch=self.branch)
+        Enrollment.objects.filter(user=self.child_other).update(section=other)
+        response = self.client.get(f"/finance/?section={other.pk}")
+        self.assertEqual(self._names(response), ["Eve"])
+        self.assertEqual(response.context["animateur_balances"], [])
+
+    def test_sort_and_paginate(self):
+        response = self.client.get("/finance/?sort=balance&direction=asc&per_page=2")
+        self.assertEqual(self._names(response), ["Diana", "Charlie"])
+        self.assertEqual(response.context["page_obj"].paginator.num_pages, 2)
+        response = self.client.get("/finance/?sort=balance&direction=asc&per_page=2&page=2")
+        self.assertEqual(self._names(response), ["Eve"])
+
+
 class FinanceAppImportTest(TestCase):
     """Tests that the finance app loads correctly."""
 
@@ -1,15 +1,22 @@
+import io
 import json
 import re
 import shutil
 import tempfile
 from pathlib import Path
+from unittest import mock
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.translation import override
+from PIL import Image
 
 from homepage.models import ImageAsset, SiteContent
+from homepage.tasks import generate_image_variants
 from members.models import Account, Person, Role
 
 
@@ -234,6 +241,182 @@ class EditorAssetsTest(HomePageEditorTestBase):
         self.assertTrue(asset.file.storage.exists(asset.file.name))
 
 
+@override_settings(MEDIA_ROOT=Path(tempfile.mkdtemp()))
+class ImageVariantsTest(HomePageEditorTestBase):
+    """Uploaded photos get AVIF/WebP variants, offered by the saved HTML."""
+
+    def _asset(self, size=(2000, 1000), mode="RGB", name="photo.jpg"):
+        buffer = io.BytesIO()
+        Image.new(mode, size, "navy").save(buffer, "PNG")
+        asset = ImageAsset(
+            file=SimpleUploadedFile(name, buffer.getvalue()), original_name=name
+        )
+        asset.save()
+        return asset
+
+    def test_upload_schedules_variants(self):
+        self.client.force_login(self.superuser)
+        upload = SimpleUploadedFile("logo.png", b"\x89PNG...", content_type="image/png")
+        with mock.patch("homepage.tasks.generate_image_variants.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse("homepage_editor_assets"), {"file": upload})
+        delay.assert_called_once_with(ImageAsset.objects.get().pk)
+
+    def test_variants_and_manifest(self):
+        asset = self._asset()
+        self.assertEqual(generate_image_variants(asset.pk), 6)
+        asset.refresh_from_db()
+        manifest = asset.manifest
+        self.assertEqual((manifest["width"], manifest["height"]), (2000, 1000))
+        self.assertTrue(manifest["placeholder"].startswith("data:image/webp;base64,"))
+        for mime in ("image/avif", "image/webp"):
+            self.assertEqual([width for width, _url in manifest["sources"][mime]], [480, 960, 1600])
+        url = manifest["sources"]["image/webp"][0][1]
+        name = url.removeprefix("/media/")
+        self.assertTrue(asset.file.storage.exists(name))
+        with asset.file.storage.open(name) as variant:
+            self.assertEqual(Image.open(variant).size, (480, 240))
+
+    def test_small_image_is_not_enlarged(self):
+        asset = self._asset(size=(300, 200), mode="RGBA", name="logo.png")
+        generate_image_variants(asset.pk)
+        asset.refresh_from_db()
+        self.assertEqual(asset.manifest["sources"]["image/webp"][0][0], 300)
+        # No placeholder behind transparent pixels.
+        self.assertIsNone(asset.manifest["placeholder"])
+
+    def test_unreadable_upload_keeps_original(self):
+        asset = ImageAsset(
+            file=SimpleUploadedFile("broken.png", b"\x89PNG..."), original_name="broken.png"
+        )
+        asset.save()
+        self.assertEqual(generate_image_variants(asset.pk), 0)
+        asset.refresh_from_db()
+        self.assertEqual(asset.manifest, {})
+
+    def test_pages_showing_the_image_are_rewritten(self):
+        asset = self._asset()
+        SiteContent.objects.create(
+            page=SiteContent.Page.HOME,
+            html=f'<div><img id="i1" src="{asset.file.url}" alt="Camp"/></div>',
+        )
+        generate_image_variants(asset.pk)
+
+        content = SiteContent.get_content(SiteContent.Page.HOME)
+        self.assertTrue(content.html.startswith('<div><picture><source type="image/avif"'))
+        self.assertIn(f'src="{asset.file.url}" alt="Camp" srcset="', content.html)
+        self.assertIn("1600w", content.html)
+        self.assertIn('loading="lazy"', content.html)
+        # Saving again (the next editor save) changes nothing.
+        html = content.html
+        content.save()
+        self.assertEqual(content.html, html)
+
+    def test_pages_showing_an_encoded_name_are_rewritten(self):
+        asset = self._asset(name="été.jpg")
+        self.assertIn("%C3%A9t%C3%A9", asset.file.url)
+        SiteContent.objects.create(
+            page=SiteContent.Page.HOME,
+            html=f'<img src="{asset.file.url}" alt="Camp"/>',
+        )
+        generate_image_variants(asset.pk)
+
+        content = SiteContent.get_content(SiteContent.Page.HOME)
+        self.assertTrue(content.html.startswith('<picture><source type="image/avif"'))
+
+    def test_editor_save_offers_variants(self):
+        asset = self._asset()
+        generate_image_variants(asset.pk)
+        self.client.force_login(self.superuser)
+        self._save(self.client, "faq", "nl", f'<img src="{asset.file.url}">')
+        content = SiteContent.get_content(SiteContent.Page.FAQ)
+        self.assertIn("<picture>", content.html_nl)
+        self.assertIn("image/webp;base64", content.html_nl)
+
+
+class AssetLibraryTest(HomePageEditorTestBase):
+    """The editor lists the image library a page at a time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Created directly: the listing only reads names and stored URLs.
+        cls.assets = [
+            ImageAsset.objects.create(
+                file=f"homepage_images/2026/{name}.png", original_name=f"{name}.png"
+            )
+            for name in ("camp", "hike", "camp-fire", "logo", "parade")
+        ]
+
+    def _list(self, headers=None, **params):
+        return self.client.get(reverse("homepage_editor_assets"), params, headers=headers)
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def test_editor_page_does_not_embed_the_library(self):
+        response = self.client.get(reverse("homepage_editor"))
+        self.assertNotContains(response, "homepage_images/2026/")
+
+    def test_pages_follow_the_cursor(self):
+        names = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            data = self._list(**params).json()
+            self.assertLessEqual(len(data["assets"]), 2)
+            names += [asset["name"] for asset in data["assets"]]
+            cursor = data["next"]
+            if cursor is None:
+                break
+        # Newest first, each asset once.
+        self.assertEqual(names, [asset.original_name for asset in reversed(self.assets)])
+
+    def test_search_by_name(self):
+        data = self._list(q="CAMP").json()
+        self.assertEqual(
+            [asset["name"] for asset in data["assets"]], ["camp-fire.png", "camp.png"]
+        )
+        self.assertIsNone(data["next"])
+
+    def test_thumbnail_is_the_smallest_variant(self):
+        asset = self.assets[0]
+        asset.manifest = {"sources": {"image/webp": [[480, "/media/v/480.webp"]]}}
+        asset.save()
+        data = self._list(q="camp.png").json()
+        self.assertEqual(data["assets"][0]["thumbnail"], "/media/v/480.webp")
+        self.assertEqual(data["assets"][0]["src"], "/media/homepage_images/2026/camp.png")
+
+    def test_cached_listing_revalidates(self):
+        etag = self._list()["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._list(headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            [q for q in ctx.captured_queries if "homepage_imageasset" in q["sql"]]
+        )
+
+    def test_upload_changes_the_listing(self):
+        etag = self._list()["ETag"]
+        ImageAsset.objects.create(file="homepage_images/2026/new.png", original_name="new.png")
+        response = self.client.get(
+            reverse("homepage_editor_assets"), headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["assets"][0]["name"], "new.png")
+
+    def test_bad_cursor_or_limit_returns_400(self):
+        self.assertEqual(self._list(cursor="not-a-cursor").status_code, 400)
+        self.assertEqual(self._list(limit="0").status_code, 400)
+        self.assertEqual(self._list(limit="x").status_code, 400)
+
+    def test_non_superuser_gets_403(self):
+        self.client.force_login(self.regular_user)
+        self.assertEqual(self._list().status_code, 403)
+
+
 class EditLinkTest(HomePageEditorTestBase):
     """The 'Edit homepage' link is superuser-only."""
 
@@ -328,8 +511,8 @@ class LegacyFaqHeaderTest(HomePageEditorTestBase):
     """The FAQ page renders a fixed hat banner; saved content must not duplicate it.
 
     FAQ content saved before the banner existed still embeds the masthead
-    card the old default snippet seeded. It is stripped at render and at
-    save; the Home page keeps its own card (real content there).
+    card the old default snippet seeded. It is stripped when stored; the
+    Home page keeps its own card (real content there).
     """
 
     LEGACY_FAQ_HTML = (
@@ -375,6 +558,51 @@ class LegacyFaqHeaderTest(HomePageEditorTestBase):
         self.assertContains(response, "masthead")
 
 
+class StoredRenderOutputTest(HomePageEditorTestBase):
+    """Html/css are sanitized when stored; the pages render them as they are."""
+
+    def test_save_sanitizes_every_language(self):
+        content = SiteContent(
+            page=SiteContent.Page.FAQ,
+            html_fr='<body><div class="container row"><header class="masthead">'
+            "<h2>FAQ</h2></header></div><p>fr</p></body>",
+            html_nl="<body><p>nl</p></body>",
+            css_nl="body { margin: 0; } p { color: red; }",
+            css_en="",
+        )
+        content.save()
+        content.refresh_from_db()
+        self.assertEqual(content.html_fr, "<p>fr</p>")
+        self.assertEqual(content.html_nl, "<p>nl</p>")
+        self.assertEqual(content.css_nl, "p { color: red; }")
+        # Cleared languages stay unset, so they fall back to French.
+        self.assertIsNone(content.css_en)
+
+    def test_render_serves_stored_output(self):
+        SiteContent.objects.create(page=SiteContent.Page.HOME, html="<p>x</p>")
+        # Written around save(): the page no longer sanitizes on render.
+        SiteContent.objects.update(html_fr="<body><p>stored</p></body>")
+        response = self.client.get(reverse("homepage"))
+        self.assertContains(response, "<body><p>stored</p></body>")
+
+    def test_migration_sanitizes_saved_rows(self):
+        SiteContent.objects.create(page=SiteContent.Page.FAQ, html="<p>x</p>")
+        SiteContent.objects.update(
+            html_fr=LegacyFaqHeaderTest.LEGACY_FAQ_HTML,
+            css_nl="* { box-sizing: border-box; } #a{color:red}",
+        )
+
+        call_command("migrate", "homepage", "0003", verbosity=0)
+        call_command("migrate", "homepage", verbosity=0)
+
+        content = SiteContent.get_content(SiteContent.Page.FAQ)
+        self.assertEqual(
+            content.html_fr,
+            '<div class="container row"><p id="ihuux">Ceci est un test</p></div>',
+        )
+        self.assertEqual(content.css_nl, "#a{color:red}")
+
+
 class NavbarBrandLinkTest(HomePageEditorTestBase):
     """Logo and site name link back to the home page."""
 
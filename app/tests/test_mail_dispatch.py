@@ -0,0 +1,243 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from post_office import mail as post_office_mail
+from post_office.models import PRIORITY, STATUS, Email, EmailTemplate
+
+from members import mail_counters, mail_dispatch
+from members.models import Account, Person, Role
+from tests.mail import DUMMY_POST_OFFICE, MailTestCase
+from troopconnect.dummy_backend import DummyEmailBackend
+from troopconnect.tasks import dispatch_mail
+
+
+class BulkDummyBackend(DummyEmailBackend):
+    """Dummy backend advertising a bulk endpoint; records each call."""
+
+    bulk = True
+    calls = []
+
+    def send_messages(self, email_messages):
+        BulkDummyBackend.calls.append(len(email_messages))
+        return super().send_messages(email_messages)
+
+
+class RejectingBackend(DummyEmailBackend):
+    """Dummy backend refusing the messages sent to "bad" addresses."""
+
+    def send_messages(self, email_messages):
+        if any(to.startswith("bad") for message in email_messages for to in message.to):
+            raise ValueError("Rejected")
+        return super().send_messages(email_messages)
+
+
+def queue(priority, count=1, **kwargs):
+    for index in range(count):
+        post_office_mail.send(
+            recipients=[f"to{index}@test.be"],
+            sender="from@test.be",
+            subject="Hello",
+            message="Body",
+            priority=priority,
+            **kwargs,
+        )
+
+
+class MailDispatchTest(MailTestCase):
+    def test_dispatch_sends_only_its_priority(self):
+        queue(PRIORITY.medium, 2)
+        queue(PRIORITY.low, 3)
+
+        stats = mail_dispatch.dispatch(PRIORITY.medium)
+
+        self.assertEqual(stats["sent"], 2)
+        self.assertEqual(
+            Email.objects.filter(priority=PRIORITY.medium, status=STATUS.sent).count(), 2,
+        )
+        self.assertEqual(
+            Email.objects.filter(priority=PRIORITY.low, status=STATUS.queued).count(), 3,
+        )
+
+    def test_dispatch_claims_batch_after_batch(self):
+        queue(PRIORITY.low, 5)
+        stats = mail_dispatch.dispatch(PRIORITY.low, batch_size=2)
+        self.assertEqual(stats["sent"], 5)
+        self.assertFalse(Email.objects.exclude(status=STATUS.sent).exists())
+
+    def test_scheduled_emails_wait(self):
+        queue(PRIORITY.medium, scheduled_time=timezone.now() + timedelta(hours=1))
+        self.assertEqual(mail_dispatch.dispatch(PRIORITY.medium)["sent"], 0)
+        self.assertEqual(Email.objects.get().status, STATUS.queued)
+
+    def test_queueing_schedules_its_priority_queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue(PRIORITY.low)
+        queues = {call.kwargs["queue"] for call in dispatch_mail.apply_async.call_args_list}
+        self.assertEqual(queues, {"mail.low"})
+        self.assertEqual(dispatch_mail.apply_async.call_count, 2)
+
+    def test_pending_runs_are_not_scheduled_twice(self):
+        for _batch in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                queue(PRIORITY.low)
+        self.assertEqual(dispatch_mail.apply_async.call_count, 2)
+
+        # Once a run has started, newly queued mail schedules runs again.
+        mail_dispatch.dispatch(PRIORITY.low)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue(PRIORITY.low)
+        self.assertEqual(dispatch_mail.apply_async.call_count, 4)
+
+    def test_bulk_backend_gets_whole_batch(self):
+        BulkDummyBackend.calls = []
+        queue(PRIORITY.low, 3)
+        with override_settings(POST_OFFICE={
+            **DUMMY_POST_OFFICE,
+            "BACKENDS": {"default": "tests.test_mail_dispatch.BulkDummyBackend"},
+        }):
+            stats = mail_dispatch.dispatch(PRIORITY.low)
+        self.assertEqual(stats["sent"], 3)
+        self.assertEqual(BulkDummyBackend.calls, [3])
+        self.assertEqual(Email.objects.filter(status=STATUS.sent).count(), 3)
+
+    def test_failed_sends_are_requeued_and_logged(self):
+        with override_settings(POST_OFFICE={
+            **DUMMY_POST_OFFICE,
+            "BACKENDS": {
+                **DUMMY_POST_OFFICE["BACKENDS"],
+                "rejecting": "tests.test_mail_dispatch.RejectingBackend",
+            },
+            "LOG_LEVEL": 1,
+        }):
+            for to in ("ok1@test.be", "ok2@test.be", "bad@test.be"):
+                post_office_mail.send(
+                    recipients=[to], sender="from@test.be", subject="Hello",
+                    message="Body", priority=PRIORITY.medium, backend="rejecting",
+                )
+            stats = mail_dispatch.dispatch(PRIORITY.medium)
+
+        self.assertEqual((stats["sent"], stats["failed"], stats["requeued"]), (2, 0, 1))
+        bad = Email.objects.get(to="bad@test.be")
+        self.assertEqual(bad.status, STATUS.requeued)
+        self.assertEqual(bad.number_of_retries, 1)
+        self.assertEqual(bad.logs.get().message, "Rejected")
+
+    def test_dispatch_adjusts_counters(self):
+        mail_counters.get_counts()
+        with override_settings(POST_OFFICE={
+            **DUMMY_POST_OFFICE,
+            "BACKENDS": {
+                **DUMMY_POST_OFFICE["BACKENDS"],
+                "rejecting": "tests.test_mail_dispatch.RejectingBackend",
+            },
+        }):
+            with self.captureOnCommitCallbacks(execute=True):
+                for to in ("ok@test.be", "bad@test.be"):
+                    post_office_mail.send(
+                        recipients=[to], sender="from@test.be", subject="Hello",
+                        message="Body", priority=PRIORITY.medium, backend="rejecting",
+                    )
+            with self.captureOnCommitCallbacks(execute=True):
+                mail_dispatch.dispatch(PRIORITY.medium)
+
+        with CaptureQueriesContext(connection) as ctx:
+            counts = mail_counters.get_counts()
+        self.assertEqual(ctx.captured_queries, [])
+        self.assertEqual(counts, {"queued": 0, "requeued": 1, "failed": 0})
+        self.assertEqual(mail_counters.reconcile(), counts)
+
+    def test_template_emails_are_rendered(self):
+        template = EmailTemplate.objects.create(
+            name="greeting", subject="Hi {{ name }}", content="Hello {{ name }}",
+        )
+        for name in ("Ann", "Bob", "Cid"):
+            post_office_mail.send(
+                recipients=[f"{name}@test.be"], sender="from@test.be",
+                template=template, context={"name": name}, priority=PRIORITY.medium,
+            )
+        mail.outbox = []
+
+        with CaptureQueriesContext(connection) as ctx:
+            mail_dispatch.dispatch(PRIORITY.medium)
+
+        self.assertEqual(
+            sorted(message.subject for message in mail.outbox), ["Hi Ann", "Hi Bob", "Hi Cid"],
+        )
+        # The templates are loaded once for the batch.
+        self.assertEqual(
+            len([q for q in ctx.captured_queries if "post_office_emailtemplate" in q["sql"]]), 1,
+        )
+
+    def test_metrics_report_waiting_and_last_run(self):
+        queue(PRIORITY.low, 2)
+        Email.objects.update(created=timezone.now() - timedelta(minutes=10))
+        queue(PRIORITY.medium)
+        mail_dispatch.dispatch(PRIORITY.medium)
+
+        metrics = {row["priority"]: row for row in mail_dispatch.metrics()}
+
+        self.assertEqual(metrics["low"]["waiting"], 2)
+        self.assertGreaterEqual(metrics["low"]["age"], 600)
+        self.assertIsNone(metrics["low"]["last_run"])
+        self.assertEqual(metrics["medium"]["waiting"], 0)
+        self.assertEqual(metrics["medium"]["last_run"]["sent"], 1)
+
+    def test_dashboard_shows_metrics(self):
+        staff = Account.objects.create_user(
+            email="staff@test.be", password="pw", is_staff=True,
+            person=Person.objects.create(
+                first_name="Staff", last_name="User",
+                primary_role=Role.objects.get(short="p"), status="a",
+            ),
+        )
+        self.client.force_login(staff)
+        queue(PRIORITY.low)
+        response = self.client.get(reverse("members:mail_queue"))
+        self.assertEqual(len(response.context["dispatch_metrics"]), 3)
+        self.assertContains(response, "mail.low")
+
+
+@override_settings(POST_OFFICE=DUMMY_POST_OFFICE)
+@mock.patch("troopconnect.tasks.dispatch_mail.apply_async")
+class MailDispatchLockingTest(TransactionTestCase):
+    """Parallel runs skip the rows another run has claimed."""
+
+    serialized_rollback = True
+
+    def test_locked_emails_are_skipped(self, apply_async):
+        queue(PRIORITY.medium, 3)
+        claimed = threading.Event()
+        release = threading.Event()
+        held = []
+
+        def hold_two():
+            try:
+                with transaction.atomic():
+                    held.extend(mail_dispatch._claim(PRIORITY.medium, 2))
+                    claimed.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_two)
+        thread.start()
+        try:
+            self.assertTrue(claimed.wait(10))
+            stats = mail_dispatch.dispatch(PRIORITY.medium)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(stats["sent"], 1)
+        held_ids = {email.pk for email in held}
+        self.assertEqual(
+            set(Email.objects.filter(status=STATUS.queued).values_list("pk", flat=True)),
+            held_ids,
+        )
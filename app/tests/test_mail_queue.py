@@ -1,15 +1,19 @@
 from django.contrib.auth.models import AnonymousUser
 from django.core import mail
 from django.core.mail import EmailMessage
+from django.db import connection
 from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from post_office import mail as post_office_mail
 from post_office.models import STATUS, Email
 
+from members import mail_counters
 from members.context_processors import mail_queue_status
 from members.models import Account, Person, Role
 from tests.mail import MailTestCase
 from troopconnect.dummy_backend import DummyEmailBackend
+from troopconnect.tasks import reconcile_mail_counters
 
 
 class EmailQueueTest(MailTestCase):
@@ -132,3 +136,70 @@ class MailQueueContextProcessorTest(MailTestCase):
         request = RequestFactory().get("/")
         request.user = self.staff_account
         self.assertEqual(mail_queue_status(request)["failed_mail_count"], 1)
+
+
+class MailCountersTest(MailTestCase):
+    """Queue counters are cached and adjusted without recounting."""
+
+    def _queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post_office_mail.send(
+                recipients=["to@test.be"],
+                sender="from@test.be",
+                subject="Hello",
+                message="Body",
+            )
+
+    def test_read_is_cached(self):
+        mail_counters.get_counts()
+        with CaptureQueriesContext(connection) as ctx:
+            counts = mail_counters.get_counts()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(counts, {"queued": 0, "requeued": 0, "failed": 0})
+
+    def test_queueing_increments(self):
+        mail_counters.get_counts()
+        self._queue()
+        self._queue()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(mail_counters.get_counts()["queued"], 2)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_requeue_and_purge_adjust(self):
+        role_parent = Role.objects.get(short="p")
+        staff = Account.objects.create_user(
+            email="staff@test.be", password="pw", is_staff=True,
+            person=Person.objects.create(
+                first_name="Staff", last_name="User",
+                primary_role=role_parent, status="a",
+            ),
+        )
+        self.client.force_login(staff)
+        self._queue()
+        self._queue()
+        Email.objects.update(status=STATUS.failed)
+        mail_counters.reconcile()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("members:mail_queue"), {"action": "requeue"})
+        self.assertEqual(
+            mail_counters.get_counts(), {"queued": 2, "requeued": 0, "failed": 0},
+        )
+
+        Email.objects.update(status=STATUS.failed)
+        mail_counters.reconcile()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("members:mail_queue"), {"action": "purge"})
+        self.assertEqual(mail_counters.get_counts()["failed"], 0)
+        response = self.client.get(reverse("members:mail_queue"))
+        self.assertEqual(response.context["failed_count"], 0)
+
+    def test_reconcile_task_fixes_drift(self):
+        self._queue()
+        mail_counters.get_counts()
+        Email.objects.update(status=STATUS.failed)
+
+        counts = reconcile_mail_counters()
+
+        self.assertEqual(counts, {"queued": 0, "requeued": 0, "failed": 1})
+        self.assertEqual(mail_counters.get_counts()["failed"], 1)
@@ -0,0 +1,137 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.mail import EmailMultiAlternatives
+from django.test import SimpleTestCase
+
+from troopconnect.mailersend_backend import MailerSendBackend, MailerSendError
+
+
+class StubMailerSend(ThreadingHTTPServer):
+    """Local stand-in for the MailerSend API.
+
+    Records every request and answers with the queued (status, headers)
+    responses, then 202.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests = []
+        self.responses = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def get_request(self):
+        with self.lock:
+            self.connections += 1
+        return super().get_request()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.requests.append({
+                "path": self.path,
+                "auth": self.headers["Authorization"],
+                "json": json.loads(body),
+            })
+            status, headers = (
+                self.server.responses.pop(0) if self.server.responses else (202, {})
+            )
+        payload = b'{"message": "ok"}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class MailerSendBackendTest(SimpleTestCase):
+    def setUp(self):
+        self.server = StubMailerSend()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _backend(self, **kwargs):
+        options = {
+            "api_key": "key", "api_url": self.server.url,
+            "bulk": False, "concurrency": 1,
+        }
+        options.update(kwargs)
+        return MailerSendBackend(**options)
+
+    def _messages(self, count):
+        messages = []
+        for index in range(count):
+            message = EmailMultiAlternatives(
+                subject=f"Subject {index}", body="Text",
+                from_email="unit@test.be", to=[f"member{index}@test.be"],
+            )
+            message.attach_alternative("<p>Html</p>", "text/html")
+            messages.append(message)
+        return messages
+
+    def test_session_is_reused_between_messages(self):
+        backend = self._backend()
+        backend.open()
+        self.assertEqual(backend.send_messages(self._messages(3)), 3)
+        backend.close()
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.connections, 1)
+        first = self.server.requests[0]
+        self.assertEqual(first["path"], "/v1/email")
+        self.assertEqual(first["auth"], "Bearer key")
+        self.assertEqual(first["json"]["html"], "<p>Html</p>")
+        self.assertEqual(first["json"]["text"], "Text")
+
+    def test_bulk_endpoint_batches_messages(self):
+        backend = self._backend(bulk=True)
+        backend.BULK_LIMIT = 2
+        self.assertEqual(backend.send_messages(self._messages(5)), 5)
+
+        paths = [request["path"] for request in self.server.requests]
+        self.assertEqual(paths, ["/v1/bulk-email"] * 3)
+        self.assertEqual(
+            [len(request["json"]) for request in self.server.requests], [2, 2, 1],
+        )
+
+    def test_concurrent_sends(self):
+        backend = self._backend(concurrency=3)
+        self.assertEqual(backend.send_messages(self._messages(6)), 6)
+        recipients = {r["json"]["to"][0]["email"] for r in self.server.requests}
+        self.assertEqual(len(recipients), 6)
+        self.assertLessEqual(self.server.connections, 3)
+
+    def test_rate_limit_is_retried(self):
+        self.server.responses = [(429, {"Retry-After": "0"}), (429, {"Retry-After": "0"})]
+        backend = self._backend()
+        self.assertEqual(backend.send_messages(self._messages(1)), 1)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_error_raises_so_post_office_requeues(self):
+        self.server.responses = [(422, {})]
+        with self.assertRaises(MailerSendError):
+            self._backend().send_messages(self._messages(1))
+
+    def test_error_with_fail_silently(self):
+        self.server.responses = [(429, {"Retry-After": "0"})] * 2
+        backend = self._backend(fail_silently=True, max_retries=1)
+        self.assertEqual(backend.send_messages(self._messages(1)), 0)
@@ -0,0 +1,223 @@
+from django.test import TestCase
+from django.urls import reverse
+from post_office.models import EmailTemplate
+
+from finance.models import Payment
+from members.models import Account, Enrollment, Person, Role, SchoolYear, Section
+from members.search import search_persons
+from messaging.models import SectionMessageRecipient
+from tests.mail import MailTestCase
+
+
+class MemberSearchTestBase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        EmailTemplate.objects.create(
+            name="new_child_staff", subject="Test", content="Test",
+        )
+        cls.role_parent = Role.objects.get(short="p")
+        cls.helene = Person.objects.create(
+            first_name="Hélène", last_name="Dupont", totem="Castor Malin",
+            primary_role=cls.role_parent, status="a",
+        )
+        Account.objects.create_user(
+            email="zorglub@example.com", password="pass", person=cls.helene,
+        )
+        cls.martin = Person.objects.create(
+            first_name="Luc", last_name="Martin",
+            primary_role=cls.role_parent, status="a",
+        )
+        cls.martinez = Person.objects.create(
+            first_name="Jean", last_name="Martinez",
+            address="Rue des Fleurs 10, 1300 Limal",
+            primary_role=cls.role_parent, status="a",
+        )
+
+    def _names(self, query, persons=None):
+        return [person.last_name for person in search_persons(query, persons)]
+
+
+class SearchPersonsTest(MemberSearchTestBase):
+    """members.search: typo tolerant, accent insensitive, ranked."""
+
+    def test_accents_and_typos(self):
+        self.assertEqual(self._names("helene dupnt"), ["Dupont"])
+        self.assertEqual(self._names("dupnot"), ["Dupont"])
+
+    def test_totem_address_and_email(self):
+        self.assertEqual(self._names("castor"), ["Dupont"])
+        self.assertEqual(self._names("fleurs"), ["Martinez"])
+        self.assertEqual(self._names("zorglub"), ["Dupont"])
+
+    def test_closest_first(self):
+        self.assertEqual(self._names("martin"), ["Martin", "Martinez"])
+
+    def test_short_query_finds_nothing(self):
+        self.assertEqual(self._names(" m "), [])
+
+    def test_restricted_to_queryset(self):
+        persons = Person.objects.exclude(pk=self.martin.pk)
+        self.assertEqual(self._names("martin", persons), ["Martinez"])
+
+    def test_unrelated_query(self):
+        self.assertEqual(self._names("xyzzy"), [])
+
+
+class AdminPersonSearchTest(MemberSearchTestBase):
+    """Typeahead of the member list."""
+
+    def test_staff_gets_links_to_members(self):
+        staff = Account.objects.create_user(
+            email="admin@test.com", password="pass", is_staff=True,
+            person=Person.objects.create(
+                first_name="Admin", last_name="Staff",
+                primary_role=self.role_parent, status="a",
+            ),
+        )
+        self.client.force_login(staff)
+        response = self.client.get(reverse("members:person_search"), {"q": "dupnt"})
+        self.assertContains(
+            response, reverse("members:admin_update", kwargs={"pk": self.helene.pk})
+        )
+        self.assertContains(response, "Castor Malin")
+
+        response = self.client.get(reverse("members:person_search"), {"q": "xyzzy"})
+        self.assertNotContains(response, "list-group-item")
+
+    def test_non_staff_cannot_search(self):
+        self.client.force_login(self.helene.account)
+        response = self.client.get(reverse("members:person_search"), {"q": "martin"})
+        self.assertEqual(response.status_code, 403)
+
+
+class PaymentPersonSearchTest(MemberSearchTestBase):
+    """Picking the person of a payment with the search."""
+
+    def setUp(self):
+        tresorier = Person.objects.create(
+            first_name="Tina", last_name="Tresor",
+            primary_role=self.role_parent, status="a",
+        )
+        tresorier.roles.add(Role.objects.get(short="t"))
+        self.account = Account.objects.create_user(
+            email="tresor@test.com", password="pass", person=tresorier,
+        )
+        self.client.force_login(self.account)
+
+    def test_results_reload_the_modal(self):
+        response = self.client.get(
+            reverse("finance:payment_persons"), {"q": "martinez", "modal": "1"}
+        )
+        url = f"{reverse('finance:record_payment')}?person_id={self.martinez.pk}"
+        self.assertContains(response, f'hx-get="{url}"')
+
+    def test_picked_person_is_shown(self):
+        response = self.client.get(
+            reverse("finance:record_payment"),
+            {"person_id": self.martinez.pk},
+            headers={"hx-request": "true"},
+        )
+        self.assertContains(response, "Jean Martinez")
+        self.assertNotContains(response, reverse("finance:payment_persons"))
+
+        response = self.client.get(reverse("finance:record_payment"))
+        self.assertContains(response, reverse("finance:payment_persons"))
+
+    def test_malformed_person_id(self):
+        response = self.client.post(
+            reverse("finance:record_payment"),
+            {"person_id": "not-a-uuid", "amount": "10", "date": "2025-01-01"},
+        )
+        self.assertRedirects(response, reverse("finance:billing"))
+        self.assertFalse(Payment.objects.exists())
+
+    def test_others_cannot_search(self):
+        self.client.force_login(self.helene.account)
+        response = self.client.get(reverse("finance:payment_persons"), {"q": "martin"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ComposeRecipientSearchTest(MailTestCase):
+    """Adding one person to the recipients of a message with the search."""
+
+    def setUp(self):
+        super().setUp()
+        EmailTemplate.objects.create(
+            name="new_child_staff", subject="Test", content="Test",
+        )
+        self.current_year = SchoolYear.current()
+        role_animateur = Role.objects.get(short="a")
+        role_parent = Role.objects.get(short="p")
+        self.section = Section.objects.create(name="Louveteaux")
+        other_section = Section.objects.create(name="Baladins")
+
+        self.staff = Person.objects.create(
+            first_name="Marie", last_name="Staff",
+            primary_role=role_parent, status="a",
+        )
+        self.staff.roles.add(Role.objects.get(short="ar"))
+        Account.objects.create_user(email="staff@test.com", password="pass", person=self.staff)
+
+        def animateur(first_name, last_name, email, section):
+            person = Person.objects.create(
+                first_name=first_name, last_name=last_name,
+                primary_role=role_animateur, status="a",
+            )
+            Account.objects.create_user(email=email, password="pass", person=person)
+            Enrollment.objects.create(
+                user=person, section=section, school_year=self.current_year,
+            )
+            return person
+
+        self.anim = animateur("Jean", "Anim", "anim@test.com", self.section)
+        self.colleague = animateur("Akela", "Collegue", "akela@test.com", self.section)
+        self.other = animateur("Luc", "Autre", "luc@test.com", other_section)
+
+    def _search(self, query):
+        return self.client.get(reverse("messaging:recipient_search"), {"q": query})
+
+    def test_sender_may_add_anyone_with_an_email(self):
+        self.client.force_login(self.staff.account)
+        self.assertContains(self._search("autre"), f'"add_recipient": "{self.other.pk}"')
+        # The sender is not a recipient.
+        self.assertNotContains(self._search("marie staff"), "list-group-item")
+
+    def test_animateur_only_finds_their_section(self):
+        self.client.force_login(self.anim.account)
+        self.assertContains(self._search("collegue"), f'"add_recipient": "{self.colleague.pk}"')
+        self.assertNotContains(self._search("autre"), "list-group-item")
+
+    def test_added_person_is_loaded_and_sent_to(self):
+        self.client.force_login(self.staff.account)
+        response = self.client.post(reverse("messaging:compose"), {
+            "recipient_group": "everyone",
+            "hx_load_recipients": "1",
+            "add_recipient": str(self.other.pk),
+        })
+        html = response.content.decode()
+        self.assertIn(f'value="person:{self.other.pk}"', html)
+        self.assertIn(f'name="recipient_{self.other.pk}"', html)
+        self.assertIn("luc@test.com", html)
+        self.assertNotIn(f'name="recipient_{self.anim.pk}"', html)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("messaging:compose"), {
+                "recipient_group": "everyone",
+                "subject": "Hello",
+                "body": "Body",
+                "loaded_groups": f"person:{self.other.pk}",
+                f"recipient_{self.other.pk}": "on",
+            })
+        self.assertEqual(
+            list(SectionMessageRecipient.objects.values_list("parent", flat=True)),
+            [self.other.pk],
+        )
+
+    def test_locked_animateur_cannot_add_other_sections(self):
+        self.client.force_login(self.anim.account)
+        response = self.client.post(reverse("messaging:compose"), {
+            "recipient_group": "section_all",
+            "hx_load_recipients": "1",
+            "add_recipient": str(self.other.pk),
+        })
+        self.assertNotIn(f'name="recipient_{self.other.pk}"', response.content.decode())
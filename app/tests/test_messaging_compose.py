@@ -1,4 +1,13 @@
-from django.test import Client
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from post_office.models import Attachment, Email, EmailTemplate
 
 from members.models import (
     Account,
@@ -9,7 +18,8 @@ from members.models import (
     SchoolYear,
     Section,
 )
-from messaging.models import SectionMessage
+from messaging import fanout
+from messaging.models import MessageAttachment, SectionMessage
 from tests.mail import MailTestCase
 
 
@@ -163,10 +173,11 @@ class ComposeRecipientAccumulationTest(MailTestCase):
             # Parent unchecked: checkbox absent; animateur checked
             f"recipient_{self.anim_person.pk}": "on",
         }
-        response = self.client.post("/messaging/compose/", post)
-        self.assertRedirects(response, "/messaging/history/")
-
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/messaging/compose/", post)
         msg = SectionMessage.objects.get()
+        self.assertRedirects(response, f"/messaging/history/{msg.pk}/")
+
         recipient_pks = set(msg.recipients.values_list("parent__pk", flat=True))
         # Animateur (checked) was sent to; parent (unchecked) recorded as not sent
         self.assertIn(self.anim_person.pk, recipient_pks)
@@ -184,12 +195,34 @@ class ComposeRecipientAccumulationTest(MailTestCase):
             "body": "Hello",
             f"recipient_{self.anim_person.pk}": "on",
         }
-        response = self.client.post("/messaging/compose/", post)
-        self.assertRedirects(response, "/messaging/history/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/messaging/compose/", post)
         msg = SectionMessage.objects.get()
+        self.assertRedirects(response, f"/messaging/history/{msg.pk}/")
         recipient_pks = set(msg.recipients.values_list("parent__pk", flat=True))
         self.assertEqual(recipient_pks, {self.anim_person.pk})
 
+    def test_parent_detail_lists_children_in_section(self):
+        response = self._load("section_parents", self.section.pk)
+        self.assertEqual(response.context["recipients"][0]["detail"], "Camille")
+
+    def test_load_cost_does_not_grow_with_groups(self):
+        self._load("staff")  # warm up per-request caches
+
+        with CaptureQueriesContext(connection) as one_group:
+            self._load("section_parents", self.section.pk)
+        with CaptureQueriesContext(connection) as five_groups:
+            self._load(
+                "everyone",
+                loaded_groups=[
+                    f"section_parents:{self.section.pk}",
+                    f"section_all:{self.other_section.pk}",
+                    "all_animateurs",
+                    "staff",
+                ],
+            )
+        self.assertEqual(len(five_groups), len(one_group))
+
     def test_sender_excluded_from_recipients(self):
         # Staff loads "everyone": they must not appear in their own list
         response = self._load("everyone")
@@ -237,3 +270,135 @@ class ComposeEmptyGroupTest(MailTestCase):
         html = response.content.decode()
         self.assertIn("Aucun destinataire trouvé.", html)
         self.assertNotIn('<table class="table table-striped">', html)
+
+
+@override_settings(MEDIA_ROOT=Path(tempfile.mkdtemp()))
+class ComposeFanOutTest(MailTestCase):
+    """Sending stores the message and recipients; a task queues the emails."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        role_parent = Role.objects.get(short="p")
+        self.staff_person = Person.objects.create(
+            first_name="Marie", last_name="Staff",
+            primary_role=role_parent, status="a",
+        )
+        self.staff_person.roles.add(Role.objects.get(short="ar"))
+        Account.objects.create_user(
+            email="staff@test.com", password="testpass", person=self.staff_person,
+        )
+        self.recipients = []
+        for index, language in enumerate(["fr", "nl", "fr", "nl"]):
+            person = Person.objects.create(
+                first_name=f"Membre{index}", last_name="Test",
+                primary_role=role_parent, status="a",
+            )
+            Account.objects.create_user(
+                email=f"member{index}@test.com", password="testpass",
+                person=person, preferred_language=language,
+            )
+            self.recipients.append(person)
+        default = EmailTemplate.objects.get(name="section_message", language="")
+        default.translated_templates.create(
+            name="section_message", language="nl",
+            subject="[NL] {{ subject }}", content="{{ body }}",
+        )
+        self.client.login(email="staff@test.com", password="testpass")
+
+    def _post(self, **extra):
+        post = {
+            "recipient_group": "everyone",
+            "subject": "Camp",
+            "body": "Bring {{ boots }}",
+            "loaded_groups": ["everyone"],
+            **{f"recipient_{p.pk}": "on" for p in self.recipients[:3]},
+        }
+        post.update(extra)
+        return self.client.post("/messaging/compose/", post)
+
+    def test_view_returns_before_queueing(self):
+        with self.captureOnCommitCallbacks():
+            self._post()
+        msg = SectionMessage.objects.get()
+
+        self.assertFalse(Email.objects.exists())
+        self.assertEqual(msg.recipients.filter(selected=True).count(), 3)
+        response = self.client.get(f"/messaging/history/{msg.pk}/progress/")
+        self.assertEqual(
+            response.json(),
+            {"id": str(msg.pk), "total": 3, "sent": 0, "done": False},
+        )
+
+    def test_task_renders_once_per_language(self):
+        with mock.patch.object(fanout, "_render", wraps=fanout._render) as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._post()
+        msg = SectionMessage.objects.get()
+
+        self.assertEqual(render.call_count, 2)
+        subjects = {email.to[0]: email.subject for email in Email.objects.all()}
+        self.assertEqual(subjects, {
+            "member0@test.com": "Camp",
+            "member1@test.com": "[NL] Camp",
+            "member2@test.com": "Camp",
+        })
+        # The body is user input, not a template.
+        self.assertIn("Bring {{ boots }}", Email.objects.first().message)
+        response = self.client.get(f"/messaging/history/{msg.pk}/progress/")
+        self.assertEqual(response.json()["sent"], 3)
+        self.assertTrue(response.json()["done"])
+        self.assertIsNone(msg.recipients.get(parent=self.recipients[3]).sent_at)
+
+    def test_attachment_is_shared_by_all_emails(self):
+        upload = SimpleUploadedFile("plan.pdf", b"%PDF-1.4", content_type="application/pdf")
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(attachments=upload)
+
+        self.assertEqual(Attachment.objects.count(), 1)
+        self.assertEqual(Attachment.objects.get().emails.count(), 3)
+
+    def test_attachments_are_content_addressed_and_reused(self):
+        # Above FILE_UPLOAD_MAX_MEMORY_SIZE: streamed to a temporary file.
+        content = b"%PDF-1.4 " + b"x" * (3 * 1024 * 1024)
+        digest = hashlib.sha256(content).hexdigest()
+        for name in ("plan.pdf", "plan-copie.PDF"):
+            upload = SimpleUploadedFile(name, content, content_type="application/pdf")
+            with self.captureOnCommitCallbacks(execute=True):
+                self._post(attachments=upload)
+
+        attachment = MessageAttachment.objects.get()
+        self.assertEqual(attachment.content_hash, digest)
+        self.assertEqual(
+            attachment.file.name, f"message_attachments/{digest[:2]}/{digest}.pdf",
+        )
+        # One post_office copy, carried by the emails of both messages.
+        self.assertEqual(Attachment.objects.get().emails.count(), 6)
+
+    def test_progress_fragment_polls_until_done(self):
+        with self.captureOnCommitCallbacks():
+            self._post()
+        msg = SectionMessage.objects.get()
+        url = f"/messaging/history/{msg.pk}/progress/"
+
+        response = self.client.get(url, HTTP_HX_REQUEST="true")
+        self.assertContains(response, f'hx-get="{url}"')
+
+        fanout.dispatch(msg.pk)
+        response = self.client.get(url, HTTP_HX_REQUEST="true")
+        self.assertNotContains(response, "hx-get")
+
+    def test_progress_is_private_to_the_sender(self):
+        with self.captureOnCommitCallbacks():
+            self._post()
+        msg = SectionMessage.objects.get()
+        other = Person.objects.create(
+            first_name="Autre", last_name="Staff",
+            primary_role=Role.objects.get(short="p"), status="a",
+        )
+        other.roles.add(Role.objects.get(short="ar"))
+        Account.objects.create_user(email="other@test.com", password="testpass", person=other)
+        self.client.login(email="other@test.com", password="testpass")
+
+        response = self.client.get(f"/messaging/history/{msg.pk}/progress/")
+        self.assertEqual(response.status_code, 404)
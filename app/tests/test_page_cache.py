@@ -0,0 +1,96 @@
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.middleware.csrf import CSRF_TOKEN_LENGTH
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from homepage.models import Event, SiteContent
+from homepage.page_cache import CSRF_PLACEHOLDER
+from members.models import Account, Person, Role, SiteSettings
+
+
+class AnonymousPageCacheTest(TestCase):
+    """Home, FAQ and Agenda are served to anonymous visitors from the cache."""
+
+    def _get(self, name, **headers):
+        return self.client.get(reverse(name), headers=headers)
+
+    def test_repeat_visit_runs_no_query(self):
+        first = self._get("homepage")
+        with CaptureQueriesContext(connection) as ctx:
+            second = self._get("homepage")
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_each_visitor_gets_their_csrf_token(self):
+        first = self._get("homepage")
+        self.client.cookies.clear()
+        second = self._get("homepage")
+        for response in (first, second):
+            self.assertNotContains(response, CSRF_PLACEHOLDER)
+            self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+            token = re.search(r'"X-CSRFToken": "(\w+)"', response.content.decode())
+            self.assertEqual(len(token[1]), CSRF_TOKEN_LENGTH)
+        # A new CSRF secret changes the ETag: a cached copy would hold a
+        # token that no longer matches the cookie.
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+    def test_matching_etag_returns_304(self):
+        etag = self._get("faq")["ETag"]
+        response = self._get("faq", if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self._get("agenda")["Last-Modified"]
+        self.client.cookies.clear()
+        response = self._get("agenda", if_modified_since=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_editor_save_invalidates(self):
+        self._get("homepage")
+        SiteContent.objects.create(page=SiteContent.Page.HOME, html="<p>Nouveau</p>")
+        self.assertContains(self._get("homepage"), "<p>Nouveau</p>")
+
+    def test_event_creation_invalidates(self):
+        self._get("agenda")
+        Event.objects.create(title="Hike", date=timezone.localdate() + timedelta(days=3))
+        self.assertContains(self._get("agenda"), "Hike")
+
+    def test_settings_change_invalidates(self):
+        etag = self._get("homepage")["ETag"]
+        site_settings = SiteSettings.get_settings()
+        site_settings.site_name = "Unité 42"
+        site_settings.save()
+        response = self._get("homepage", if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Unité 42")
+
+    def test_query_string_is_not_cached(self):
+        self._get("homepage")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("homepage"), {"utm": "x"})
+        self.assertNotIn("ETag", response)
+        self.assertGreater(len(ctx.captured_queries), 0)
+
+    def test_logged_in_users_are_not_cached(self):
+        account = Account.objects.create_user(
+            email="parent@test.be",
+            password="pass",
+            person=Person.objects.create(
+                first_name="Regular", last_name="Parent",
+                primary_role=Role.objects.get(short="p"), status="a",
+            ),
+        )
+        self._get("homepage")
+        self.client.force_login(account)
+        response = self._get("homepage")
+        self.assertNotIn("ETag", response)
+        self.assertContains(response, "parent@test.be")
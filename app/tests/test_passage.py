@@ -1,11 +1,19 @@
+import json
 from datetime import date, timedelta
+from io import StringIO
 from unittest import mock
 
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 from post_office.models import EmailTemplate
 
+from finance.models import LedgerEntry
 from members.models import (
+    Account,
     Branch,
     Enrollment,
     ParentChild,
@@ -15,6 +23,7 @@ from members.models import (
     Section,
     SiteSettings,
 )
+from members.passage import AGE_OUT, MOVE, STAY, preview_passage
 from members.tasks import run_passage
 
 
@@ -366,3 +375,180 @@ class PassageGuardTest(PassageTestBase):
             Enrollment.objects.get(user=child, school_year=self.next_year).section,
             self.section_mid,
         )
+
+
+class PassageBulkTest(PassageTestBase):
+    """The passage is set-based: its query count must not grow with the troop."""
+
+    def _make_children(self, count):
+        dec_31_next = self.next_year.name + 1
+        for i in range(count):
+            # Alternate between staying (8), moving (10) and aging out (18).
+            age = (8, 10, 18)[i % 3]
+            child = Person.objects.create(
+                first_name=f"Child{i}", last_name="Bulk",
+                primary_role=self.role_anime, status="a",
+                birthday=timezone.now().date().replace(year=dec_31_next - age),
+                next_section=self.section_mid if i == 0 else None,
+            )
+            Enrollment.objects.create(
+                user=child,
+                section=self.section_old if age == 18 else self.section_young,
+                school_year=self.current_year,
+            )
+
+    def _run_and_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = run_passage()
+        return result, len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        SiteSettings.get_settings()
+        self._make_children(3)
+        _result, small = self._run_and_count()
+
+        # Reset the marker and the produced rows, then rerun on a larger troop.
+        site_settings = SiteSettings.get_settings()
+        site_settings.last_passage_school_year = None
+        site_settings.save(update_fields=["last_passage_school_year"])
+        SiteSettings.get_settings()
+        Enrollment.objects.filter(school_year=self.next_year).delete()
+        Person.objects.filter(last_name="Bulk").delete()
+        self._make_children(12)
+        result, large = self._run_and_count()
+
+        self.assertEqual(small, large)
+        self.assertEqual(result, {"promoted": 5, "aged_out": 4})
+
+    def test_existing_target_enrollment_is_moved(self):
+        """Like update_or_create(user, school_year): no second target row."""
+        dec_31_next = self.next_year.name + 1
+        child = Person.objects.create(
+            first_name="Test", last_name="Child",
+            primary_role=self.role_anime, status="a",
+            birthday=timezone.now().date().replace(year=dec_31_next - 10),
+        )
+        Enrollment.objects.create(
+            user=child, section=self.section_young, school_year=self.current_year,
+        )
+        Enrollment.objects.create(
+            user=child, section=self.section_old, school_year=self.next_year,
+        )
+
+        run_passage()
+
+        next_enrollments = Enrollment.objects.filter(user=child, school_year=self.next_year)
+        self.assertEqual(
+            list(next_enrollments.values_list("section", flat=True)),
+            [self.section_mid.pk],
+        )
+
+    def test_ledger_follows_the_passage(self):
+        """Bulk writes send no model signals; passage_applied refreshes the ledger."""
+        self._make_children(3)
+
+        run_passage()
+
+        self.assertEqual(
+            set(
+                LedgerEntry.objects.filter(school_year=self.next_year)
+                .values_list("person__first_name", flat=True)
+            ),
+            {"Child0", "Child1"},
+        )
+
+
+class PassagePreviewTest(PassageTestBase):
+    """The preview reports the passage outcome without writing anything."""
+
+    def setUp(self):
+        super().setUp()
+        dec_31_next = self.next_year.name + 1
+        for first_name, age, section in (
+            ("Stay", 8, self.section_young),
+            ("Move", 10, self.section_young),
+            ("Out", 18, self.section_old),
+        ):
+            child = Person.objects.create(
+                first_name=first_name, last_name="Preview",
+                primary_role=self.role_anime, status="a",
+                birthday=timezone.now().date().replace(year=dec_31_next - age),
+            )
+            Enrollment.objects.create(
+                user=child, section=section, school_year=self.current_year,
+            )
+
+    def test_preview_reports_actions(self):
+        report = preview_passage()
+
+        self.assertEqual(report["target_year"], self.next_year.name)
+        self.assertFalse(report["already_applied"])
+        actions = {row["first_name"]: row["action"] for row in report["rows"]}
+        self.assertEqual(actions, {"Stay": STAY, "Move": MOVE, "Out": AGE_OUT})
+        move = next(row for row in report["rows"] if row["action"] == MOVE)
+        self.assertEqual(move["current_section"], "Baladins")
+        self.assertEqual(move["target_section"], "Louveteaux")
+        self.assertEqual(report["summary"][MOVE], 1)
+
+    def test_preview_writes_nothing(self):
+        preview_passage()
+
+        self.assertFalse(Enrollment.objects.filter(school_year=self.next_year).exists())
+        self.assertFalse(Person.objects.filter(primary_role=self.role_animateur).exists())
+        self.assertIsNone(SiteSettings.get_settings().last_passage_school_year)
+
+    def test_preview_matches_run(self):
+        """What the preview announces is what run_passage then does."""
+        planned = {row["first_name"]: row["target_section"] for row in preview_passage()["rows"]}
+
+        run_passage()
+
+        enrolled = dict(
+            Enrollment.objects.filter(school_year=self.next_year)
+            .values_list("user__first_name", "section__name")
+        )
+        self.assertEqual(enrolled, {k: v for k, v in planned.items() if v})
+
+    def test_command_json(self):
+        out = StringIO()
+        call_command("preview_passage", "--format", "json", "--changes-only", stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            sorted(row["first_name"] for row in report["rows"]), ["Move", "Out"],
+        )
+
+    def test_command_text(self):
+        out = StringIO()
+        call_command("preview_passage", stdout=out)
+        self.assertIn("Preview Move: Baladins → Louveteaux [move]", out.getvalue())
+
+    def test_staff_view(self):
+        staff = Person.objects.create(
+            first_name="Staff", last_name="User",
+            primary_role=self.role_parent, status="a",
+        )
+        account = Account.objects.create_user(
+            email="staff@test.be", password="pw", person=staff, is_staff=True,
+        )
+        self.client.force_login(account)
+
+        response = self.client.get(reverse("members:passage_preview"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["report"]["summary"][AGE_OUT], 1)
+
+        response = self.client.get(reverse("members:passage_preview"), {"format": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(len(response.content.decode().strip().splitlines()), 4)
+
+    def test_non_staff_forbidden(self):
+        parent = Person.objects.create(
+            first_name="No", last_name="Staff",
+            primary_role=self.role_parent, status="a",
+        )
+        account = Account.objects.create_user(
+            email="nostaff@test.be", password="pw", person=parent,
+        )
+        self.client.force_login(account)
+        response = self.client.get(reverse("members:passage_preview"))
+        self.assertEqual(response.status_code, 403)
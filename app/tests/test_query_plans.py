@@ -0,0 +1,177 @@
+import random
+import string
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from finance.models import Payment
+from homepage.models import Event
+from members.models import Account, Enrollment, Person, Role, SchoolYear, Section
+from members.search import search_persons
+from messaging.models import SectionMessage
+
+PEOPLE = 6000
+YEARS = 20
+SECTIONS = 10
+
+
+class QueryPlanTest(TestCase):
+    """The hot filters are answered from an index, not a sequential scan.
+
+    Seeds a unit with a long history, refreshes the planner statistics and
+    reads the plans PostgreSQL picks for them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(24)
+        today = timezone.localdate()
+        cls.role_parent = Role.objects.get(short="p")
+        cls.role_child = Role.objects.get(short="e")
+
+        cls.years = SchoolYear.objects.bulk_create(
+            SchoolYear(
+                name=1900 + i,
+                start_date=date(1900 + i, 9, 1),
+                end_date=date(1901 + i, 8, 31),
+            )
+            for i in range(YEARS)
+        )
+        cls.sections = Section.objects.bulk_create(
+            Section(name=f"Section {i}") for i in range(SECTIONS)
+        )
+
+        def name():
+            # Varied names: trigrams shared by every row would make the
+            # planner rightly prefer a sequential scan.
+            return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))).capitalize()
+
+        def person(i):
+            # Mostly active parents; a few archived members and requests.
+            status = rng.choices(["a", "ar", "r"], weights=[90, 8, 2])[0]
+            return Person(
+                first_name=name(),
+                last_name=name(),
+                primary_role=cls.role_parent if i % 50 else cls.role_child,
+                status=status,
+                archived_date=today - timedelta(days=rng.randint(0, 4000))
+                if status == "ar"
+                else None,
+            )
+
+        cls.people = Person.objects.bulk_create(person(i) for i in range(PEOPLE))
+        Account.objects.bulk_create(
+            Account(person=member, email=f"{member.first_name.lower()}.{i}@example.com")
+            for i, member in enumerate(cls.people[:3000])
+        )
+        Enrollment.objects.bulk_create(
+            Enrollment(
+                user=member,
+                section=rng.choice(cls.sections),
+                school_year=year,
+            )
+            for member in cls.people[:2000]
+            for year in rng.sample(cls.years, 5)
+        )
+        Payment.objects.bulk_create(
+            Payment(person=member, school_year=year, amount=50)
+            for member in cls.people[:4000]
+            for year in rng.sample(cls.years, 3)
+        )
+        Event.objects.bulk_create(
+            Event(title=f"Event {i}", date=today - timedelta(days=i))
+            for i in range(3000)
+        )
+        SectionMessage.objects.bulk_create(
+            SectionMessage(
+                sender=cls.people[0],
+                section=rng.choice(cls.sections),
+                school_year=rng.choice(cls.years),
+                subject="Subject",
+                body="Body",
+            )
+            for _ in range(5000)
+        )
+        with connection.cursor() as cursor:
+            # What autovacuum does in production: merge the rows just
+            # inserted into the trigram indexes, refresh the statistics.
+            for index in ("person_first_name_trgm", "person_last_name_trgm"):
+                cursor.execute("SELECT gin_clean_pending_list(%s::regclass)", [index])
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_retention_filter(self):
+        cutoff = timezone.localdate() - timedelta(days=5 * 365)
+        self.assertUsesIndex(
+            Person.objects.filter(status="ar", archived_date__lte=cutoff),
+            "person_status_archived",
+        )
+
+    def test_role_status_filter(self):
+        self.assertUsesIndex(
+            Person.objects.filter(primary_role=self.role_child, status="a"),
+            "person_role_status",
+        )
+
+    def test_enrollments_of_a_section(self):
+        self.assertUsesIndex(
+            Enrollment.objects.filter(
+                school_year=self.years[-1], section=self.sections[0]
+            ),
+            "enrollment_year_section",
+        )
+
+    def test_enrollments_of_a_member(self):
+        self.assertUsesIndex(
+            Enrollment.objects.filter(user=self.people[0], school_year=self.years[-1]),
+            "enrollment_user_year",
+        )
+
+    def test_upcoming_events(self):
+        self.assertUsesIndex(
+            Event.objects.filter(date__gte=timezone.localdate()), "event_date"
+        )
+
+    def test_section_messages(self):
+        self.assertUsesIndex(
+            SectionMessage.objects.filter(
+                section=self.sections[0], school_year=self.years[-1]
+            ).order_by("-created_at"),
+            "message_section_year_created",
+        )
+
+    def test_payments_of_a_member(self):
+        self.assertUsesIndex(
+            Payment.objects.filter(school_year=self.years[-1], person=self.people[0]),
+            "payment_year_person",
+        )
+
+    def test_name_search(self):
+        self.assertUsesIndex(
+            Person.objects.filter(last_name__icontains="qwzrt"),
+            "person_last_name_trgm",
+        )
+        self.assertUsesIndex(
+            Person.objects.filter(first_name__icontains="xjvkp"),
+            "person_first_name_trgm",
+        )
+
+    def test_member_search(self):
+        with CaptureQueriesContext(connection) as ctx:
+            search_persons("qwzrt")
+        # The text and the email searches, in that order.
+        searches = [query["sql"] for query in ctx.captured_queries if "<<->" in query["sql"]]
+        self.assertEqual(len(searches), 2)
+        with connection.cursor() as cursor:
+            for sql, index in zip(searches, ["person_search_trgm", "account_email_trgm"], strict=True):
+                cursor.execute(f"EXPLAIN {sql}")
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+                self.assertIn(index, plan)
+                self.assertNotIn("Seq Scan", plan)
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from post_office.models import EmailTemplate
+
+from members import school_years
+from members.models import (
+    Account,
+    Enrollment,
+    ParentChild,
+    Person,
+    Role,
+    SchoolYear,
+    Section,
+)
+
+
+def _school_year_queries(ctx):
+    return [q for q in ctx.captured_queries if '"members_schoolyear"' in q["sql"]]
+
+
+class SchoolYearResolverTest(TestCase):
+    """SchoolYear.current()/next_school_year() go through the cached resolver."""
+
+    @classmethod
+    def setUpTestData(cls):
+        EmailTemplate.objects.create(
+            name="new_child_staff", subject="Test", content="Test",
+        )
+
+    def _create_next_year(self, current):
+        name = current.name + 1
+        return SchoolYear.objects.create(
+            name=name,
+            start_date=current.end_date + timedelta(days=1),
+            end_date=current.end_date.replace(year=current.end_date.year + 1),
+            range=f"{name}-{name + 1}",
+        )
+
+    def test_resolved_once_then_cached(self):
+        with CaptureQueriesContext(connection) as ctx:
+            current = SchoolYear.current()
+            SchoolYear.next_school_year()
+            SchoolYear.current()
+        self.assertIsNotNone(current)
+        self.assertEqual(len(_school_year_queries(ctx)), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(SchoolYear.current(), current)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_save_invalidates(self):
+        current = SchoolYear.current()
+        SchoolYear.objects.filter(start_date__gt=current.start_date).delete()
+        self.assertIsNone(SchoolYear.next_school_year())
+
+        next_year = self._create_next_year(current)
+        self.assertEqual(SchoolYear.next_school_year(), next_year)
+
+        next_year.delete()
+        self.assertIsNone(SchoolYear.next_school_year())
+
+    def test_request_memo_survives_cache_flush(self):
+        with school_years.request_memo():
+            current = SchoolYear.current()
+            cache.delete(school_years.CACHE_KEY)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(SchoolYear.current(), current)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_child_list_hits_school_years_once(self):
+        role_parent = Role.objects.get(short="p")
+        role_anime = Role.objects.get(short="e")
+        section = Section.objects.create(name="Baladins")
+        parent = Person.objects.create(
+            first_name="Parent", last_name="Test",
+            primary_role=role_parent, status="a",
+        )
+        Account.objects.create_user(
+            email="parent@test.be", password="pw", person=parent,
+        )
+        for i in range(3):
+            child = Person.objects.create(
+                first_name=f"Child{i}", last_name="Test",
+                primary_role=role_anime, status="a",
+            )
+            ParentChild.objects.create(parent=parent, child=child)
+            if i:
+                Enrollment.objects.create(
+                    user=child, section=section, school_year=SchoolYear.current(),
+                )
+        self.client.login(email="parent@test.be", password="pw")
+        cache.delete(school_years.CACHE_KEY)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse("members:child_list"), HTTP_HX_REQUEST="true",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Child0")
+        self.assertLessEqual(len(_school_year_queries(ctx)), 1)
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from members.models import Account, Person, Role, SiteSettings
+
+
+def _settings_queries(ctx):
+    return [q for q in ctx.captured_queries if '"members_sitesettings"' in q["sql"]]
+
+
+class SiteSettingsCacheTest(TestCase):
+    """SiteSettings.get_settings() reads a per-process copy."""
+
+    def test_second_read_hits_no_database(self):
+        SiteSettings.get_settings()
+        with CaptureQueriesContext(connection) as ctx:
+            SiteSettings.get_settings()
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_callers_get_their_own_copy(self):
+        first = SiteSettings.get_settings()
+        first.site_name = "Changed but not saved"
+        self.assertNotEqual(SiteSettings.get_settings().site_name, "Changed but not saved")
+
+    def test_save_invalidates(self):
+        site_settings = SiteSettings.get_settings()
+        site_settings.site_name = "Unité 42"
+        site_settings.save()
+        self.assertEqual(SiteSettings.get_settings().site_name, "Unité 42")
+
+        site_settings.last_passage_school_year = 2030
+        site_settings.save(update_fields=["last_passage_school_year"])
+        self.assertEqual(SiteSettings.get_settings().last_passage_school_year, 2030)
+
+    def test_page_reads_settings_at_most_once(self):
+        SiteSettings.get_settings()
+        cache.clear()  # as after a save in another process
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(_settings_queries(ctx)), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/")
+        self.assertEqual(len(_settings_queries(ctx)), 0)
+
+
+class SiteSettingsAdminTest(TestCase):
+    def test_changelist_opens_the_singleton(self):
+        superuser = Account.objects.create_user(
+            email="super@test.be", password="pass",
+            is_staff=True, is_superuser=True,
+            person=Person.objects.create(
+                first_name="Super", last_name="User",
+                primary_role=Role.objects.get(short="p"), status="a",
+            ),
+        )
+        self.client.force_login(superuser)
+        response = self.client.get(reverse("admin:members_sitesettings_changelist"))
+        self.assertRedirects(
+            response,
+            reverse(
+                "admin:members_sitesettings_change",
+                args=[SiteSettings.get_settings().pk],
+            ),
+        )
@@ -0,0 +1,104 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from post_office.models import EmailTemplate
+
+from members.models import (
+    Account,
+    Enrollment,
+    ParentChild,
+    Person,
+    Role,
+    SchoolYear,
+    Section,
+)
+
+
+def _profile_queries(ctx):
+    tables = ('"members_personrole"', '"members_enrollment"', '"members_parentchild"')
+    return [q for q in ctx.captured_queries if any(t in q["sql"] for t in tables)]
+
+
+class ViewerProfileTest(TestCase):
+    """request.viewer is loaded once, kept in the session and invalidated on writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        EmailTemplate.objects.create(
+            name="new_child_staff", subject="Test", content="Test",
+        )
+        cls.role_parent = Role.objects.get(short="p")
+        cls.role_anime = Role.objects.get(short="e")
+        cls.role_tresorier = Role.objects.get(short="t")
+        cls.section = Section.objects.create(name="Meute")
+        cls.parent = Person.objects.create(
+            first_name="Parent", last_name="Test",
+            primary_role=cls.role_parent, status="a",
+        )
+        cls.account = Account.objects.create_user(
+            email="parent@test.be", password="pw", person=cls.parent,
+        )
+        cls.child = Person.objects.create(
+            first_name="Child", last_name="Test",
+            primary_role=cls.role_anime, status="a",
+        )
+        ParentChild.objects.create(parent=cls.parent, child=cls.child)
+        Enrollment.objects.create(
+            user=cls.child, section=cls.section, school_year=SchoolYear.current(),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.account)
+
+    def test_profile_contents(self):
+        response = self.client.get("/")
+        viewer = response.wsgi_request.viewer
+        self.assertEqual(viewer.primary_role, "p")
+        self.assertEqual(viewer.child_section_ids, {self.section.pk})
+        self.assertEqual(viewer.child_ids, {str(self.child.pk)})
+        self.assertFalse(viewer.can_send_all)
+        self.assertEqual([s.name for s in response.context["nav_sections"]], ["Meute"])
+
+    def test_second_request_reads_the_session(self):
+        self.client.get("/")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/")
+        self.assertEqual(_profile_queries(ctx), [])
+
+    def test_role_change_invalidates(self):
+        response = self.client.get("/")
+        self.assertFalse(response.context["user_is_tresorier"])
+
+        self.parent.roles.add(self.role_tresorier)
+
+        response = self.client.get("/")
+        self.assertTrue(response.context["user_is_tresorier"])
+
+    def test_enrollment_change_invalidates(self):
+        self.client.get("/")
+        Enrollment.objects.filter(user=self.child).delete()
+
+        response = self.client.get("/")
+        self.assertEqual(list(response.context["nav_sections"]), [])
+
+    def test_unrelated_write_keeps_the_session_copy(self):
+        self.client.get("/")
+        other = Person.objects.create(
+            first_name="Other", last_name="Family",
+            primary_role=self.role_anime, status="a",
+        )
+        Enrollment.objects.create(
+            user=other, section=self.section, school_year=SchoolYear.current(),
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/")
+        self.assertEqual(_profile_queries(ctx), [])
+
+    def test_child_write_invalidates_parent(self):
+        self.client.get("/")
+        self.child.save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/")
+        self.assertNotEqual(_profile_queries(ctx), [])
@@ -1,48 +1,153 @@
-"""Custom Django email backend for MailerSend HTTP API."""
+"""Custom Django email backend for MailerSend HTTP API.
+
+One pooled HTTP session is opened in open() and reused until close(), so a
+batch of emails shares its TLS connections. send_messages() posts several
+messages to the bulk-email endpoint (MAILERSEND_BULK) in a few calls, or
+sends them one by one over up to MAILERSEND_CONCURRENCY parallel requests.
+A 429 answer is retried after the delay MailerSend asks for.
+"""
 
 import base64
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from django.conf import settings
 from django.core.mail.backends.base import BaseEmailBackend
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger("post_office")
 
 
+class MailerSendError(Exception):
+    """MailerSend refused a request."""
+
+
 class MailerSendBackend(BaseEmailBackend):
     """Email backend that sends via the MailerSend HTTP API."""
 
-    API_URL = "https://api.mailersend.com/v1/email"
-
-    def __init__(self, api_key=None, **kwargs):
+    API_URL = "https://api.mailersend.com/v1"
+    # MailerSend accepts at most this many emails per bulk request.
+    BULK_LIMIT = 500
+    TIMEOUT = 30
+    # Waits between 429 retries when MailerSend gives no Retry-After.
+    BACKOFF_BASE = 1
+    BACKOFF_MAX = 60
+
+    def __init__(
+        self,
+        api_key=None,
+        api_url=None,
+        bulk=None,
+        concurrency=None,
+        max_retries=None,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
-        from django.conf import settings
-
         self.api_key = api_key or getattr(settings, "MAILERSEND_API_KEY", "")
+        self.api_url = (
+            api_url or getattr(settings, "MAILERSEND_API_URL", "") or self.API_URL
+        ).rstrip("/")
+        self.bulk = getattr(settings, "MAILERSEND_BULK", False) if bulk is None else bulk
+        self.concurrency = max(
+            1,
+            getattr(settings, "MAILERSEND_CONCURRENCY", 1)
+            if concurrency is None
+            else concurrency,
+        )
+        self.max_retries = (
+            getattr(settings, "MAILERSEND_MAX_RETRIES", 3)
+            if max_retries is None
+            else max_retries
+        )
+        self.session = None
 
     def open(self):
+        """Open the pooled session; returns True if a new one was created."""
+        if self.session is not None:
+            return False
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "X-Mailersend-Id": "troopconnect",
+        })
+        self.session = session
         return True
 
     def close(self):
-        pass
+        if self.session is not None:
+            self.session.close()
+            self.session = None
 
     def send_messages(self, email_messages):
         if not email_messages:
             return 0
 
+        new_session = self.open()
+        try:
+            if self.bulk and len(email_messages) > 1:
+                return self._send_bulk(email_messages)
+            if self.concurrency > 1 and len(email_messages) > 1:
+                with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                    return sum(pool.map(self._send, email_messages))
+            return sum(self._send(message) for message in email_messages)
+        finally:
+            if new_session:
+                self.close()
+
+    def _send(self, message):
+        """Send one message to the email endpoint; returns True on success."""
+        return self._post("/email", self._payload(message), f"to {message.to}")
+
+    def _send_bulk(self, email_messages):
+        """Send messages through the bulk endpoint; returns the accepted count."""
         count = 0
-        for message in email_messages:
-            if self._send(message):
-                count += 1
+        for start in range(0, len(email_messages), self.BULK_LIMIT):
+            chunk = email_messages[start:start + self.BULK_LIMIT]
+            payload = [self._payload(message) for message in chunk]
+            if self._post("/bulk-email", payload, f"in bulk ({len(chunk)} emails)"):
+                count += len(chunk)
         return count
 
-    def _send(self, message):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "X-Mailersend-Id": "troopconnect",
-        }
+    def _post(self, path, payload, description):
+        """POST to the API, retrying on 429. Raises unless fail_silently."""
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = self.session.post(
+                    self.api_url + path, json=payload, timeout=self.TIMEOUT
+                )
+                if response.status_code != 429 or attempt == self.max_retries:
+                    break
+                delay = self._retry_delay(response, attempt)
+                logger.warning("MailerSend rate limit hit, retrying in %ss", delay)
+                time.sleep(delay)
 
+            if response.status_code in (200, 202):
+                logger.info("Email sent via MailerSend %s", description)
+                return True
+            raise MailerSendError(
+                f"MailerSend API error {response.status_code}: {response.text}"
+            )
+        except Exception:
+            logger.exception("Failed to send email via MailerSend")
+            if not self.fail_silently:
+                raise
+            return False
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying a 429 answer."""
+        try:
+            delay = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            delay = self.BACKOFF_BASE * 2 ** attempt
+        return min(max(delay, 0), self.BACKOFF_MAX)
+
+    def _payload(self, message):
         payload = {
             "from": {
                 "email": message.from_email,
@@ -92,22 +197,4 @@ class MailerSendBackend(BaseEmailBackend):
                     }
                 )
 
-        try:
-            response = requests.post(
-                self.API_URL, json=payload, headers=headers, timeout=30
-            )
-            if response.status_code in (200, 202):
-                logger.info("Email sent via MailerSend to %s", message.to)
-                return True
-            else:
-                logger.error(
-                    "MailerSend API error %s: %s",
-                    response.status_code,
-                    response.text,
-                )
-                return False
-        except Exception:
-            logger.exception("Failed to send email via MailerSend")
-            if not self.fail_silently:
-                raise
-            return False
+        return payload
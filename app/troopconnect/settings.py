@@ -69,6 +69,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "members.middleware.SchoolYearMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -76,6 +77,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "members.middleware.ViewerProfileMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -181,6 +183,13 @@ USE_TZ = True
 STATIC_URL = "/static/"
 MEDIA_URL = "/media/"
 
+# Django's default handlers, plus a SHA-256 of each file computed as it
+# streams in (used to store message attachments by content hash).
+FILE_UPLOAD_HANDLERS = [
+    "messaging.uploads.HashingMemoryFileUploadHandler",
+    "messaging.uploads.HashingTemporaryFileUploadHandler",
+]
+
 if DEBUG:
     # Development settings
     STATICFILES_DIRS = [
@@ -213,6 +222,15 @@ INTERNAL_IPS = [
 AUTH_USER_MODEL = "members.Account"
 
 MAILERSEND_API_KEY = os.environ.get("MAILERSEND_API_KEY", "")
+MAILERSEND_API_URL = os.environ.get("MAILERSEND_API_URL", "https://api.mailersend.com/v1")
+# Send multi-message batches through MailerSend's bulk-email endpoint. Off by
+# default: that endpoint only answers 202 and validates the messages later,
+# so a rejected recipient would still be marked as sent.
+MAILERSEND_BULK = os.environ.get("MAILERSEND_BULK", "0") == "1"
+# Parallel requests when messages are sent one by one.
+MAILERSEND_CONCURRENCY = int(os.environ.get("MAILERSEND_CONCURRENCY", "4"))
+# Retries of a request answered with 429 Too Many Requests.
+MAILERSEND_MAX_RETRIES = int(os.environ.get("MAILERSEND_MAX_RETRIES", "3"))
 EMAIL_BACKEND = "post_office.EmailBackend"
 
 # "real" sends through MailerSend; "dummy" records emails without sending
@@ -235,8 +253,13 @@ POST_OFFICE = {
     "DEFAULT_PRIORITY": "medium",
     # Retry a failed send a few times before marking it "failed" and warning.
     "MAX_RETRIES": 3,
-    "CELERY_ENABLED": True,
+    # Flushing is done by members.mail_dispatch (one Celery queue per
+    # priority), not by post_office's own single-lock task.
+    "CELERY_ENABLED": False,
 }
+# dispatch_mail runs started per priority whenever mail is queued; they
+# share the work through row locks.
+MAIL_DISPATCH_PARALLELISM = 2
 
 
 AUTHENTICATION_BACKENDS = (
@@ -314,6 +337,10 @@ CELERY_BEAT_SCHEDULE = {
         "task": "send_queued_mail",
         "schedule": crontab(minute="*/5"),
     },
+    "reconcile-mail-counters": {
+        "task": "reconcile_mail_counters",
+        "schedule": crontab(minute="*/15"),
+    },
     "create-year-daily": {
         "task": "create_year_task",
         "schedule": crontab(hour=3, minute=0),
@@ -351,3 +378,6 @@ CACHES = {
         },
     }
 }
+
+# Tests use a private in-memory cache, emptied before every test.
+TEST_RUNNER = "troopconnect.test_runner.TestRunner"
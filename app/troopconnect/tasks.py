@@ -8,9 +8,28 @@ logger = get_task_logger(__name__)
 
 @shared_task(name="send_queued_mail")
 def send_queued_mail():
-    """Send all queued post_office emails via Celery worker."""
-    from post_office.management.commands.send_queued_mail import Command
+    """Beat backstop: start a dispatch_mail run on every priority queue."""
+    from members.mail_dispatch import schedule
 
-    command = Command()
-    command.handle()
-    logger.info("Queued mail processed")
+    schedule()
+    logger.info("Mail dispatch scheduled")
+
+
+@shared_task(name="dispatch_mail")
+def dispatch_mail(priority):
+    """Send the due post_office emails of one priority (members.mail_dispatch)."""
+    from members.mail_dispatch import dispatch
+
+    stats = dispatch(priority)
+    logger.info(f"Mail dispatch (priority {priority}): {stats}")
+    return stats
+
+
+@shared_task(name="reconcile_mail_counters")
+def reconcile_mail_counters():
+    """Recount the post_office queue into the cached counters (fixes drift)."""
+    from members.mail_counters import reconcile
+
+    counts = reconcile()
+    logger.info(f"Mail counters reconciled: {counts}")
+    return counts
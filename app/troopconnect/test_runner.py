@@ -0,0 +1,74 @@
+from unittest import TextTestResult
+
+from django.core.cache import caches
+from django.test.runner import (
+    DiscoverRunner,
+    ParallelTestSuite,
+    RemoteTestResult,
+    RemoteTestRunner,
+)
+from django.test.utils import override_settings
+from post_office import cache as post_office_cache
+
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "troopconnect-tests",
+    }
+}
+
+
+class CacheClearingResultMixin:
+    """Start every test with an empty cache.
+
+    TestCase rolls its transaction back without sending model signals, so an
+    entry cached from one test's rows (school years, settings, ...) would
+    otherwise survive into the next test.
+    """
+
+    def startTest(self, test):
+        for cache in caches.all():
+            cache.clear()
+        super().startTest(test)
+
+
+class CacheClearingRemoteTestResult(CacheClearingResultMixin, RemoteTestResult):
+    pass
+
+
+class CacheClearingRemoteTestRunner(RemoteTestRunner):
+    resultclass = CacheClearingRemoteTestResult
+
+
+class CacheClearingParallelTestSuite(ParallelTestSuite):
+    runner_class = CacheClearingRemoteTestRunner
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner on a private in-memory cache, cleared before each test.
+
+    Keeps the suite off the shared Redis instance used by the dev server.
+    post_office binds its template cache at import time, so it is repointed
+    too; otherwise templates cached by one test (with that test's pks) would
+    be served to the next.
+    """
+
+    parallel_test_suite = CacheClearingParallelTestSuite
+
+    def setup_test_environment(self, **kwargs):
+        self._cache_override = override_settings(CACHES=TEST_CACHES)
+        self._cache_override.enable()
+        self._post_office_cache = post_office_cache.cache_backend
+        post_office_cache.cache_backend = caches["default"]
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        post_office_cache.cache_backend = self._post_office_cache
+        self._cache_override.disable()
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or TextTestResult
+        return type(
+            f"CacheClearing{base.__name__}", (CacheClearingResultMixin, base), {}
+        )